@@ -0,0 +1,96 @@
+"""
+Append-only activity log ("who did what"), written through an in-process buffer.
+
+Views call log() and nothing is written on the request path: each entry is
+queued once the surrounding transaction commits, so rolled-back actions are
+never logged. The buffer is written with one bulk_create as soon as it holds
+MAX_ITEMS entries, at the end of the first request finished after its oldest
+entry has waited MAX_DELAY_MS, and at process exit. Pages that read the log
+flush this process's buffer first.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MAX_ITEMS': 100,
+    'MAX_DELAY_MS': 1000,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_ACTIVITY', {}))
+    return config
+
+
+class ActivityBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []
+        self.oldest = None
+        self.pid = os.getpid()
+
+    def add(self, entry):
+        with self.lock:
+            self._check_fork()
+            self.entries.append(entry)
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+        self.flush()
+
+    def _check_fork(self):
+        # A forked worker inherits the parent's pending entries; the parent writes them
+        if self.pid != os.getpid():
+            self.entries, self.oldest, self.pid = [], None, os.getpid()
+
+    def flush(self, force=False):
+        config = get_config()
+        with self.lock:
+            self._check_fork()
+            if not self.entries:
+                return 0
+            waited_ms = (time.monotonic() - self.oldest) * 1000
+            if not force and len(self.entries) < config['MAX_ITEMS'] and waited_ms < config['MAX_DELAY_MS']:
+                return 0
+            entries, self.entries, self.oldest = self.entries, [], None
+        try:
+            ActivityLog.objects.bulk_create(entries, batch_size=config['MAX_ITEMS'])
+        except DatabaseError:
+            logger.exception('Dropped %d activity log entries', len(entries))
+            return 0
+        return len(entries)
+
+
+buffer = ActivityBuffer()
+atexit.register(buffer.flush, force=True)
+
+
+def log(actor, action, summary, club=None):
+    entry = ActivityLog(
+        timestamp=timezone.now(),
+        actor_id=actor.pk if actor is not None else None,
+        action=action,
+        club_id=club.pk if club is not None else None,
+        summary=summary[:255],
+    )
+    transaction.on_commit(lambda: buffer.add(entry))
+
+
+def flush():
+    return buffer.flush(force=True)
+
+
+def recent(limit):
+    flush()
+    return ActivityLog.objects.select_related('actor', 'club').order_by('-timestamp', '-id')[:limit]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, Club, ClubMembership, Event, Message, ClubJoinRequest
+from .models import UserProfile, Club, ClubMembership, Event, Message, ClubJoinRequest, Task, EventReminder, MessageArchiveSegment, ActivityLog, ClubSimilarity, EventOccurrenceException, ChangeLogEntry
 
 # Register your models here.
 
@@ -38,3 +38,42 @@ class ClubJoinRequestAdmin(admin.ModelAdmin):
     list_display = ('user', 'club', 'timestamp', 'is_approved', 'is_rejected')
     list_filter = ('is_approved', 'is_rejected')
     search_fields = ('user__username', 'club__name')
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+
+@admin.register(EventReminder)
+class EventReminderAdmin(admin.ModelAdmin):
+    list_display = ('event', 'offset_minutes', 'event_start', 'sent_at', 'sent_count')
+    list_filter = ('offset_minutes',)
+    search_fields = ('event__title',)
+
+@admin.register(MessageArchiveSegment)
+class MessageArchiveSegmentAdmin(admin.ModelAdmin):
+    list_display = ('club', 'first_timestamp', 'last_timestamp', 'message_count', 'size_bytes')
+    search_fields = ('club__name', 'path')
+
+@admin.register(ActivityLog)
+class ActivityLogAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'actor', 'action', 'club', 'summary')
+    list_filter = ('action',)
+    search_fields = ('summary', 'actor__username', 'club__name')
+
+@admin.register(ClubSimilarity)
+class ClubSimilarityAdmin(admin.ModelAdmin):
+    list_display = ('club', 'similar', 'score')
+    search_fields = ('club__name', 'similar__name')
+
+@admin.register(EventOccurrenceException)
+class EventOccurrenceExceptionAdmin(admin.ModelAdmin):
+    list_display = ('event', 'occurrence', 'is_cancelled', 'start_date', 'end_date')
+    list_filter = ('is_cancelled',)
+    search_fields = ('event__title',)
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'action', 'model', 'object_id', 'timestamp')
+    list_filter = ('model', 'action')
@@ -0,0 +1,302 @@
+"""
+Read-only JSON API (v1) for clubs, events and messages.
+
+Every list is read with values() and paginated with keyset cursors, so a
+call costs one indexed query for the page (plus a membership check where
+the HTML view makes one). Clients pick columns with ?fields=a,b,c and page
+with ?cursor=...&limit=N. Visibility follows the HTML views through
+cmsapp.visibility. Upcoming events are listed per occurrence, recurring
+series expanded only as far as the page reaches (cmsapp.recurrence). The
+change feed (admins only) streams NDJSON instead; see cmsapp.changes.
+"""
+import functools
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from . import changes, recurrence
+from .cache import get_profile
+from .models import Club, ClubMembership, Message
+from .pagination import CursorPaginator, InvalidCursor
+from .visibility import visible_clubs, visible_events, can_read_club_messages
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _logo_url(name):
+    return Club._meta.get_field('logo').storage.url(name) if name else None
+
+
+def _member_count():
+    return Coalesce(Subquery(
+        ClubMembership.objects.filter(club=OuterRef('pk')).order_by().values('club')
+        .annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+class Resource:
+    # fields: public name -> ORM lookup or expression; converters post-process values
+    def __init__(self, fields, default_fields, ordering, converters=None):
+        self.fields = fields
+        self.default_fields = default_fields
+        self.ordering = ordering
+        self.converters = converters or {}
+
+    def selected(self, request):
+        requested = request.GET.get('fields')
+        if not requested:
+            return self.default_fields
+        names = [name.strip() for name in requested.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Available: {', '.join(self.fields)}")
+        return names
+
+    def _key(self, name):
+        source = self.fields[name]
+        return source if isinstance(source, str) else f'api_{name}'
+
+    def rows(self, queryset, names):
+        lookups = [self.fields[name] for name in names if isinstance(self.fields[name], str)]
+        expressions = {self._key(name): self.fields[name] for name in names if not isinstance(self.fields[name], str)}
+        # The cursor needs the ordering columns even when they are not requested
+        ordering_keys = [name.lstrip('-') for name in self.ordering]
+        lookups += [key for key in ordering_keys if key not in lookups]
+        return queryset.values(*lookups, **expressions)
+
+    def serialize(self, row, names):
+        item = {}
+        for name in names:
+            value = row[self._key(name)]
+            converter = self.converters.get(name)
+            item[name] = converter(value) if converter else value
+        return item
+
+    def serialize_object(self, obj, names):
+        # Like serialize(), following each lookup through the attributes of `obj`
+        item = {}
+        for name in names:
+            value = obj
+            for attribute in self.fields[name].split('__'):
+                value = getattr(value, attribute)
+            converter = self.converters.get(name)
+            item[name] = converter(value) if converter else value
+        return item
+
+
+CLUBS = Resource(
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'description': 'description',
+        'created_at': 'created_at',
+        'created_by': 'created_by__username',
+        'is_approved': 'is_approved',
+        'logo': 'logo',
+        'member_count': _member_count(),
+    },
+    default_fields=['id', 'name', 'description', 'is_approved', 'logo'],
+    ordering=('name', 'id'),
+    converters={'logo': _logo_url},
+)
+
+MEMBERS = Resource(
+    fields={
+        'id': 'id',
+        'user_id': 'user_id',
+        'username': 'user__username',
+        'first_name': 'user__first_name',
+        'last_name': 'user__last_name',
+        'is_leader': 'is_leader',
+        'date_joined': 'date_joined',
+    },
+    default_fields=['user_id', 'username', 'is_leader', 'date_joined'],
+    ordering=('id',),
+)
+
+# Served per occurrence (cmsapp.recurrence.Occurrence); `occurrence` numbers
+# a recurring event's sessions and is 0 for one-off events
+EVENTS = Resource(
+    fields={
+        'id': 'id',
+        'occurrence': 'index',
+        'title': 'title',
+        'description': 'description',
+        'location': 'location',
+        'start_date': 'start_date',
+        'end_date': 'end_date',
+        'club_id': 'club_id',
+        'club_name': 'club__name',
+        'registration_type': 'registration_type',
+        'registrant_count': 'registrant_count',
+    },
+    default_fields=['id', 'occurrence', 'title', 'location', 'start_date', 'end_date', 'club_id', 'club_name'],
+    ordering=('start_date', 'id'),
+)
+
+MESSAGES = Resource(
+    fields={
+        'id': 'id',
+        'sender_id': 'sender_id',
+        'sender': 'sender__username',
+        'content': 'content',
+        'timestamp': 'timestamp',
+    },
+    default_fields=['id', 'sender', 'content', 'timestamp'],
+    ordering=('-timestamp', '-id'),
+)
+
+
+def api_view(view):
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return JsonResponse({'error': 'Method not allowed'}, status=405)
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        try:
+            return view(request, get_profile(request.user).role, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    return wrapper
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def _list_response(request, resource, queryset):
+    names = resource.selected(request)
+    paginator = CursorPaginator(resource.rows(queryset, names), resource.ordering, _limit(request))
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        raise ApiError('Invalid cursor')
+    return JsonResponse({
+        'results': [resource.serialize(row, names) for row in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    })
+
+
+def _visible_club(request, role, club_id):
+    club = visible_clubs(request.user, role).filter(pk=club_id).only('pk').first()
+    if club is None:
+        raise ApiError('Club not found', status=404)
+    return club
+
+
+@api_view
+def club_list(request, role):
+    return _list_response(request, CLUBS, visible_clubs(request.user, role))
+
+
+@api_view
+def club_detail(request, role, club_id):
+    names = CLUBS.selected(request)
+    row = CLUBS.rows(visible_clubs(request.user, role).filter(pk=club_id), names).first()
+    if row is None:
+        raise ApiError('Club not found', status=404)
+    return JsonResponse(CLUBS.serialize(row, names))
+
+
+@api_view
+def club_members(request, role, club_id):
+    club = _visible_club(request, role, club_id)
+    return _list_response(request, MEMBERS, ClubMembership.objects.filter(club=club))
+
+
+@api_view
+def club_messages(request, role, club_id):
+    club = _visible_club(request, role, club_id)
+    if not can_read_club_messages(request.user, role, club):
+        raise ApiError('You must be a member of this club to view messages.', status=403)
+    return _list_response(request, MESSAGES, Message.objects.filter(club=club))
+
+
+@api_view
+def upcoming_events(request, role):
+    names = EVENTS.selected(request)
+    events = visible_events(request.user, role).select_related('club')
+    if request.GET.get('club'):
+        try:
+            events = events.filter(club_id=int(request.GET['club']))
+        except ValueError:
+            raise ApiError('club must be an integer')
+    # The cursor is the position of the last occurrence served, as in the HTML
+    # view; it only pages forward
+    position = None
+    if request.GET.get('cursor'):
+        position = recurrence.decode_position(request.GET['cursor'])
+        if position is None:
+            raise ApiError('Invalid cursor')
+    limit = _limit(request)
+    items = recurrence.upcoming(events, timezone.now(), limit, position)
+    next_cursor = recurrence.encode_position(items[limit - 1]) if len(items) > limit else None
+    return JsonResponse({
+        'results': [EVENTS.serialize_object(item, names) for item in items[:limit]],
+        'next': _page_url(request, next_cursor),
+        'previous': None,
+    })
+
+
+def _change_models(request, role):
+    if role != 'admin':
+        raise ApiError('Only admins can read the change feed.', status=403)
+    models = [name.strip() for name in request.GET.get('models', '').split(',') if name.strip()]
+    unknown = [name for name in models if name not in changes.MODELS]
+    if unknown:
+        raise ApiError(f"Unknown model(s): {', '.join(unknown)}. Available: {', '.join(changes.MODELS)}")
+    return models
+
+
+@api_view
+def change_feed(request, role):
+    # NDJSON, one change per line; X-Changes-Next is the `since` for the next call
+    models = _change_models(request, role)
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        raise ApiError('since and limit must be integers')
+    try:
+        page = changes.changes_since(since, limit, models)
+    except changes.ChangeLogExpired as e:
+        # The consumer starts over from a snapshot
+        snapshot_url = request.build_absolute_uri(reverse('api_change_snapshot'))
+        return JsonResponse({'error': str(e), 'latest': e.latest, 'snapshot': snapshot_url}, status=410)
+    response = StreamingHttpResponse(page.ndjson(), content_type='application/x-ndjson')
+    response['X-Changes-Next'] = str(page.next_since)
+    response['X-Changes-More'] = 'true' if page.has_more else 'false'
+    return response
+
+
+@api_view
+def change_snapshot(request, role):
+    # Every current object as an insert, NDJSON; follow the feed from X-Changes-Next
+    snapshot = changes.snapshot(_change_models(request, role))
+    response = StreamingHttpResponse(snapshot.ndjson(), content_type='application/x-ndjson')
+    response['X-Changes-Next'] = str(snapshot.next_since)
+    return response
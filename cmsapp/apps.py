@@ -7,3 +7,5 @@ class CmsappConfig(AppConfig):
     
     def ready(self):
         import cmsapp.signals
+        from cmsapp.taskqueue import autodiscover
+        autodiscover()
@@ -0,0 +1,134 @@
+"""
+Cold storage for old club messages.
+
+archive_club() moves a club's messages older than its retention window
+(Club.message_retention_days, else RETENTION_DAYS) out of the Message table
+into append-only segment files of up to SEGMENT_SIZE messages each:
+
+    <DIRECTORY>/club_<club id>/<first message id>-<last message id>.jsonl.gz
+
+one JSON object per line, oldest first. Each file is written in full and
+fsynced before its MessageArchiveSegment row is created and the messages are
+deleted in one transaction, so a crash leaves either the hot rows or an
+indexed segment (at worst plus an unreferenced file, which the next run
+overwrites). Segments are never modified afterwards. The segment index is
+all the archive browser needs to page through history one file at a time.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changes
+from .cache import bump_club_stamp
+from .models import ChangeLogEntry, Club, Message, MessageArchiveSegment
+
+DEFAULTS = {
+    'DIRECTORY': Path(settings.BASE_DIR) / 'var' / 'archive' / 'messages',
+    # Used for clubs without their own message_retention_days
+    'RETENTION_DAYS': 365,
+    'SEGMENT_SIZE': 5000,
+}
+
+# Keeps id__in lists well under the database's bound-parameter limit
+DELETE_BATCH = 500
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_MESSAGE_ARCHIVE', {}))
+    config['DIRECTORY'] = Path(config['DIRECTORY'])
+    return config
+
+
+def retention_cutoff(club, now=None, config=None):
+    config = config or get_config()
+    days = club.message_retention_days or config['RETENTION_DAYS']
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def segment_path(segment, config=None):
+    return (config or get_config())['DIRECTORY'] / segment.path
+
+
+def _encode(value):
+    # Full microsecond precision (DjangoJSONEncoder rounds to milliseconds)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _write_segment(path, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'wb') as raw:
+        # mtime=0 keeps rewrites of the same segment byte-identical
+        with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as fh:
+            for row in rows:
+                fh.write(json.dumps(row, default=_encode, separators=(',', ':')).encode())
+                fh.write(b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def archive_club(club, now=None, config=None, dry_run=False):
+    # Returns the number of messages archived (or, with dry_run, due)
+    config = config or get_config()
+    old = Message.objects.filter(club=club, timestamp__lt=retention_cutoff(club, now, config))
+    if dry_run:
+        return old.count()
+
+    archived = 0
+    while True:
+        rows = list(
+            old.order_by('timestamp', 'id')
+            .values('id', 'sender_id', 'timestamp', 'content', 'is_read', sender_name=F('sender__username'))
+            [:config['SEGMENT_SIZE']]
+        )
+        if not rows:
+            break
+        relative = f"club_{club.pk}/{rows[0]['id']}-{rows[-1]['id']}.jsonl.gz"
+        size = _write_segment(config['DIRECTORY'] / relative, rows)
+
+        ids = [row['id'] for row in rows]
+        with transaction.atomic():
+            MessageArchiveSegment.objects.create(
+                club=club, path=relative, message_count=len(rows),
+                first_timestamp=rows[0]['timestamp'], last_timestamp=rows[-1]['timestamp'], size_bytes=size,
+            )
+            for i in range(0, len(ids), DELETE_BATCH):
+                # QuerySet.delete() would send post_delete, and bump the club's
+                # version, once per message; the version is bumped once below
+                Message.objects.filter(id__in=ids[i:i + DELETE_BATCH])._raw_delete(Message.objects.db)
+            Club.objects.filter(pk=club.pk).update(version=F('version') + 1)
+            transaction.on_commit(lambda: bump_club_stamp(club.pk))
+            # Archived messages leave the Message table, so mirrors drop them
+            changes.record_many(Message, ids, ChangeLogEntry.DELETE)
+        archived += len(rows)
+    return archived
+
+
+def archive_all(now=None, config=None, dry_run=False):
+    # Yields (club, count) for every club that had messages to archive
+    config = config or get_config()
+    now = now or timezone.now()
+    for club in list(Club.objects.only('pk', 'name', 'message_retention_days').order_by('pk')):
+        count = archive_club(club, now, config, dry_run)
+        if count:
+            yield club, count
+
+
+def read_segment(segment, config=None):
+    with gzip.open(segment_path(segment, config), 'rt', encoding='utf-8') as fh:
+        for line in fh:
+            row = json.loads(line)
+            row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+            yield row
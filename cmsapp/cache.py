@@ -0,0 +1,270 @@
+"""
+Two-tier cache for frequently read model instances and querysets.
+
+Lookups go through a small per-process LRU first and fall back to the shared
+Django cache (settings.CACHES['default']). Every key is tagged with the
+generation counters of the models it depends on. The counters live in the
+shared cache and are replaced from post_save/post_delete (see signals.py), so
+an entry cached by one worker stops matching in every worker once any worker
+writes to one of those models. Clubs, events and profiles are also keyed on
+a stamp of their own, which the frequent writes touching only one of them
+(messages, registrations, profile edits) bump instead of a whole model's
+generation. Each worker keeps the counters it has read for
+CMS_CACHE_COUNTER_TTL seconds, which bounds how long another worker's write
+can go unseen; the worker that writes sees its own change at once.
+
+Objects returned from here are shared between requests in the same process;
+treat them as read-only and load a fresh instance before modifying and saving.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db.models import Count
+from django.http import Http404
+from django.utils import timezone
+
+from . import recurrence
+from .metrics import CACHE_REQUESTS
+from .models import UserProfile, Club, ClubMembership, Event
+
+MISSING = object()
+
+
+class LocalLRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalLRU(getattr(settings, 'CMS_LOCAL_CACHE_SIZE', 1024))
+# Counter values with the monotonic time they stop being trusted
+local_counters = LocalLRU(getattr(settings, 'CMS_LOCAL_CACHE_SIZE', 1024))
+COUNTER_TTL = getattr(settings, 'CMS_CACHE_COUNTER_TTL', 1)
+
+
+# Generation counters
+def _generation_key(model):
+    return f'cms:gen:{model._meta.label_lower}'
+
+
+def _new_generation():
+    # A fresh value from the clock rather than an increment: concurrent bumps
+    # need no atomic read-modify-write, and a counter evicted from the shared
+    # cache never comes back as a value old entries may still be stored under.
+    return time.time_ns()
+
+
+def _remember_counter(key, value):
+    local_counters.set(key, (value, time.monotonic() + COUNTER_TTL))
+
+
+def _get_counters(keys):
+    now = time.monotonic()
+    counters = {}
+    for key in keys:
+        entry = local_counters.get(key, None)
+        if entry is not None and entry[1] > now:
+            counters[key] = entry[0]
+    stale = [key for key in keys if key not in counters]
+    if stale:
+        found = shared_cache.get_many(stale)
+        for key in stale:
+            value = found.get(key)
+            if value is None:
+                value = _new_generation()
+                if not shared_cache.add(key, value, None):
+                    value = shared_cache.get(key, value)
+            _remember_counter(key, value)
+            counters[key] = value
+    return [counters[key] for key in keys]
+
+
+def _bump_counter(key):
+    value = _new_generation()
+    shared_cache.set(key, value, None)
+    _remember_counter(key, value)
+
+
+def get_generations(models):
+    return _get_counters([_generation_key(model) for model in models])
+
+
+def get_generation(model):
+    return get_generations([model])[0]
+
+
+def bump_generation(model):
+    _bump_counter(_generation_key(model))
+
+
+# Named stamps for data narrower than a whole model
+def get_stamp(name):
+    return _get_counters([f'cms:gen:{name}'])[0]
+
+
+def bump_stamp(name):
+    _bump_counter(f'cms:gen:{name}')
+
+
+# Per-user stamp covering the user's cached profile and everything the shared
+# layout shows for a user (username, role, memberships).
+def get_user_stamp(user_id):
+    return get_stamp(f'user:{user_id}')
+
+
+def bump_user_stamp(user_id):
+    bump_stamp(f'user:{user_id}')
+
+
+# Per-club stamp covering the counters on a club's row (version,
+# events_version, trending score), which its members, messages and events
+# move without saving the club itself, and the usernames its page lists. Saving or deleting a club still bumps
+# the Club generation, as that changes club lists too.
+def get_club_stamp(club_id):
+    return get_stamp(f'club:{club_id}')
+
+
+def bump_club_stamp(club_id):
+    bump_stamp(f'club:{club_id}')
+
+
+# Per-event stamp, likewise for the counters on an event's row (version,
+# registrant_count, series_end), which registrations, teams and occurrence
+# exceptions move.
+def get_event_stamp(event_id):
+    return get_stamp(f'event:{event_id}')
+
+
+def bump_event_stamp(event_id):
+    bump_stamp(f'event:{event_id}')
+
+
+# Read-through helpers
+def _full_key(key, models):
+    generations = get_generations(models)
+    return 'cms:%s:%s' % (key, '.'.join(str(g) for g in generations))
+
+
+def cached(key, models, builder, timeout=None):
+    full_key = _full_key(key, models)
+
+    value = local_cache.get(full_key)
+    if value is not MISSING:
+        CACHE_REQUESTS.inc(tier='local', result='hit')
+        return value
+    CACHE_REQUESTS.inc(tier='local', result='miss')
+
+    value = shared_cache.get(full_key, MISSING)
+    if value is MISSING:
+        CACHE_REQUESTS.inc(tier='shared', result='miss')
+        value = builder()
+        shared_cache.set(full_key, value, timeout)
+    else:
+        CACHE_REQUESTS.inc(tier='shared', result='hit')
+    local_cache.set(full_key, value)
+    return value
+
+
+def is_cached(key, models):
+    # Whether cached() would find `key` without building it
+    full_key = _full_key(key, models)
+    return local_cache.get(full_key) is not MISSING or shared_cache.get(full_key, MISSING) is not MISSING
+
+
+def cached_list(key, models, queryset, timeout=None):
+    return cached(key, models, lambda: list(queryset), timeout)
+
+
+def get_club(club_id):
+    return cached(f'club:{club_id}:{get_club_stamp(club_id)}', [Club],
+                  lambda: Club.objects.filter(pk=club_id).first())
+
+
+def get_club_or_404(club_id):
+    club = get_club(club_id)
+    if club is None:
+        raise Http404('No Club matches the given query.')
+    return club
+
+
+def get_event(event_id):
+    event = cached(f'event:{event_id}:{get_event_stamp(event_id)}', [Event],
+                   lambda: Event.objects.filter(pk=event_id).first())
+    club = get_club(event.club_id) if event is not None else None
+    if club is None:
+        return None
+    # The club is cached under its own stamp; attach it to a copy, as the
+    # cached event is shared
+    event = copy.copy(event)
+    event.club = club
+    return event
+
+
+def get_event_or_404(event_id):
+    event = get_event(event_id)
+    if event is None:
+        raise Http404('No Event matches the given query.')
+    return event
+
+
+def next_event_start(club_id):
+    # Start of the club's next upcoming event. Any change to the club's events
+    # bumps its stamp. Events stop being upcoming as they start, so a value
+    # already in the past is rebuilt under a key that records which start it
+    # replaces.
+    def build():
+        upcoming = recurrence.upcoming(Event.objects.filter(club_id=club_id), timezone.now(), 1)
+        return upcoming[0].start_date if upcoming else None
+
+    key = f'next_event_start:{club_id}:{get_club_stamp(club_id)}'
+    start = cached(key, [], build)
+    while start is not None and start <= timezone.now():
+        start = cached(f'{key}:{start.timestamp()}', [], build)
+    return start
+
+
+def get_profile(user):
+    # Same contract as UserProfile.objects.get(user=user)
+    user_id = getattr(user, 'pk', user)
+    profile = cached(f'profile:{user_id}:{get_user_stamp(user_id)}', [],
+                     lambda: UserProfile.objects.filter(user_id=user_id).first())
+    if profile is None:
+        raise UserProfile.DoesNotExist('UserProfile matching query does not exist.')
+    return profile
+
+
+def top_clubs_by_members(limit):
+    return cached_list(f'top_clubs_by_members:{limit}', [Club, ClubMembership],
+                       Club.objects.annotate(member_count=Count('clubmembership')).order_by('-member_count')[:limit])
+
+
+def top_clubs_by_events(limit):
+    return cached_list(f'top_clubs_by_events:{limit}', [Club, Event],
+                       Club.objects.annotate(event_count=Count('events')).order_by('-event_count')[:limit])
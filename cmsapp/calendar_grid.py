@@ -0,0 +1,150 @@
+"""
+Month and week calendar grids of club events.
+
+A grid covers whole weeks, Monday first. Its events come from one range query
+over the grid's days (Event.start_date and series_end bound it, see
+cmsapp.recurrence), and the occurrences, already sorted by start, are dropped
+into their days in a single pass; an occurrence running past midnight goes
+into every day it touches.
+
+Rendered grids are cached per visibility scope. As with the iCalendar feeds,
+the key is a digest of the (club id, events_version) stamps of the clubs the
+viewer sees, so everyone who sees the same clubs shares an entry and any
+event change in one of those clubs moves the key. After a grid is shown its
+neighbours are rendered by a background task if they are not cached yet, so
+paging through the calendar is served from the cache.
+"""
+import calendar
+import hashlib
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache as shared_cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import recurrence
+from .cache import cached, is_cached
+from .models import Club, ClubMembership, Event
+
+MONTH = 'month'
+WEEK = 'week'
+# Stamped entries are superseded rather than invalidated; this only lets the
+# shared cache drop grids nobody reads any more
+CACHE_TIMEOUT = 24 * 60 * 60
+# How long a queued prefetch keeps others from queueing the same grid
+PREFETCH_LOCK_SECONDS = 300
+# Dates further from today than this are not served
+MAX_YEARS_AWAY = 50
+
+
+class Period:
+    """A calendar month or week, identified by its first day."""
+
+    def __init__(self, kind, first):
+        self.kind = kind
+        self.first = first
+
+    @classmethod
+    def parse(cls, kind, value, today):
+        # `value` is YYYY-MM-DD or, for months, YYYY-MM; anything else means today
+        day = today
+        for fmt in ('%Y-%m-%d', '%Y-%m'):
+            try:
+                day = datetime.strptime(value or '', fmt).date()
+                break
+            except ValueError:
+                continue
+        if abs(day.year - today.year) > MAX_YEARS_AWAY:
+            day = today
+        if kind == WEEK:
+            return cls(WEEK, day - timedelta(days=day.weekday()))
+        return cls(MONTH, day.replace(day=1))
+
+    @property
+    def param(self):
+        return self.first.strftime('%Y-%m' if self.kind == MONTH else '%Y-%m-%d')
+
+    def weeks(self):
+        if self.kind == WEEK:
+            return [[self.first + timedelta(days=offset) for offset in range(7)]]
+        return calendar.Calendar(calendar.MONDAY).monthdatescalendar(self.first.year, self.first.month)
+
+    def previous(self):
+        if self.kind == WEEK:
+            return Period(WEEK, self.first - timedelta(days=7))
+        return Period(MONTH, (self.first - timedelta(days=1)).replace(day=1))
+
+    def next(self):
+        if self.kind == WEEK:
+            return Period(WEEK, self.first + timedelta(days=7))
+        return Period(MONTH, (self.first + timedelta(days=31)).replace(day=1))
+
+    def __repr__(self):
+        return f'<Period {self.kind} {self.param}>'
+
+
+def scope_stamps(user, is_admin):
+    # (club id, events_version) of every club whose events the user sees
+    if is_admin:
+        return sorted(Club.objects.values_list('pk', 'events_version'))
+    return sorted(ClubMembership.objects.filter(user=user).values_list('club_id', 'club__events_version'))
+
+
+def club_stamps(club_ids):
+    # The same stamps, read from the clubs themselves; None means every club
+    clubs = Club.objects.all() if club_ids is None else Club.objects.filter(pk__in=club_ids)
+    return sorted(clubs.values_list('pk', 'events_version'))
+
+
+def cache_key(period, stamps):
+    digest = hashlib.sha1(repr(stamps).encode()).hexdigest()[:20]
+    return f'calendar:{period.kind}:{period.param}:{timezone.get_current_timezone_name()}:{digest}'
+
+
+def bucket(occurrences, days):
+    # Occurrences per day of the consecutive `days`, in one pass
+    buckets = [[] for _ in days]
+    first = days[0]
+    for item in occurrences:
+        start_day = timezone.localtime(item.start_date).date()
+        last_moment = max(item.start_date, item.end_date - timedelta(microseconds=1))
+        last_day = timezone.localtime(last_moment).date()
+        for offset in range(max((start_day - first).days, 0), min((last_day - first).days, len(days) - 1) + 1):
+            buckets[offset].append(item)
+    return buckets
+
+
+def render_grid(period, club_ids):
+    weeks = period.weeks()
+    days = [day for week in weeks for day in week]
+    start = timezone.make_aware(datetime.combine(days[0], time.min))
+    end = timezone.make_aware(datetime.combine(days[-1] + timedelta(days=1), time.min))
+    events = Event.objects.all() if club_ids is None else Event.objects.filter(club_id__in=club_ids)
+    occurrences = recurrence.occurrences_between(events.select_related('club'), start, end)
+    buckets = iter(bucket(occurrences, days))
+    grid = [
+        [{'date': day, 'occurrences': next(buckets), 'outside': period.kind == MONTH and day.month != period.first.month}
+         for day in week]
+        for week in weeks
+    ]
+    return render_to_string('cmsapp/calendar_grid.html', {'period': period, 'weeks': grid})
+
+
+def get_grid(period, stamps, club_ids):
+    # club_ids must be the clubs of `stamps`, or None when they are every club
+    return cached(cache_key(period, stamps), [], lambda: render_grid(period, club_ids), CACHE_TIMEOUT)
+
+
+def prefetch(period, stamps, club_ids):
+    # Queue a background render of `period` unless it is cached or already queued
+    key = cache_key(period, stamps)
+    if is_cached(key, []) or not shared_cache.add(f'cms:{key}:queued', True, PREFETCH_LOCK_SECONDS):
+        return False
+    from .tasks import prefetch_calendar
+    prefetch_calendar.delay(period.kind, period.param, club_ids)
+    return True
+
+
+def warm(kind, value, club_ids):
+    period = Period.parse(kind, value, timezone.localdate())
+    get_grid(period, club_stamps(club_ids), club_ids)
@@ -0,0 +1,230 @@
+"""
+Change feed for downstream sync.
+
+Every insert, update and delete of a tracked model (Club, Event,
+ClubMembership, EventRegistration, Message) appends a ChangeLogEntry whose id
+is the change sequence number. A consumer keeps the last number it has seen
+and asks for what came after it, so a sync costs time in proportion to what
+changed rather than to the size of the tables.
+
+Entries are recorded from post_save/post_delete (see cmsapp.signals) and by
+the code paths that bypass signals (event imports, message archiving), in
+the same transaction as the change, so a rolled-back change never appears.
+Sequence numbers are handed out at insert time. This relies on SQLite
+serializing writers: a transaction holds the write lock from its first write
+until it commits, so entries commit in sequence order. On a database with
+concurrent writers they can commit out of order, and changes_since() holds
+back entries younger than SETTLE_SECONDS for that case; a change is then
+only seen for certain if its transaction commits within SETTLE_SECONDS of
+recording it. The code paths that write many rows record their entries last
+for this reason. A transaction that stays open longer could commit below a
+cursor that has already moved past it, and its consumer would miss it.
+
+Within a page each object appears once, with its current fields (None for
+deletes, and for objects deleted since). Its action is the strongest of its
+entries: a delete wins, and an object inserted within the page stays an
+insert however often it was updated after. Counters kept with update()
+(versions, registrant counts, trending scores) are not changes of their own.
+
+Entries older than KEEP_DAYS are purged by the export_changes command, which
+records how far it purged (ChangeLogPurge). A new consumer, or one whose
+cursor is below that mark, starts over from snapshot(): every current object
+as an insert, together with the sequence number to follow the feed from.
+"""
+import json
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeLogEntry, ChangeLogPurge, Club, ClubMembership, Event, EventRegistration, Message
+
+DEFAULTS = {
+    'PAGE_SIZE': 1000,
+    'MAX_PAGE_SIZE': 10000,
+    # Entries younger than this are not served yet
+    'SETTLE_SECONDS': 1,
+    'KEEP_DAYS': 30,
+}
+
+CHUNK_SIZE = 500
+
+TRACKED = {
+    Club: 'club',
+    Event: 'event',
+    ClubMembership: 'membership',
+    EventRegistration: 'registration',
+    Message: 'message',
+}
+MODELS = {name: model for model, name in TRACKED.items()}
+
+# Fields sent with each change
+FIELDS = {
+    'club': ['id', 'name', 'description', 'created_by_id', 'created_at', 'is_approved', 'logo'],
+    'event': [
+        'id', 'club_id', 'title', 'description', 'location', 'start_date', 'end_date',
+        'recurrence', 'recurrence_interval', 'recurrence_until', 'registration_type',
+        'created_by_id', 'created_at',
+    ],
+    'membership': ['id', 'club_id', 'user_id', 'is_leader', 'date_joined'],
+    'registration': ['id', 'event_id', 'user_id', 'occurrence', 'team_id', 'registration_date'],
+    'message': ['id', 'club_id', 'sender_id', 'content', 'timestamp'],
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_CHANGES', {}))
+    return config
+
+
+class ChangeLogExpired(LookupError):
+    def __init__(self, since, latest):
+        super().__init__(f'The change log no longer reaches back to sequence number {since}.')
+        self.latest = latest
+
+
+def record_many(model, ids, action):
+    # Call inside the transaction making the change
+    name = TRACKED[model]
+    now = timezone.now()
+    ChangeLogEntry.objects.bulk_create(
+        [ChangeLogEntry(model=name, object_id=object_id, action=action, timestamp=now) for object_id in ids],
+        batch_size=CHUNK_SIZE,
+    )
+
+
+def record(model, object_id, action):
+    record_many(model, [object_id], action)
+
+
+def purged_through():
+    return ChangeLogPurge.objects.aggregate(through=Max('through'))['through'] or 0
+
+
+def latest_sequence():
+    latest = ChangeLogEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return max(latest, purged_through())
+
+
+def _settled_sequence(config):
+    # The newest sequence number below which no entry is still settling
+    cutoff = timezone.now() - timedelta(seconds=config['SETTLE_SECONDS'])
+    settled = ChangeLogEntry.objects.filter(timestamp__lte=cutoff).order_by('-id').values_list('id', flat=True).first()
+    return max(settled or 0, purged_through())
+
+
+class _Changes:
+    def ndjson(self):
+        for change in self:
+            yield json.dumps(change, cls=DjangoJSONEncoder) + '\n'
+
+
+class ChangePage(_Changes):
+    def __init__(self, rows, next_since, has_more):
+        # rows: (seq, model, object_id, action, timestamp), one per object, by seq
+        self.rows = rows
+        self.next_since = next_since
+        self.has_more = has_more
+
+    def __iter__(self):
+        # Reads the current fields of CHUNK_SIZE objects at a time
+        for start in range(0, len(self.rows), CHUNK_SIZE):
+            chunk = self.rows[start:start + CHUNK_SIZE]
+            wanted = defaultdict(list)
+            for _, model, object_id, action, _ in chunk:
+                if action != ChangeLogEntry.DELETE:
+                    wanted[model].append(object_id)
+            found = {}
+            for model, ids in wanted.items():
+                for values in MODELS[model].objects.filter(pk__in=ids).order_by().values(*FIELDS[model]):
+                    found[model, values['id']] = values
+            for seq, model, object_id, action, timestamp in chunk:
+                yield {
+                    'seq': seq,
+                    'model': model,
+                    'id': object_id,
+                    'action': action,
+                    'timestamp': timestamp,
+                    'data': found.get((model, object_id)),
+                }
+
+
+class Snapshot(_Changes):
+    def __init__(self, models, next_since):
+        self.models = models
+        self.next_since = next_since
+
+    def __iter__(self):
+        for model in self.models:
+            rows = MODELS[model].objects.order_by('pk').values(*FIELDS[model]).iterator(chunk_size=CHUNK_SIZE)
+            for values in rows:
+                yield {
+                    'seq': self.next_since,
+                    'model': model,
+                    'id': values['id'],
+                    'action': ChangeLogEntry.INSERT,
+                    'timestamp': None,
+                    'data': values,
+                }
+
+
+def changes_since(since, limit=None, models=None, config=None):
+    """
+    The changes after sequence number `since`, at most `limit` entries'
+    worth. Raises ChangeLogExpired if entries after `since` have been purged.
+    """
+    config = config or get_config()
+    limit = max(1, min(limit or config['PAGE_SIZE'], config['MAX_PAGE_SIZE']))
+    if since < purged_through():
+        raise ChangeLogExpired(since, latest_sequence())
+
+    entries = ChangeLogEntry.objects.filter(id__gt=since)
+    if models:
+        entries = entries.filter(model__in=models)
+    rows = list(entries.order_by('id').values_list('id', 'model', 'object_id', 'action', 'timestamp')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    cutoff = timezone.now() - timedelta(seconds=config['SETTLE_SECONDS'])
+    for position, row in enumerate(rows):
+        if row[4] > cutoff:
+            rows, has_more = rows[:position], True
+            break
+
+    latest = {}
+    for row in rows:
+        previous = latest.get((row[1], row[2]))
+        if previous is not None and previous[3] == ChangeLogEntry.INSERT and row[3] == ChangeLogEntry.UPDATE:
+            row = row[:3] + (ChangeLogEntry.INSERT,) + row[4:]
+        latest[row[1], row[2]] = row
+    return ChangePage(sorted(latest.values()), rows[-1][0] if rows else since, has_more)
+
+
+def snapshot(models=None, config=None):
+    """
+    Every current object of `models` (default: all tracked models) as an
+    insert. Following the feed from the snapshot's next_since afterwards
+    misses nothing: the number is taken before the objects are read, so
+    changes made meanwhile are at worst delivered twice.
+    """
+    config = config or get_config()
+    return Snapshot(models or list(MODELS), _settled_sequence(config))
+
+
+def purge(config=None):
+    config = config or get_config()
+    cutoff = timezone.now() - timedelta(days=config['KEEP_DAYS'])
+    expired = ChangeLogEntry.objects.filter(timestamp__lt=cutoff)
+    with transaction.atomic():
+        through = expired.aggregate(through=Max('id'))['through']
+        if through is None:
+            return 0
+        # Entries are purged by age, so raise the mark to the newest one gone
+        deleted, _ = ChangeLogEntry.objects.filter(id__lte=through).delete()
+        ChangeLogPurge.objects.create(through=through)
+        ChangeLogPurge.objects.filter(through__lt=through).delete()
+    return deleted
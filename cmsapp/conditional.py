@@ -0,0 +1,51 @@
+"""
+ETags for the club and event detail pages, for use with
+django.views.decorators.http.condition.
+
+Each ETag is computed from cached values only (the club/event version
+counters, the club stamp, the user's role and layout stamp), so a revalidation that ends in
+304 Not Modified runs no queries of its own. No ETag is produced while flash
+messages are waiting to be shown, since a 304 would swallow them.
+"""
+import hashlib
+
+from django.contrib import messages
+from django.utils import timezone
+
+from . import recurrence
+from .cache import get_club, get_club_stamp, get_event, get_profile, get_user_stamp, next_event_start
+from .models import UserProfile
+
+
+def _page_etag(request, *parts):
+    if not request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    try:
+        role = get_profile(request.user).role
+    except UserProfile.DoesNotExist:
+        return None
+    # The CSRF secret is embedded in the page's forms
+    key = (request.user.pk, role, get_user_stamp(request.user.pk), request.META.get('CSRF_COOKIE')) + parts
+    return hashlib.sha1(repr(key).encode()).hexdigest()[:24]
+
+
+def club_detail_etag(request, club_id):
+    club = get_club(club_id)
+    if club is None:
+        return None
+    # The club stamp also moves when a listed member is renamed
+    return _page_etag(
+        request, 'club', club.pk, club.version, get_club_stamp(club.pk), next_event_start(club.pk),
+    )
+
+
+def event_detail_etag(request, event_id):
+    event = get_event(event_id)
+    if event is None:
+        return None
+    # A recurring event's page lists its next sessions, which move on as they end
+    next_session = recurrence.next_index(event, timezone.now()) if event.recurrence else None
+    return _page_etag(
+        request, 'event', event.pk, event.version, event.club.version, event.is_closed, next_session,
+        request.GET.get('cursor'),
+    )
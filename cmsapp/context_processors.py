@@ -0,0 +1,15 @@
+from .cache import get_profile, get_user_stamp
+from .models import UserProfile
+
+
+def layout(request):
+    # Role and version stamp used to key the cached navbar in base.html
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'layout_role': '', 'layout_stamp': 0}
+
+    try:
+        role = get_profile(user).role
+    except UserProfile.DoesNotExist:
+        role = ''
+    return {'layout_role': role, 'layout_stamp': get_user_stamp(user.pk)}
@@ -0,0 +1,152 @@
+"""
+Daily digest of club activity, one email per member.
+
+build_digests() makes a single pass over the period's activity: the new
+messages and events are streamed once, ordered by club, into per-club
+summaries, and the memberships of just those clubs fan the summaries out to
+members in memory. Join-request decisions go to the users who asked. The
+cost grows with the amount of activity, not with members x clubs, and a
+club's summary is built once however many members it has.
+
+Recipients are resolved and mailed CHUNK_SIZE at a time, so one
+send_mass_mail connection carries a whole chunk.
+"""
+from collections import defaultdict, deque
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import send_mass_mail
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Club, ClubJoinRequest, ClubMembership, Event, Message
+
+DEFAULTS = {
+    'CHUNK_SIZE': 200,
+    # Newest messages quoted per club; the rest are only counted
+    'MESSAGES_PER_CLUB': 5,
+    'FROM_EMAIL': None,
+    # Prefix for links in the email, e.g. 'https://clubs.example.edu'
+    'SITE_URL': '',
+}
+
+# Keeps id__in lists well under the database's bound-parameter limit
+ID_BATCH = 500
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_DIGEST', {}))
+    return config
+
+
+def day_window(day):
+    # [local midnight, next local midnight) of a date
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def _batches(ids, size=ID_BATCH):
+    ids = sorted(ids)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+class ClubActivity:
+    def __init__(self, club_id, messages_kept):
+        self.club_id = club_id
+        self.name = ''
+        self.message_count = 0
+        self.messages = deque(maxlen=messages_kept)
+        self.events = []
+
+    @property
+    def more_messages(self):
+        return self.message_count - len(self.messages)
+
+
+class Digest:
+    def __init__(self, user_id, username, email, clubs, decisions):
+        self.user_id = user_id
+        self.username = username
+        self.email = email
+        self.clubs = clubs
+        self.decisions = decisions
+
+
+def _club_activity(since, until, config):
+    clubs = {}
+
+    def activity(club_id):
+        if club_id not in clubs:
+            clubs[club_id] = ClubActivity(club_id, config['MESSAGES_PER_CLUB'])
+        return clubs[club_id]
+
+    messages = (
+        Message.objects.filter(timestamp__gte=since, timestamp__lt=until)
+        .order_by('club_id', 'timestamp', 'id')
+        .values_list('club_id', 'sender__username', 'content', 'timestamp')
+    )
+    for club_id, sender, content, timestamp in messages.iterator(chunk_size=2000):
+        club = activity(club_id)
+        club.message_count += 1
+        club.messages.append({'sender': sender, 'content': content, 'timestamp': timestamp})
+
+    events = (
+        Event.objects.filter(created_at__gte=since, created_at__lt=until)
+        .order_by('club_id', 'start_date', 'id')
+        .values('club_id', 'id', 'title', 'start_date', 'location')
+    )
+    for event in events.iterator(chunk_size=2000):
+        activity(event['club_id']).events.append(event)
+
+    for batch in _batches(clubs):
+        for club_id, name in Club.objects.filter(id__in=batch).values_list('id', 'name'):
+            clubs[club_id].name = name
+    return clubs
+
+
+def build_digests(since, until, config=None):
+    config = config or get_config()
+    clubs = _club_activity(since, until, config)
+
+    by_user = defaultdict(list)
+    for batch in _batches(clubs):
+        memberships = ClubMembership.objects.filter(club_id__in=batch).values_list('user_id', 'club_id')
+        for user_id, club_id in memberships.iterator(chunk_size=2000):
+            by_user[user_id].append(clubs[club_id])
+
+    decisions = defaultdict(list)
+    decided = (
+        ClubJoinRequest.objects.filter(decided_at__gte=since, decided_at__lt=until)
+        .values_list('user_id', 'club__name', 'is_approved')
+    )
+    for user_id, club_name, approved in decided.iterator():
+        decisions[user_id].append({'club': club_name, 'approved': approved})
+
+    for batch in _batches(by_user.keys() | decisions.keys(), config['CHUNK_SIZE']):
+        users = (
+            User.objects.filter(id__in=batch, is_active=True, profile__email_digest=True)
+            .exclude(email='').order_by('id').values_list('id', 'username', 'email')
+        )
+        yield [
+            Digest(user_id, username, email, sorted(by_user[user_id], key=lambda club: club.name), decisions[user_id])
+            for user_id, username, email in users
+        ]
+
+
+def send_digests(since, until, config=None, dry_run=False):
+    config = config or get_config()
+    from_email = config['FROM_EMAIL'] or settings.DEFAULT_FROM_EMAIL
+    subject = f'Your club digest for {timezone.localtime(since):%b %d}'
+    site_url = config['SITE_URL'].rstrip('/')
+    sent = 0
+    for chunk in build_digests(since, until, config):
+        mails = [
+            (subject, render_to_string('cmsapp/email/digest.txt', {'digest': digest, 'site_url': site_url}),
+             from_email, [digest.email])
+            for digest in chunk
+        ]
+        sent += len(mails) if dry_run else send_mass_mail(mails)
+    return sent
@@ -0,0 +1,476 @@
+"""
+Bulk import of events from CSV and iCalendar (.ics) files.
+
+CSV files need a header row with the columns title, start, end and location;
+description, recurrence (daily, weekly or monthly), interval and until are
+optional. Times are ISO 8601 and in local time unless they carry an offset.
+In .ics files every VEVENT becomes an event; RRULEs are imported when they
+map onto the repeat rules events support (see cmsapp.recurrence), with
+EXDATEs becoming cancelled occurrences.
+
+Both parsers read the file a line at a time and yield one candidate per CSV
+row or VEVENT, so memory use follows BATCH_SIZE rather than the size of the
+file. Candidates are validated a batch at a time: the field checks run no
+queries, and the venue check for a whole batch is one range query plus an
+interval tree (scheduling.batch_venue_conflicts). Whether the user may add
+events to the club is checked once, before the file is read.
+
+Valid events are written with bulk_create, a batch at a time, inside one
+transaction; a dry run does the same work and rolls it back. bulk_create
+skips the model signals, so the import sets Event.series_end itself, records
+the new events in the change feed, and bumps the club's version,
+events_version and trending score and the cache generations once for the
+whole file. Invalid rows are skipped and reported with their line numbers.
+"""
+import codecs
+import csv
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import changes, recurrence, scheduling, trending
+from .cache import bump_club_stamp, bump_generation, get_profile
+from .models import ChangeLogEntry, Club, ClubMembership, Event, EventOccurrenceException
+
+BATCH_SIZE = 1000
+MAX_INTERVAL = 365
+
+CSV = 'csv'
+ICS = 'ics'
+
+# CSV header names, with the model field names accepted as aliases
+CSV_COLUMNS = {
+    'title': 'title',
+    'description': 'description',
+    'location': 'location',
+    'start': 'start',
+    'start_date': 'start',
+    'end': 'end',
+    'end_date': 'end',
+    'recurrence': 'recurrence',
+    'interval': 'interval',
+    'recurrence_interval': 'interval',
+    'until': 'until',
+    'recurrence_until': 'until',
+}
+REQUIRED_COLUMNS = {'title', 'start', 'end', 'location'}
+
+ICS_FREQUENCIES = {'DAILY': recurrence.DAILY, 'WEEKLY': recurrence.WEEKLY, 'MONTHLY': recurrence.MONTHLY}
+ICS_WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+ICS_DURATION = re.compile(r'^P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+# Fields taken from the file; the rest are set by the import
+IMPORTED_FIELDS = {'title', 'start_date', 'end_date', 'location', 'recurrence', 'recurrence_interval', 'recurrence_until'}
+
+
+class InvalidImportFile(ValueError):
+    pass
+
+
+class Candidate:
+    """One CSV row or VEVENT, before validation."""
+
+    def __init__(self, line):
+        self.line = line
+        self.fields = {'description': '', 'recurrence': '', 'recurrence_interval': 1, 'recurrence_until': None}
+        self.errors = []
+        # From iCalendar files: RRULE COUNT, and EXDATE start times
+        self.count = None
+        self.exdates = []
+        # Occurrence indexes to store as cancelled
+        self.cancelled = set()
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        # (line number, message), in file order
+        self.errors = []
+
+    @property
+    def skipped(self):
+        return self.rows - self.created
+
+
+def format_for(filename):
+    return ICS if filename.lower().endswith(('.ics', '.ical', '.ifb')) else CSV
+
+
+def can_import(user, club):
+    return get_profile(user).role == 'admin' or ClubMembership.objects.filter(user=user, club=club, is_leader=True).exists()
+
+
+# CSV
+def _parse_moment(value):
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        return None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_csv(lines):
+    reader = csv.reader(lines)
+    try:
+        header = next(reader, None)
+        if header is None:
+            raise InvalidImportFile('The file is empty.')
+        columns = [CSV_COLUMNS.get(name.strip().lower().replace(' ', '_')) for name in header]
+        missing = REQUIRED_COLUMNS - set(columns)
+        if missing:
+            raise InvalidImportFile(f'The header row is missing {", ".join(sorted(missing))}.')
+
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            candidate = Candidate(reader.line_num)
+            values = {column: cell.strip() for column, cell in zip(columns, row) if column}
+            candidate.fields.update(
+                title=values.get('title', ''),
+                description=values.get('description', ''),
+                location=values.get('location', ''),
+            )
+            for column, field in (('start', 'start_date'), ('end', 'end_date')):
+                candidate.fields[field] = _parse_moment(values.get(column, ''))
+                if candidate.fields[field] is None:
+                    candidate.errors.append(f'"{values.get(column, "")}" is not a valid {column} date and time.')
+
+            rule = values.get('recurrence', '').lower()
+            if rule not in ('', 'none', recurrence.DAILY, recurrence.WEEKLY, recurrence.MONTHLY):
+                candidate.errors.append(f'"{rule}" is not a valid recurrence; use daily, weekly or monthly.')
+            candidate.fields['recurrence'] = '' if rule == 'none' else rule
+            if values.get('interval'):
+                try:
+                    candidate.fields['recurrence_interval'] = int(values['interval'])
+                except ValueError:
+                    candidate.errors.append(f'"{values["interval"]}" is not a valid interval.')
+            if values.get('until'):
+                try:
+                    candidate.fields['recurrence_until'] = parse_date(values['until'])
+                except ValueError:
+                    candidate.fields['recurrence_until'] = None
+                if candidate.fields['recurrence_until'] is None:
+                    candidate.errors.append(f'"{values["until"]}" is not a valid until date.')
+            yield candidate
+    except csv.Error as exc:
+        raise InvalidImportFile(f'Line {reader.line_num}: {exc}') from exc
+
+
+# iCalendar
+def _unfold(lines):
+    # (line number, content line), joining folded continuation lines
+    current, start = None, 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if current is not None and line[:1] in (' ', '\t'):
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def _split_property(line):
+    # NAME;PARAM=value:VALUE -> (NAME, {PARAM: value}, VALUE), or None
+    quoted = False
+    for position, char in enumerate(line):
+        if char == '"':
+            quoted = not quoted
+        elif char == ':' and not quoted:
+            break
+    else:
+        return None
+    name, *params = line[:position].split(';')
+    parsed = {}
+    for param in params:
+        key, _, value = param.partition('=')
+        parsed[key.upper()] = value.strip('"')
+    return name.upper(), parsed, line[position + 1:]
+
+
+def _unescape(text):
+    out = []
+    chars = iter(text)
+    for char in chars:
+        if char == '\\':
+            char = next(chars, '')
+            out.append('\n' if char in ('n', 'N') else char)
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+def _ics_moment(value, params):
+    # (aware datetime, whether it is a whole day); TZIDs this system does
+    # not know are read as local time
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        day = datetime.strptime(value, '%Y%m%d').date()
+        return timezone.make_aware(datetime.combine(day, time.min)), True
+    if value.endswith('Z'):
+        return datetime.strptime(value[:-1], '%Y%m%dT%H%M%S').replace(tzinfo=dt_timezone.utc), False
+    zone = None
+    if params.get('TZID'):
+        try:
+            zone = ZoneInfo(params['TZID'])
+        except (ZoneInfoNotFoundError, ValueError):
+            zone = None
+    return timezone.make_aware(datetime.strptime(value, '%Y%m%dT%H%M%S'), zone), False
+
+
+def _ics_duration(value):
+    match = ICS_DURATION.match(value.strip().lstrip('+'))
+    if not match or not any(match.groups()):
+        raise ValueError(value)
+    weeks, days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return timedelta(weeks=weeks, days=days, hours=hours, minutes=minutes, seconds=seconds)
+
+
+def _apply_rrule(candidate, value, start):
+    parts = {}
+    for part in value.split(';'):
+        key, _, setting = part.partition('=')
+        parts[key.strip().upper()] = setting.strip().upper()
+
+    frequency = ICS_FREQUENCIES.get(parts.pop('FREQ', ''))
+    if frequency is None:
+        candidate.errors.append('Only daily, weekly and monthly RRULEs can be imported.')
+        return
+    candidate.fields['recurrence'] = frequency
+    parts.pop('WKST', None)
+    local_start = timezone.localtime(start) if start else None
+    by_day = parts.pop('BYDAY', None)
+    if by_day and not (frequency == recurrence.WEEKLY and local_start and by_day == ICS_WEEKDAYS[local_start.weekday()]):
+        candidate.errors.append('BYDAY is only supported for the weekday a weekly event starts on.')
+    by_month_day = parts.pop('BYMONTHDAY', None)
+    if by_month_day and not (frequency == recurrence.MONTHLY and local_start and by_month_day == str(local_start.day)):
+        candidate.errors.append('BYMONTHDAY is only supported for the day a monthly event starts on.')
+    interval, until, count = parts.pop('INTERVAL', '1'), parts.pop('UNTIL', None), parts.pop('COUNT', None)
+    if parts:
+        candidate.errors.append(f'Unsupported RRULE part: {", ".join(sorted(parts))}.')
+
+    try:
+        candidate.fields['recurrence_interval'] = int(interval)
+        if until:
+            candidate.fields['recurrence_until'] = timezone.localtime(_ics_moment(until, {})[0]).date()
+        elif count:
+            candidate.count = int(count)
+        else:
+            candidate.errors.append('A repeating event needs an UNTIL or COUNT.')
+    except ValueError:
+        candidate.errors.append(f'"{value}" is not a valid RRULE.')
+
+
+def _ics_candidate(line, props):
+    candidate = Candidate(line)
+    if 'RECURRENCE-ID' in props:
+        candidate.errors.append('Changes to single occurrences (RECURRENCE-ID) cannot be imported.')
+        return candidate
+
+    def text(name):
+        return _unescape(props[name][1]).strip() if name in props else ''
+
+    candidate.fields.update(title=text('SUMMARY'), description=text('DESCRIPTION'), location=text('LOCATION'))
+    start = end = None
+    try:
+        if 'DTSTART' not in props:
+            candidate.errors.append('The event has no DTSTART.')
+            return candidate
+        params, value = props['DTSTART']
+        start, whole_day = _ics_moment(value, params)
+        if 'DTEND' in props:
+            params, value = props['DTEND']
+            end = _ics_moment(value, params)[0]
+        elif 'DURATION' in props:
+            end = start + _ics_duration(props['DURATION'][1])
+        else:
+            end = start + timedelta(days=1) if whole_day else start
+        for params, value in props.get('EXDATE', ()):
+            candidate.exdates.extend(_ics_moment(part, params)[0] for part in value.split(',') if part.strip())
+    except ValueError:
+        candidate.errors.append('The event has an invalid date or time.')
+    candidate.fields.update(start_date=start, end_date=end)
+    if 'RRULE' in props and start is not None:
+        _apply_rrule(candidate, props['RRULE'][1], start)
+    return candidate
+
+
+def parse_ics(lines):
+    candidate_line, props, depth = None, None, 0
+    started = False
+    for number, line in _unfold(lines):
+        if not line.strip():
+            continue
+        prop = _split_property(line)
+        if not started:
+            if prop is None or prop[0] != 'BEGIN' or prop[2].strip().upper() != 'VCALENDAR':
+                raise InvalidImportFile('The file is not an iCalendar file.')
+            started = True
+            continue
+        if prop is None:
+            continue
+        name, params, value = prop
+        if name == 'BEGIN':
+            if props is not None:
+                # A component inside the event, such as a VALARM
+                depth += 1
+            elif value.strip().upper() == 'VEVENT':
+                candidate_line, props, depth = number, {}, 1
+        elif name == 'END':
+            if props is not None:
+                depth -= 1
+                if depth == 0:
+                    yield _ics_candidate(candidate_line, props)
+                    props = None
+        elif props is not None and depth == 1:
+            if name == 'EXDATE':
+                props.setdefault('EXDATE', []).append((params, value))
+            else:
+                props[name] = (params, value)
+    if not started:
+        raise InvalidImportFile('The file is empty.')
+
+
+# Validation
+def _build(candidate, club, user):
+    # The Event for a candidate, or None after recording why it is invalid
+    if candidate.errors:
+        return None
+    event = Event(club=club, created_by=user, **candidate.fields)
+    try:
+        event.full_clean(exclude=[field.name for field in Event._meta.fields if field.name not in IMPORTED_FIELDS])
+    except ValidationError as exc:
+        for field, messages in exc.message_dict.items():
+            label = Event._meta.get_field(field).verbose_name.capitalize()
+            candidate.errors.extend(f'{label}: {message}' for message in messages)
+        return None
+    if event.end_date <= event.start_date:
+        candidate.errors.append('The event must end after it starts.')
+        return None
+    if not 1 <= event.recurrence_interval <= MAX_INTERVAL:
+        candidate.errors.append(f'The interval must be between 1 and {MAX_INTERVAL}.')
+        return None
+    if event.recurrence and candidate.count is not None:
+        if not 1 <= candidate.count <= recurrence.MAX_OCCURRENCES:
+            candidate.errors.append(f'A repeating event can have at most {recurrence.MAX_OCCURRENCES} occurrences.')
+            return None
+        event.recurrence_until = timezone.localtime(recurrence.rule_start(event, candidate.count - 1)).date()
+    error = recurrence.rule_error(event)
+    if error:
+        candidate.errors.append(error)
+        return None
+
+    event.series_end = recurrence.series_end(event)
+    if event.recurrence:
+        for moment in candidate.exdates:
+            for item in recurrence.expand([event], moment, moment + timedelta(microseconds=1), exceptions={}):
+                if item.start_date == moment:
+                    candidate.cancelled.add(item.index)
+    return event
+
+
+def _check_venues(batch):
+    # Drops the (candidate, event) pairs that clash with a stored event or
+    # with an earlier row of the file, which keeps its booking
+    intervals, owners = [], []
+    for position, (candidate, event) in enumerate(batch):
+        for item in recurrence.expand([event], exceptions={}):
+            if item.index not in candidate.cancelled:
+                intervals.append((event.location, item.start_date, item.end_date))
+                owners.append(position)
+    rejected = set()
+    for index, found in sorted(scheduling.batch_venue_conflicts(intervals).items()):
+        position = owners[index]
+        if position in rejected:
+            continue
+        for other in found:
+            if isinstance(other, int):
+                earlier = owners[other]
+                if earlier >= position or earlier in rejected:
+                    continue
+                message = f'{batch[position][1].location} is already booked by line {batch[earlier][0].line} of this file.'
+            else:
+                message = (
+                    f'{other.location} is already booked for "{other.title}" ({other.club.name}) from '
+                    f'{timezone.localtime(other.start_date):%b %d, %H:%M} to {timezone.localtime(other.end_date):%b %d, %H:%M}.'
+                )
+            batch[position][0].errors.append(message)
+            rejected.add(position)
+            break
+    return [pair for position, pair in enumerate(batch) if position not in rejected]
+
+
+def _write(batch):
+    events = Event.objects.bulk_create([event for _, event in batch], batch_size=BATCH_SIZE)
+    EventOccurrenceException.objects.bulk_create([
+        EventOccurrenceException(event=event, occurrence=index, is_cancelled=True)
+        for (candidate, _), event in zip(batch, events)
+        for index in sorted(candidate.cancelled)
+    ], batch_size=BATCH_SIZE)
+    return [event.pk for event in events]
+
+
+def _touch_club(club, count):
+    # What the Event post_save signals would have done, once for `count` events
+    Club.objects.filter(pk=club.pk).update(
+        version=F('version') + 1,
+        events_version=F('events_version') + 1,
+        events_updated_at=timezone.now(),
+        **trending.bump_changes('event', count=count),
+    )
+    transaction.on_commit(lambda: bump_generation(Event))
+    transaction.on_commit(lambda: bump_club_stamp(club.pk))
+    transaction.on_commit(trending.scores_changed)
+
+
+def import_events(stream, file_format, club, user, dry_run=False):
+    """
+    Import the events in `stream` (an iterable of byte lines, such as an
+    uploaded or opened binary file) into `club`. Raises PermissionDenied if
+    `user` may not add events to the club and InvalidImportFile if the file
+    cannot be read at all; problems with single rows go into the report.
+    """
+    if not can_import(user, club):
+        raise PermissionDenied('Only club leaders and admins can import events.')
+    parse = parse_ics if file_format == ICS else parse_csv
+    candidates = parse(codecs.iterdecode(stream, 'utf-8-sig'))
+    report = ImportReport(dry_run)
+    created = []
+    try:
+        with transaction.atomic():
+            while batch := list(islice(candidates, BATCH_SIZE)):
+                report.rows += len(batch)
+                valid = _check_venues([
+                    (candidate, event) for candidate in batch
+                    if (event := _build(candidate, club, user)) is not None
+                ])
+                if valid:
+                    created.extend(_write(valid))
+                    report.created += len(valid)
+                report.errors.extend((candidate.line, message) for candidate in batch for message in candidate.errors)
+            if report.created:
+                # Recorded last, so the entries are not older than the
+                # transaction's commit by more than a moment (see cmsapp.changes)
+                changes.record_many(Event, created, ChangeLogEntry.INSERT)
+                _touch_club(club, report.created)
+            if dry_run:
+                transaction.set_rollback(True)
+    except UnicodeDecodeError as exc:
+        raise InvalidImportFile('The file is not UTF-8 text.') from exc
+    return report
@@ -0,0 +1,188 @@
+"""
+Streaming CSV/XLSX exports of event participants and club rosters.
+
+Row sources read with values_list() and .iterator(chunk_size=...), and the
+writers yield output as rows arrive, so memory use does not grow with the
+size of the export.
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import EventRegistration, ClubMembership, ClubJoinRequest
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo'):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, bool):
+        return 'Yes' if value else 'No'
+    return value
+
+
+# Spreadsheet applications run a cell starting with one of these as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    value = _format_value(value)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+# Row sources
+def event_participant_rows(event):
+    header = ['Username', 'First name', 'Last name', 'Email', 'Registered at', 'Team', 'Team leader']
+    rows = EventRegistration.objects.filter(event=event).order_by('registration_date', 'pk').values_list(
+        'user__username', 'user__first_name', 'user__last_name', 'user__email',
+        'registration_date', 'team__name', 'team__leader__username',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return header, rows
+
+
+def club_member_rows(club):
+    header = ['Username', 'First name', 'Last name', 'Email', 'Joined', 'Leader']
+    rows = ClubMembership.objects.filter(club=club).order_by('pk').values_list(
+        'user__username', 'user__first_name', 'user__last_name', 'user__email', 'date_joined', 'is_leader',
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return header, rows
+
+
+def club_join_request_rows(club):
+    header = ['Username', 'Email', 'Message', 'Requested at', 'Status']
+
+    def rows():
+        requests = ClubJoinRequest.objects.filter(club=club).order_by('pk').values_list(
+            'user__username', 'user__email', 'message', 'timestamp', 'is_approved', 'is_rejected',
+        ).iterator(chunk_size=CHUNK_SIZE)
+        for username, email, message, timestamp, is_approved, is_rejected in requests:
+            status = 'Approved' if is_approved else 'Rejected' if is_rejected else 'Pending'
+            yield username, email, message, timestamp, status
+
+    return header, rows()
+
+
+# Writers
+class _Echo:
+    # File-like object that hands back what is written to it
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+class _Sink:
+    # Write-only, unseekable buffer; zipfile falls back to streaming mode
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        value = _format_value(value)
+        if isinstance(value, int):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            text = escape(_INVALID_XML.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return '<row>%s</row>' % ''.join(cells)
+
+
+def stream_xlsx(header, rows, flush_every=500):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode())
+            for count, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode())
+                if count % flush_every == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+def export_response(filename, export_format, header, rows):
+    writer = stream_xlsx if export_format == 'xlsx' else stream_csv
+    response = StreamingHttpResponse(writer(header, rows), content_type=FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,131 @@
+"""
+Personal home feed: new messages and events across all of a user's clubs,
+newest first.
+
+Each club has a cached stream of its PAGE_SIZE + 1 newest items, stored under
+the club's version stamp (Club.version moves on every message or event
+change, see cmsapp.signals), so a stream is never stale and never needs
+deleting. A page is a k-way merge of the streams with heapq.merge, which
+holds one item per club in its heap however long the streams are. The
+user's first page is cached as well, under a digest of all their clubs'
+stamps, so rendering it costs the one indexed query that lists the clubs
+and their versions plus cache hits. Older pages are read straight from the
+database with a keyset condition.
+"""
+import base64
+import hashlib
+import heapq
+import json
+from datetime import datetime
+from itertools import islice
+
+from django.db.models import Q
+
+from .cache import cached
+from .models import ClubMembership, Event, Message
+
+PAGE_SIZE = 20
+# Version-stamped entries are superseded rather than invalidated; this only
+# lets the shared cache drop streams nobody reads any more
+CACHE_TIMEOUT = 24 * 60 * 60
+
+MESSAGE = 'message'
+EVENT = 'event'
+
+
+class InvalidFeedCursor(ValueError):
+    pass
+
+
+def _sort_key(item):
+    return (item['timestamp'], item['kind'], item['id'])
+
+
+def _messages(queryset):
+    rows = queryset.values('id', 'club_id', 'timestamp', 'content', 'sender__username')
+    return [dict(row, kind=MESSAGE, club_name=None) for row in rows]
+
+
+def _events(queryset):
+    rows = queryset.values('id', 'club_id', 'created_at', 'title', 'start_date', 'location', 'created_by__username')
+    return [dict(row, kind=EVENT, club_name=None, timestamp=row['created_at']) for row in rows]
+
+
+def club_stream(club_id, version):
+    def build():
+        # One more than a page, so a single busy club can still signal a next page
+        items = _messages(Message.objects.filter(club_id=club_id).order_by('-timestamp', '-id')[:PAGE_SIZE + 1])
+        items += _events(Event.objects.filter(club_id=club_id).order_by('-created_at', '-id')[:PAGE_SIZE + 1])
+        items.sort(key=_sort_key, reverse=True)
+        return items[:PAGE_SIZE + 1]
+    return cached(f'feed:club:{club_id}:{version}', [], build, CACHE_TIMEOUT)
+
+
+def merge(streams, limit):
+    return list(islice(heapq.merge(*streams, key=_sort_key, reverse=True), limit))
+
+
+def user_clubs(user):
+    # {club_id: (name, version)}; the only query a cached first page needs
+    rows = ClubMembership.objects.filter(user=user).values_list('club_id', 'club__name', 'club__version')
+    return {club_id: (name, version) for club_id, name, version in rows}
+
+
+def _with_club_names(items, clubs):
+    return [dict(item, club_name=clubs[item['club_id']][0]) for item in items if item['club_id'] in clubs]
+
+
+def first_page(user, clubs=None):
+    clubs = user_clubs(user) if clubs is None else clubs
+    stamps = repr(sorted((club_id, version) for club_id, (_, version) in clubs.items()))
+    digest = hashlib.sha1(stamps.encode()).hexdigest()[:16]
+
+    def build():
+        return merge([club_stream(club_id, version) for club_id, (_, version) in clubs.items()], PAGE_SIZE + 1)
+
+    items = cached(f'feed:user:{user.pk}:{digest}', [], build, CACHE_TIMEOUT)
+    return _page(items, clubs)
+
+
+def encode_cursor(item):
+    payload = [item['timestamp'].isoformat(), item['kind'], item['id']]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, kind, item_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(timestamp), str(kind), int(item_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidFeedCursor('Malformed feed cursor') from exc
+
+
+def _before(field, kind, cursor):
+    # Rows of one kind that sort after `cursor` in (timestamp, kind, id) descending order
+    timestamp, cursor_kind, item_id = cursor
+    if kind < cursor_kind:
+        return Q(**{f'{field}__lte': timestamp})
+    if kind > cursor_kind:
+        return Q(**{f'{field}__lt': timestamp})
+    return Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': item_id})
+
+
+def older_page(user, cursor, clubs=None):
+    clubs = user_clubs(user) if clubs is None else clubs
+    position = decode_cursor(cursor)
+    messages = _messages(
+        Message.objects.filter(_before('timestamp', MESSAGE, position), club_id__in=clubs)
+        .order_by('-timestamp', '-id')[:PAGE_SIZE + 1]
+    )
+    events = _events(
+        Event.objects.filter(_before('created_at', EVENT, position), club_id__in=clubs)
+        .order_by('-created_at', '-id')[:PAGE_SIZE + 1]
+    )
+    return _page(merge([messages, events], PAGE_SIZE + 1), clubs)
+
+
+def _page(items, clubs):
+    # items holds up to PAGE_SIZE + 1 entries; the extra one only signals a next page
+    items = _with_club_names(items, clubs)
+    next_cursor = encode_cursor(items[PAGE_SIZE - 1]) if len(items) > PAGE_SIZE else None
+    return items[:PAGE_SIZE], next_cursor
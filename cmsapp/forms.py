@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
+from django.utils import timezone
 from .models import UserProfile, Club, ClubJoinRequest, Event, Message, EventRegistration
+from . import recurrence, scheduling
 
 class UserRegisterForm(UserCreationForm):
     email = forms.EmailField()
@@ -47,12 +49,12 @@ class UserLoginForm(forms.Form):
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = UserProfile
-        fields = ['bio', 'profile_picture']
+        fields = ['bio', 'profile_picture', 'email_digest']
 
 class ClubForm(forms.ModelForm):
     class Meta:
         model = Club
-        fields = ['name', 'description', 'logo']
+        fields = ['name', 'description', 'logo', 'message_retention_days']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
         }
@@ -66,15 +68,58 @@ class ClubJoinRequestForm(forms.ModelForm):
         }
         
 class EventForm(forms.ModelForm):
+    recurrence_interval = forms.IntegerField(
+        min_value=1, max_value=365, required=False, initial=1,
+        help_text='Repeat every this many days, weeks or months.',
+    )
+
     class Meta:
         model = Event
-        fields = ['title', 'description', 'start_date', 'end_date', 'location', 'image']
+        fields = ['title', 'description', 'start_date', 'end_date', 'location', 'image',
+                  'recurrence', 'recurrence_interval', 'recurrence_until']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
             'start_date': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
             'end_date': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+            'recurrence_until': forms.DateInput(attrs={'type': 'date'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['recurrence_interval'] = cleaned_data.get('recurrence_interval') or 1
+        start, end, location = cleaned_data.get('start_date'), cleaned_data.get('end_date'), cleaned_data.get('location')
+        if start is None or end is None:
+            return cleaned_data
+        if end <= start:
+            self.add_error('end_date', 'The event must end after it starts.')
+            return cleaned_data
+
+        series = Event(
+            pk=self.instance.pk, start_date=start, end_date=end,
+            recurrence=cleaned_data.get('recurrence') or '',
+            recurrence_interval=cleaned_data['recurrence_interval'],
+            recurrence_until=cleaned_data.get('recurrence_until'),
+        )
+        error = recurrence.rule_error(series)
+        if error:
+            self.add_error('recurrence_until', error)
+            return cleaned_data
+
+        if location:
+            # The same venue cannot host two events at once
+            exceptions = recurrence.load_exceptions([series]) if series.pk else {}
+            own = [(item.start_date, item.end_date) for item in recurrence.expand([series], exceptions=exceptions)]
+            for other in scheduling.venue_conflicts(location, own, exclude=self.instance.pk)[:3]:
+                self.add_error('location', (
+                    f'{location} is already booked for "{other.title}" ({other.club.name}) from '
+                    f'{timezone.localtime(other.start_date):%b %d, %H:%M} to {timezone.localtime(other.end_date):%b %d, %H:%M}.'
+                ))
+        return cleaned_data
+
+class EventImportForm(forms.Form):
+    file = forms.FileField(help_text='A CSV file with a header row, or an iCalendar (.ics) file.')
+    dry_run = forms.BooleanField(required=False, label='Check only', help_text='Validate the file without creating any events.')
+
 class MessageForm(forms.ModelForm):
     class Meta:
         model = Message
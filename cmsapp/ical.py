@@ -0,0 +1,150 @@
+"""
+iCalendar feeds of club events.
+
+Feed URLs carry a signed token instead of a session, so calendar apps can
+poll them. The token includes the user's calendar_secret, so resetting the
+secret revokes every feed URL handed out before. Each feed's ETag and
+Last-Modified come from the events_version stamps of the clubs it covers,
+which lets a poll be answered with 304 from the (cached) Club rows alone;
+the Event table is only read when a feed has actually changed, and the body
+is then streamed a chunk of events at a time, each recurring event expanded
+into its occurrences.
+"""
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+from . import recurrence
+from .cache import get_profile
+from .models import Club, ClubMembership, Event, UserProfile, new_calendar_secret
+
+TOKEN_SALT = 'cmsapp.calendar'
+# Ended events stay in feeds for this long
+PAST_DAYS = 30
+CHUNK_SIZE = 500
+
+
+def make_token(user):
+    secret = get_profile(user).calendar_secret
+    return signing.Signer(salt=TOKEN_SALT).sign(f'{user.pk}:{secret}')
+
+
+def user_for_token(token):
+    try:
+        user_id, _, secret = signing.Signer(salt=TOKEN_SALT).unsign(token).partition(':')
+    except signing.BadSignature:
+        return None
+    if not secret:
+        return None
+    return User.objects.filter(pk=user_id, is_active=True, profile__calendar_secret=secret).first()
+
+
+def reset_token(user):
+    # Revokes the user's feed URLs; make_token() returns a new one
+    profile = UserProfile.objects.get(user=user)
+    profile.calendar_secret = new_calendar_secret()
+    profile.save(update_fields=['calendar_secret'])
+
+
+class FeedState:
+    def __init__(self, name, stamps):
+        # stamps: [(club id, events_version, events_updated_at)]
+        self.name = name
+        self.club_ids = [club_id for club_id, _, _ in stamps]
+        # The feed window moves daily, so the date is part of the version
+        self.window_start = timezone.localdate() - timedelta(days=PAST_DAYS)
+        versions = sorted((club_id, version) for club_id, version, _ in stamps)
+        digest = hashlib.sha1(repr((versions, self.window_start)).encode())
+        self.etag = f'"{digest.hexdigest()[:20]}"'
+        self.last_modified = max((updated_at for _, _, updated_at in stamps), default=None)
+
+
+def user_feed_state(user, is_admin=False):
+    # Admins see every club's events, as on the upcoming events page
+    if is_admin:
+        stamps = Club.objects.values_list('pk', 'events_version', 'events_updated_at')
+    else:
+        stamps = ClubMembership.objects.filter(user=user).values_list(
+            'club_id', 'club__events_version', 'club__events_updated_at',
+        )
+    return FeedState(f'{user.username} - Club events', list(stamps))
+
+
+def club_feed_state(club):
+    return FeedState(club.name, [(club.pk, club.events_version, club.events_updated_at)])
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def _fold(line):
+    # Lines longer than 75 octets continue on the next line after a space
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # Never split a UTF-8 sequence
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _timestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def stream_ics(request, state):
+    host = request.get_host().split(':')[0]
+    yield ''.join(_fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Club Management System//Events//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(state.name)}',
+    ))
+
+    window_start = timezone.make_aware(datetime.combine(state.window_start, time.min))
+    events = Event.objects.filter(club_id__in=state.club_ids)
+    events = recurrence.in_range(events, window_start, None)
+    events = events.select_related('club').order_by('start_date', 'pk').only(
+        'pk', 'title', 'description', 'location', 'start_date', 'end_date', 'created_at',
+        'recurrence', 'recurrence_interval', 'recurrence_until', 'club__name',
+    )
+    rows = events.iterator(chunk_size=CHUNK_SIZE)
+    # Recurring series become one VEVENT per occurrence inside the window
+    while chunk := list(islice(rows, CHUNK_SIZE)):
+        for occurrence in recurrence.expand(chunk, window_start):
+            event = occurrence.event
+            uid = f'event-{event.pk}'
+            if event.recurrence:
+                uid = f'{uid}-{occurrence.index}'
+            url = request.build_absolute_uri(reverse('event_detail', args=[event.pk]))
+            yield ''.join(_fold(line) for line in (
+                'BEGIN:VEVENT',
+                f'UID:{uid}@{host}',
+                f'DTSTAMP:{_timestamp(event.created_at)}',
+                f'DTSTART:{_timestamp(occurrence.start_date)}',
+                f'DTEND:{_timestamp(occurrence.end_date)}',
+                f'SUMMARY:{_escape(event.title)}',
+                f'DESCRIPTION:{_escape(event.description)}',
+                f'LOCATION:{_escape(event.location)}',
+                f'CATEGORIES:{_escape(event.club.name)}',
+                f'URL:{url}',
+                'END:VEVENT',
+            ))
+    yield 'END:VCALENDAR\r\n'
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cmsapp import archive
+from cmsapp.models import Club
+
+
+class Command(BaseCommand):
+    help = "Move messages older than each club's retention window into compressed archive segments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--club', type=int, help='Only archive this club.')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many messages are due without moving them.')
+
+    def handle(self, *args, **options):
+        config = archive.get_config()
+        if options['club']:
+            club = Club.objects.filter(pk=options['club']).first()
+            if club is None:
+                raise CommandError(f"Club {options['club']} does not exist.")
+            count = archive.archive_club(club, config=config, dry_run=options['dry_run'])
+            results = [(club, count)] if count else []
+        else:
+            results = archive.archive_all(config=config, dry_run=options['dry_run'])
+
+        verb = 'due for archiving' if options['dry_run'] else 'archived'
+        total = 0
+        for club, count in results:
+            total += count
+            self.stdout.write(f'{club.name}: {count} messages {verb}.')
+        self.stdout.write(f'{total} messages {verb} in total.')
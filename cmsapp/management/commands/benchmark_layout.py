@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from cmsapp.cache import local_cache, local_counters
+
+
+class Command(BaseCommand):
+    help = 'Compare render time of base.html-based templates with and without the layout fragment cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to render the layout for (default: first user).')
+        parser.add_argument('--template', action='append', dest='templates',
+                            help='Template to render; may be repeated (default: cmsapp/base.html).')
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('No user to render the layout for.')
+
+        templates = options['templates'] or ['cmsapp/base.html']
+        iterations = options['iterations']
+
+        for name in templates:
+            template = get_template(name)
+
+            # Without caching: every fragment is rendered on every request
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+                local_cache.clear()
+                local_counters.clear()
+                uncached = self._time(template, user, iterations)
+            local_cache.clear()
+            local_counters.clear()
+            caches['default'].close()
+
+            # With caching: first render fills the fragments, the rest hit them
+            self._render(template, user)
+            cached = self._time(template, user, iterations)
+
+            saving = (1 - cached / uncached) * 100 if uncached else 0
+            self.stdout.write(
+                f'{name}: uncached {uncached * 1000:.3f} ms, cached {cached * 1000:.3f} ms '
+                f'per render ({saving:.1f}% saved over {iterations} renders)'
+            )
+
+    def _render(self, template, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        request.session = {}
+        return template.render({}, request)
+
+    def _time(self, template, user, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            self._render(template, user)
+        return (time.perf_counter() - start) / iterations
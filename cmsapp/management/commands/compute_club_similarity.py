@@ -0,0 +1,26 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from cmsapp import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the most similar clubs of every club from shared memberships.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, help='Similar clubs to keep per club.')
+        parser.add_argument('--min-common', type=int, help='Fewest shared members for two clubs to count as similar.')
+
+    def handle(self, *args, **options):
+        config = recommendations.get_config()
+        if options['top_k'] is not None:
+            config['TOP_K'] = options['top_k']
+        if options['min_common'] is not None:
+            config['MIN_COMMON_MEMBERS'] = options['min_common']
+        if config['TOP_K'] < 1:
+            raise CommandError('--top-k must be at least 1.')
+        try:
+            count = recommendations.rebuild(config)
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(f'Stored {count} club similarities.')
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cmsapp import changes
+
+
+class Command(BaseCommand):
+    help = 'Write the changes after a sequence number to stdout as NDJSON, one change per line.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, default=0, help='Last sequence number already seen (default: 0).')
+        parser.add_argument('--model', action='append', choices=sorted(changes.MODELS), help='Only this model; may be repeated.')
+        parser.add_argument('--snapshot', action='store_true',
+                            help='Write every current object as an insert instead, to start a new consumer from.')
+        parser.add_argument('--purge', action='store_true', help='Delete entries older than KEEP_DAYS instead of exporting.')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = changes.purge()
+            self.stderr.write(f'Purged {deleted} change log entr{"ies" if deleted != 1 else "y"}.')
+            return
+
+        if options['snapshot']:
+            snapshot = changes.snapshot(options['model'])
+            for line in snapshot.ndjson():
+                self.stdout.write(line, ending='')
+            self.stderr.write(f'Next sequence number: {snapshot.next_since}')
+            return
+
+        since = options['since']
+        while True:
+            try:
+                page = changes.changes_since(since, models=options['model'])
+            except changes.ChangeLogExpired as exc:
+                raise CommandError(f'{exc} Start over from --snapshot.') from exc
+            for line in page.ndjson():
+                self.stdout.write(line, ending='')
+            # Stop at entries still settling as well as at the end of the log
+            if not page.has_more or page.next_since == since:
+                break
+            since = page.next_since
+        self.stderr.write(f'Next sequence number: {page.next_since}')
@@ -0,0 +1,37 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.core.management.base import BaseCommand, CommandError
+
+from cmsapp import event_import
+from cmsapp.models import Club
+
+
+class Command(BaseCommand):
+    help = 'Import events into a club from a CSV or iCalendar (.ics) file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or .ics file to import.')
+        parser.add_argument('--club', type=int, required=True, help='ID of the club to add the events to.')
+        parser.add_argument('--user', required=True, help='Username recorded as the creator; must lead the club or be an admin.')
+        parser.add_argument('--format', choices=[event_import.CSV, event_import.ICS], help='File format (default: from the file name).')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without creating any events.')
+
+    def handle(self, *args, **options):
+        club = Club.objects.filter(pk=options['club']).first()
+        if club is None:
+            raise CommandError(f'No club with ID {options["club"]}.')
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f'No user named {options["user"]}.')
+
+        file_format = options['format'] or event_import.format_for(options['path'])
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = event_import.import_events(stream, file_format, club, user, dry_run=options['dry_run'])
+        except (OSError, PermissionDenied, event_import.InvalidImportFile) as exc:
+            raise CommandError(str(exc)) from exc
+
+        for line, message in report.errors:
+            self.stderr.write(f'Line {line}: {message}')
+        verb = 'Could import' if report.dry_run else 'Imported'
+        self.stdout.write(f'{verb} {report.created} of {report.rows} events into {club.name}.')
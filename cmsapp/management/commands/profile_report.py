@@ -0,0 +1,61 @@
+import os
+import pstats
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from cmsapp import profiling
+
+
+class Command(BaseCommand):
+    help = 'List the slowest URL names from sampled request profiles and their most expensive functions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Only report on this URL name.')
+        parser.add_argument('--limit', type=int, default=10, help='Number of URL names to list.')
+        parser.add_argument('--functions', type=int, default=5, help='Top functions to list per URL name.')
+        parser.add_argument('--issue-token', action='store_true',
+                            help='Print a signed X-CMS-Profile header value and exit.')
+
+    def handle(self, *args, **options):
+        if options['issue_token']:
+            self.stdout.write(profiling.make_token())
+            return
+
+        config = profiling.get_config()
+        directory = config['DIRECTORY']
+
+        by_url = defaultdict(list)
+        for summary in profiling.load_summaries(directory):
+            if options['url'] and summary['url_name'] != options['url']:
+                continue
+            by_url[summary['url_name']].append(summary)
+
+        if not by_url:
+            self.stdout.write(f'No profiles found in {directory}.')
+            return
+
+        def mean(rows, field):
+            return sum(row[field] for row in rows) / len(rows) * 1000
+
+        ranked = sorted(by_url.items(), key=lambda item: mean(item[1], 'total'), reverse=True)
+        for url_name, rows in ranked[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{url_name}: {len(rows)} profiles, mean {mean(rows, "total"):.1f} ms, '
+                f'max {max(row["total"] for row in rows) * 1000:.1f} ms'
+            ))
+            self.stdout.write(
+                f'  sql {mean(rows, "sql"):.1f} ms ({sum(row["queries"] for row in rows) / len(rows):.1f} queries), '
+                f'template {mean(rows, "template"):.1f} ms, python {mean(rows, "python"):.1f} ms'
+            )
+
+            paths = [str(directory / row['profile']) for row in rows if (directory / row['profile']).exists()]
+            if not paths:
+                continue
+            stats = pstats.Stats(*paths).stats
+            top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:options['functions']]
+            for (filename, lineno, funcname), (_, calls, tottime, cumtime, _) in top:
+                self.stdout.write(
+                    f'    {tottime / len(paths) * 1000:8.2f} ms own {cumtime / len(paths) * 1000:8.2f} ms cum '
+                    f'{calls:7d} calls  {funcname} ({os.path.basename(filename)}:{lineno})'
+                )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cmsapp import scheduling
+
+
+class Command(BaseCommand):
+    help = 'Report events double-booking a location and, optionally, members registered for overlapping events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--upcoming', action='store_true', help='Only consider events that have not ended yet.')
+        parser.add_argument('--attendees', action='store_true', help='Also report members registered for overlapping events.')
+
+    def handle(self, *args, **options):
+        start = timezone.now() if options['upcoming'] else None
+
+        venue_count = 0
+        for location, first, second in scheduling.report_conflicts(start=start):
+            venue_count += 1
+            self.stdout.write(f'{location}: {self._describe(first)} overlaps {self._describe(second)}')
+        self.stdout.write(f'{venue_count} venue conflicts.')
+
+        if options['attendees']:
+            attendee_count = 0
+            for user, first, second in scheduling.report_attendee_conflicts(start=start):
+                attendee_count += 1
+                self.stdout.write(f'{user.username}: {self._describe(first)} overlaps {self._describe(second)}')
+            self.stdout.write(f'{attendee_count} attendee conflicts.')
+
+    def _describe(self, occurrence):
+        start = timezone.localtime(occurrence.start_date)
+        end = timezone.localtime(occurrence.end_date)
+        return f'"{occurrence.title}" (#{occurrence.event.pk}) {start:%Y-%m-%d %H:%M}-{end:%Y-%m-%d %H:%M}'
@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cmsapp import reminders
+
+
+class Command(BaseCommand):
+    help = 'Send event reminders as they fall due (see CMS_REMINDERS).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Fire the reminders that are due now and exit.')
+
+    def handle(self, *args, **options):
+        config = reminders.get_config()
+        scheduler = reminders.ReminderScheduler(config)
+        stopped = threading.Event()
+
+        def stop(signum, frame):
+            stopped.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        while not stopped.is_set():
+            now = timezone.now()
+            scheduler.refresh(now)
+            for trigger in scheduler.pop_due(now):
+                reminder = scheduler.fire(trigger)
+                if reminder is not None and options['verbosity'] >= 1:
+                    self.stdout.write(
+                        f'Queued {reminder.offset_minutes} min reminder for event {reminder.event_id}.'
+                    )
+            if options['once']:
+                break
+
+            timeout = config['RECHECK_INTERVAL']
+            next_fire_at = scheduler.next_fire_at()
+            if next_fire_at is not None:
+                timeout = max(0, min(timeout, (next_fire_at - timezone.now()).total_seconds()))
+            stopped.wait(timeout)
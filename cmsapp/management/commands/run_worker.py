@@ -0,0 +1,126 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# How often the worker requeues abandoned tasks and purges finished ones
+MAINTENANCE_INTERVAL = 60
+
+# Worker processes are spawned, not forked, so they never share the parent's
+# database connections. A spawned process imports this module before Django
+# is set up, so nothing that touches models may be imported at module level.
+
+
+def _init_process():
+    django.setup()
+
+
+def _execute(task_id, worker):
+    from cmsapp import taskqueue
+    return taskqueue.run(task_id, worker)
+
+
+def _new_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_process)
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Number of worker processes (default CMS_TASKS["WORKERS"]).')
+        parser.add_argument('--poll-interval', type=float, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due and none is running.')
+
+    def handle(self, *args, **options):
+        from cmsapp import taskqueue
+
+        config = taskqueue.get_config()
+        workers = options['workers'] or config['WORKERS']
+        poll_interval = options['poll_interval'] or config['POLL_INTERVAL']
+        worker = taskqueue.worker_id()
+        self.stopping = False
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after running tasks finish...')
+            self.stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Worker {worker} started with {workers} processes.')
+        connections.close_all()
+        in_flight = {}
+        last_maintenance = 0.0
+        last_heartbeat = time.monotonic()
+        pool = _new_pool(workers)
+        try:
+            while True:
+                if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                    requeued, failed = taskqueue.requeue_stale(config)
+                    purged = taskqueue.purge_finished(config)
+                    if requeued or failed or purged:
+                        self.stdout.write(
+                            f'Requeued {requeued} stale tasks, failed {failed} out of attempts, '
+                            f'purged {purged} finished tasks.'
+                        )
+                    last_maintenance = time.monotonic()
+
+                if time.monotonic() - last_heartbeat > config['HEARTBEAT_INTERVAL']:
+                    last_heartbeat = self._heartbeat(worker, in_flight)
+
+                broken = False
+                for future in [future for future in in_flight if future.done()]:
+                    task_id = in_flight.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        # The process died; without heartbeats the task goes stale and
+                        # requeue_stale() retries it, or fails it if out of attempts
+                        self.stderr.write(f'Task {task_id} crashed its worker process: {error!r}')
+                        broken = broken or isinstance(error, BrokenProcessPool)
+                    elif options['verbosity'] >= 2:
+                        self.stdout.write(f'Task {task_id} {"succeeded" if future.result() else "failed"}.')
+                if broken:
+                    # A dead process makes the whole pool unusable; start a fresh one
+                    wait(in_flight)
+                    in_flight.clear()
+                    pool.shutdown()
+                    pool = _new_pool(workers)
+
+                if self.stopping:
+                    break
+
+                free = workers - len(in_flight)
+                claimed = taskqueue.claim(worker, free) if free else []
+                for task_id in claimed:
+                    in_flight[pool.submit(_execute, task_id, worker)] = task_id
+
+                if not claimed:
+                    if not in_flight:
+                        if options['once']:
+                            break
+                        time.sleep(poll_interval)
+                    else:
+                        wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+
+            while in_flight:
+                done, _ = wait(in_flight, timeout=config['HEARTBEAT_INTERVAL'])
+                for future in done:
+                    in_flight.pop(future)
+                self._heartbeat(worker, in_flight)
+        finally:
+            pool.shutdown()
+        self.stdout.write(f'Worker {worker} stopped.')
+
+    def _heartbeat(self, worker, in_flight):
+        from cmsapp import taskqueue
+
+        if in_flight:
+            taskqueue.heartbeat(worker, in_flight.values())
+        return time.monotonic()
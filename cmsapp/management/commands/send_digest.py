@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from cmsapp import digest
+
+
+class Command(BaseCommand):
+    help = "Email every member a digest of one day's activity in their clubs (default: yesterday)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to summarize, YYYY-MM-DD in local time.')
+        parser.add_argument('--dry-run', action='store_true', help='Build the digests without sending them.')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD.')
+        else:
+            day = timezone.localdate() - timedelta(days=1)
+
+        since, until = digest.day_window(day)
+        sent = digest.send_digests(since, until, dry_run=options['dry_run'])
+        verb = 'Built' if options['dry_run'] else 'Sent'
+        self.stdout.write(f'{verb} {sent} digest{"s" if sent != 1 else ""} for {day:%Y-%m-%d}.')
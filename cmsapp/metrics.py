@@ -0,0 +1,288 @@
+"""
+A small in-process metrics registry exported in Prometheus text format.
+
+Each worker process keeps its own counters and histograms and periodically
+writes a snapshot to CMS_METRICS['DIRECTORY'] (one file per process). The
+metrics endpoint merges every snapshot, so a prefork WSGI server reports
+totals across all of its workers no matter which one answers the scrape. A
+process removes its snapshot when it exits. Snapshots are named after the
+host and pid of their process, as the directory may be shared between hosts;
+those left by processes on this host that died without removing them, and
+those of any host not rewritten for STALE_AFTER seconds, are deleted when the
+snapshots are merged.
+"""
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+DEFAULTS = {
+    'ENABLED': False,
+    'DIRECTORY': Path(settings.BASE_DIR) / 'var' / 'metrics',
+    'FLUSH_INTERVAL': 5.0,
+    'STALE_AFTER': 3600.0,
+    'TOKEN': None,
+    'READY_MAX_DB_LATENCY': 1.0,
+}
+
+# Snapshot names start with the host; pid and start time follow it
+HOSTNAME = socket.gethostname().replace(os.sep, '_') or 'localhost'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_METRICS', {}))
+    config['DIRECTORY'] = Path(config['DIRECTORY'])
+    return config
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.values = {}
+
+    def _key(self, labels):
+        return json.dumps([str(labels.get(name, '')) for name in self.label_names])
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def samples(self, key, value):
+        yield self.name, key, None, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with registry.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return {'buckets': list(value['buckets']), 'sum': value['sum'], 'count': value['count']}
+        total['buckets'] = [a + b for a, b in zip(total['buckets'], value['buckets'])]
+        total['sum'] += value['sum']
+        total['count'] += value['count']
+        return total
+
+    def samples(self, key, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets, value['buckets']):
+            cumulative += count
+            yield self.name + '_bucket', key, ('le', _format_number(bound)), cumulative
+        yield self.name + '_bucket', key, ('le', '+Inf'), value['count']
+        yield self.name + '_sum', key, None, value['sum']
+        yield self.name + '_count', key, None, value['count']
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._start_process()
+        self.last_flush = 0.0
+
+    def _start_process(self):
+        self.pid = os.getpid()
+        self.process_id = '%s-%d-%d' % (HOSTNAME, self.pid, time.time_ns())
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        with self.lock:
+            return {name: json.loads(json.dumps(metric.values)) for name, metric in self.metrics.items()}
+
+    def flush(self, force=False):
+        config = get_config()
+        now = time.monotonic()
+        if not force and now - self.last_flush < config['FLUSH_INTERVAL']:
+            return
+        self.last_flush = now
+
+        # A forked worker inherits the parent's counters; start it afresh
+        if self.pid != os.getpid():
+            with self.lock:
+                for metric in self.metrics.values():
+                    metric.values.clear()
+                self._start_process()
+
+        directory = config['DIRECTORY']
+        directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(directory)
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+
+    def _path(self, directory):
+        return directory / (self.process_id + '.json')
+
+    def remove(self):
+        # Delete this process's snapshot; runs at exit. A forked worker that
+        # never flushed still carries its parent's id and leaves it alone.
+        if self.pid != os.getpid():
+            return
+        try:
+            self._path(get_config()['DIRECTORY']).unlink()
+        except OSError:
+            pass
+
+    def collect(self):
+        # Merge the snapshots written by every worker process
+        self.flush(force=True)
+        config = get_config()
+        merged = {name: {} for name in self.metrics}
+        for path in config['DIRECTORY'].glob('*.json'):
+            if path != self._path(config['DIRECTORY']) and _is_stale(path, config['STALE_AFTER']):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as fh:
+                    snapshot = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for name, values in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                for key, value in values.items():
+                    merged[name][key] = metric.merge(merged[name].get(key), value)
+        return merged
+
+
+def _is_stale(path, stale_after):
+    # Whether the snapshot at `path` belongs to a process that is gone
+    try:
+        if time.time() - path.stat().st_mtime > stale_after:
+            return True
+        host, pid, _ = path.stem.rsplit('-', 2)
+        pid = int(pid)
+    except (ValueError, OSError):
+        return False
+    # Only a process on this host can be looked up. Signal 0 only checks
+    # that the process exists; on Windows it would be delivered as CTRL_C_EVENT
+    if host != HOSTNAME or os.name != 'posix':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+registry = Registry()
+atexit.register(registry.remove)
+
+
+def _format_number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(label_names, key, extra=None):
+    pairs = list(zip(label_names, json.loads(key)))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{%s}' % ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def render_prometheus(extra_gauges=()):
+    lines = []
+    merged = registry.collect()
+    for name, metric in registry.metrics.items():
+        lines.append(f'# HELP {name} {metric.help}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(merged[name].items()):
+            for sample_name, sample_key, extra, sample in metric.samples(key, value):
+                lines.append(f'{sample_name}{_format_labels(metric.label_names, sample_key, extra)} {_format_number(sample)}')
+    gauges = list(extra_gauges)
+    lookups = {}
+    for key, value in merged[CACHE_REQUESTS.name].items():
+        tier, result = json.loads(key)
+        lookups.setdefault(tier, {'hit': 0, 'miss': 0})[result] += value
+    if lookups:
+        # Share of cache lookups answered by either tier without hitting the database
+        hits = sum(counts['hit'] for counts in lookups.values())
+        total = hits + lookups.get('shared', {}).get('miss', 0)
+        gauges.append(('cms_cache_hit_ratio', 'Two-tier cache hit ratio.', hits / total if total else 0.0))
+
+    for name, help_text, value in gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {_format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Application metrics
+REQUEST_LATENCY = registry.register(Histogram(
+    'cms_http_request_duration_seconds', 'Request latency by URL name.', ('url_name', 'method')))
+REQUESTS = registry.register(Counter(
+    'cms_http_requests_total', 'Requests by URL name and status code.', ('url_name', 'method', 'status')))
+REQUEST_QUERIES = registry.register(Histogram(
+    'cms_db_queries_per_request', 'SQL statements executed per request.', ('url_name',), QUERY_COUNT_BUCKETS))
+REQUEST_QUERY_TIME = registry.register(Histogram(
+    'cms_db_query_seconds_per_request', 'Total SQL time per request.', ('url_name',)))
+TEMPLATE_RENDER = registry.register(Histogram(
+    'cms_template_render_seconds', 'Render time of templates rendered by views.', ('template',)))
+CACHE_REQUESTS = registry.register(Counter(
+    'cms_cache_requests_total', 'Two-tier cache lookups by tier and result.', ('tier', 'result')))
+
+
+def ping_database():
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return time.perf_counter() - start
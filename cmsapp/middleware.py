@@ -0,0 +1,122 @@
+import logging
+import random
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from . import metrics, nplusone, profiling, slowlog
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+def url_name_for(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name if match else None) or 'unresolved'
+
+
+class MetricsMiddleware:
+    # Records latency, SQL statements and SQL time per URL name into
+    # cmsapp.metrics; exported by the `metrics` view.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not metrics.get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        url_name = url_name_for(request)
+        metrics.REQUEST_LATENCY.observe(elapsed, url_name=url_name, method=request.method)
+        metrics.REQUESTS.inc(url_name=url_name, method=request.method, status=response.status_code)
+        metrics.REQUEST_QUERIES.observe(queries.count, url_name=url_name)
+        metrics.REQUEST_QUERY_TIME.observe(queries.time, url_name=url_name)
+        try:
+            metrics.registry.flush()
+        except OSError:
+            logger.exception('Could not write metrics snapshot')
+        return response
+
+
+class SlowQueryMiddleware:
+    # Logs statements slower than CMS_SLOW_QUERIES['THRESHOLD_MS'] with the
+    # view and call site that issued them (see cmsapp.slowlog).
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = slowlog.get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.recorder = slowlog.SlowQueryRecorder(self.config)
+
+    def __call__(self, request):
+        token = slowlog.current_request.set(request)
+        try:
+            with connection.execute_wrapper(self.recorder):
+                return self.get_response(request)
+        finally:
+            slowlog.current_request.reset(token)
+
+
+class NPlusOneMiddleware:
+    # Flags query shapes repeated more than CMS_NPLUSONE['THRESHOLD'] times in
+    # one request (see cmsapp.nplusone). On by default only when DEBUG is set.
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = nplusone.get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        detector = nplusone.NPlusOneDetector(self.config)
+        request.nplusone_findings = detector.findings
+        with connection.execute_wrapper(detector):
+            return self.get_response(request)
+
+
+class SamplingProfilerMiddleware:
+    # Profiles a random CMS_PROFILER['SAMPLE_RATE'] fraction of requests, plus
+    # any request carrying a valid X-CMS-Profile header (see `manage.py
+    # profile_report --issue-token`). Disabled unless CMS_PROFILER['ENABLED'].
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = profiling.get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+
+    def should_profile(self, request):
+        token = request.META.get(self.config['HEADER'])
+        if token:
+            return profiling.check_token(token, self.config['TOKEN_MAX_AGE'])
+        return random.random() < self.config['SAMPLE_RATE']
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = profiling.RequestProfile(self.config)
+        with connection.execute_wrapper(profile.execute_wrapper), profile:
+            response = self.get_response(request)
+        # Streaming responses are profiled up to the point the body starts
+        try:
+            profile.save(request, response)
+        except OSError:
+            logger.exception('Could not write request profile')
+        return response
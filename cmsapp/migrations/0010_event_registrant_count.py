@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:37
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_registrations(apps, schema_editor):
+    Event = apps.get_model('cmsapp', 'Event')
+    EventRegistration = apps.get_model('cmsapp', 'EventRegistration')
+    Participant = Event.participants.through
+
+    # Keep the earliest registration per (event, user) before the unique constraint
+    duplicates = EventRegistration.objects.values('event_id', 'user_id').annotate(n=Count('id'), first=Min('id')).filter(n__gt=1)
+    for row in duplicates:
+        EventRegistration.objects.filter(event_id=row['event_id'], user_id=row['user_id']).exclude(id=row['first']).delete()
+
+    # Every participant gets a registration record
+    registered = EventRegistration.objects.filter(event_id=OuterRef('event_id'), user_id=OuterRef('user_id'))
+    missing = Participant.objects.exclude(Exists(registered)).values_list('event_id', 'user_id')
+    EventRegistration.objects.bulk_create(
+        (EventRegistration(event_id=event_id, user_id=user_id) for event_id, user_id in missing.iterator()),
+        batch_size=1000,
+    )
+
+    counts = EventRegistration.objects.filter(event_id=OuterRef('pk')).order_by().values('event_id').annotate(n=Count('id')).values('n')
+    Event.objects.update(registrant_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0009_event_registration_type_team_eventregistration_team'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='registrant_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_registrations, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='eventregistration',
+            unique_together={('event', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['event', 'registration_date', 'id'], name='cmsapp_even_event_i_646b60_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0010_event_registrant_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='club',
+            name='events_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='club',
+            name='events_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0011_club_events_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='club',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
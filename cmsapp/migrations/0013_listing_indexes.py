@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0012_club_event_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='club',
+            index=models.Index(fields=['name', 'id'], name='cmsapp_club_name_067ca4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_date', 'id'], name='cmsapp_even_start_d_ba8ac4_idx'),
+        ),
+    ]
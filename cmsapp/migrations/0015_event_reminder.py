@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0014_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offset_minutes', models.PositiveIntegerField()),
+                ('event_start', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('last_user_id', models.PositiveIntegerField(default=0)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='cmsapp.event')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event_start'], name='cmsapp_even_event_s_eaee59_idx')],
+                'unique_together': {('event', 'offset_minutes', 'event_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0015_event_reminder'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clubjoinrequest',
+            name='decided_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='email_digest',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='clubjoinrequest',
+            index=models.Index(fields=['decided_at'], name='cmsapp_club_decided_082a94_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['timestamp'], name='cmsapp_mess_timesta_249076_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0016_digest_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='club',
+            name='message_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Messages older than this many days are moved to the archive. Leave blank for the site default.', null=True),
+        ),
+        migrations.CreateModel(
+            name='MessageArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('message_count', models.PositiveIntegerField()),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('size_bytes', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='cmsapp.club')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['club', 'last_timestamp', 'id'], name='cmsapp_mess_club_id_afb9a8_idx')],
+            },
+        ),
+    ]
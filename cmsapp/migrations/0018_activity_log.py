@@ -0,0 +1,68 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_activity(apps, schema_editor):
+    # Seed the log from the timestamps already on record so the dashboard
+    # does not start out empty
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Club = apps.get_model('cmsapp', 'Club')
+    ClubMembership = apps.get_model('cmsapp', 'ClubMembership')
+    Event = apps.get_model('cmsapp', 'Event')
+    EventRegistration = apps.get_model('cmsapp', 'EventRegistration')
+    ActivityLog = apps.get_model('cmsapp', 'ActivityLog')
+
+    def entries():
+        for user_id, joined in User.objects.values_list('id', 'date_joined').iterator():
+            yield ActivityLog(timestamp=joined, actor_id=user_id, action='user_registered', summary='joined the site')
+        for club_id, name, user_id, created in Club.objects.values_list('id', 'name', 'created_by_id', 'created_at').iterator():
+            yield ActivityLog(timestamp=created, actor_id=user_id, club_id=club_id, action='club_created',
+                              summary=f'created the club "{name}"'[:255])
+        for user_id, club_id, joined in ClubMembership.objects.values_list('user_id', 'club_id', 'date_joined').iterator():
+            yield ActivityLog(timestamp=joined, actor_id=user_id, club_id=club_id, action='member_joined', summary='joined the club')
+        events = Event.objects.values_list('club_id', 'title', 'created_by_id', 'created_at')
+        for club_id, title, user_id, created in events.iterator():
+            yield ActivityLog(timestamp=created, actor_id=user_id, club_id=club_id, action='event_created',
+                              summary=f'created the event "{title}"'[:255])
+        registrations = EventRegistration.objects.values_list('user_id', 'event__club_id', 'event__title', 'registration_date')
+        for user_id, club_id, title, registered in registrations.iterator():
+            yield ActivityLog(timestamp=registered, actor_id=user_id, club_id=club_id, action='event_registered',
+                              summary=f'registered for "{title}"'[:255])
+
+    batch = []
+    for entry in entries():
+        batch.append(entry)
+        if len(batch) == 1000:
+            ActivityLog.objects.bulk_create(batch)
+            batch = []
+    ActivityLog.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0017_message_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('action', models.CharField(choices=[('user_registered', 'User registered'), ('club_created', 'Club created'), ('club_approved', 'Club approved'), ('club_rejected', 'Club rejected'), ('member_joined', 'Member joined'), ('member_left', 'Member left'), ('leader_promoted', 'Leader promoted'), ('event_created', 'Event created'), ('event_updated', 'Event updated'), ('event_deleted', 'Event deleted'), ('event_registered', 'Event registration')], max_length=32)),
+                ('summary', models.CharField(max_length=255)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity', to=settings.AUTH_USER_MODEL)),
+                ('club', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity', to='cmsapp.club')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['timestamp', 'id'], name='cmsapp_acti_timesta_be1527_idx'), models.Index(fields=['club', 'timestamp', 'id'], name='cmsapp_acti_club_id_aeb658_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
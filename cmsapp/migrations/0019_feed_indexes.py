@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0018_activity_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['club', 'created_at', 'id'], name='cmsapp_even_club_id_dab1a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['club', 'timestamp', 'id'], name='cmsapp_mess_club_id_8dbc9f_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-19 04:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0019_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClubSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_clubs', to='cmsapp.club')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cmsapp.club')),
+            ],
+            options={
+                'verbose_name_plural': 'club similarities',
+                'unique_together': {('club', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:01
+
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Frozen copies of cmsapp.trending's EPOCH and default weights
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HALF_LIFE_HOURS = 72
+WEIGHTS = {'join': 3.0, 'message': 1.0, 'event': 4.0, 'registration': 2.0}
+
+
+def backfill_trending(apps, schema_editor):
+    # Score the activity already on record so the panel does not start out empty
+    Club = apps.get_model('cmsapp', 'Club')
+    ClubMembership = apps.get_model('cmsapp', 'ClubMembership')
+    Message = apps.get_model('cmsapp', 'Message')
+    Event = apps.get_model('cmsapp', 'Event')
+    EventRegistration = apps.get_model('cmsapp', 'EventRegistration')
+
+    rate = math.log(2) / (HALF_LIFE_HOURS * 3600)
+    scores = {}
+
+    def add(club_id, kind, when):
+        x = math.log(WEIGHTS[kind]) + rate * (when - EPOCH).total_seconds()
+        current = scores.get(club_id)
+        scores[club_id] = x if current is None else max(current, x) + math.log1p(math.exp(-abs(current - x)))
+
+    for club_id, when in ClubMembership.objects.values_list('club_id', 'date_joined').iterator():
+        add(club_id, 'join', when)
+    for club_id, when in Message.objects.values_list('club_id', 'timestamp').iterator():
+        add(club_id, 'message', when)
+    for club_id, when in Event.objects.values_list('club_id', 'created_at').iterator():
+        add(club_id, 'event', when)
+    for club_id, when in EventRegistration.objects.values_list('event__club_id', 'registration_date').iterator():
+        add(club_id, 'registration', when)
+    for club_id, score in scores.items():
+        Club.objects.filter(pk=club_id).update(trending_score=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0020_club_similarity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='club',
+            name='trending_score',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='club',
+            index=models.Index(fields=['-trending_score', 'id'], name='cmsapp_club_trendin_7c81a0_idx'),
+        ),
+        migrations.RunPython(backfill_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0021_club_trending_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['location', 'start_date', 'end_date'], name='cmsapp_even_locatio_0c1cbf_idx'),
+        ),
+    ]
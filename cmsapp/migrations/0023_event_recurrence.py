@@ -0,0 +1,80 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_series_end(apps, schema_editor):
+    # Every existing event is a one-off, so its series ends with it
+    Event = apps.get_model('cmsapp', 'Event')
+    Event.objects.update(series_end=F('end_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0022_event_venue_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventOccurrenceException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence', models.PositiveIntegerField()),
+                ('is_cancelled', models.BooleanField(default=False)),
+                ('start_date', models.DateTimeField(blank=True, null=True)),
+                ('end_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventregistration',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence',
+            field=models.CharField(blank=True, choices=[('', 'Does not repeat'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_interval',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Repeat every this many days, weeks or months.'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_until',
+            field=models.DateField(blank=True, help_text='Last date an occurrence may start on.', null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='series_end',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_series_end, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='occurrence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventregistration',
+            unique_together={('event', 'user', 'occurrence')},
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['series_end', 'start_date'], name='cmsapp_even_series__9a1f2e_idx'),
+        ),
+        migrations.AddField(
+            model_name='eventoccurrenceexception',
+            name='event',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_exceptions', to='cmsapp.event'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventoccurrenceexception',
+            unique_together={('event', 'occurrence')},
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:08
+
+import cmsapp.models
+from django.db import migrations, models
+from django.utils.crypto import get_random_string
+
+
+def assign_calendar_secrets(apps, schema_editor):
+    UserProfile = apps.get_model('cmsapp', 'UserProfile')
+
+    # AddField gave every existing profile the same default; give each its own
+    profiles = list(UserProfile.objects.only('id'))
+    for profile in profiles:
+        profile.calendar_secret = get_random_string(32)
+    UserProfile.objects.bulk_update(profiles, ['calendar_secret'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0023_event_recurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='calendar_secret',
+            field=models.CharField(default=cmsapp.models.new_calendar_secret, editable=False, max_length=32),
+        ),
+        migrations.RunPython(assign_calendar_secrets, migrations.RunPython.noop),
+    ]
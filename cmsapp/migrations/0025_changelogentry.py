@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0024_userprofile_calendar_secret'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('insert', 'Insert'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name_plural': 'change log entries',
+                'indexes': [models.Index(fields=['model', 'id'], name='cmsapp_chan_model_81201c_idx'), models.Index(fields=['timestamp'], name='cmsapp_chan_timesta_b400e7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-19 05:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0025_changelogentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('through', models.BigIntegerField()),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.14 on 2026-10-19 06:10
+
+from django.db import migrations
+from django.utils import timezone
+
+# (model, change log name), as in cmsapp.changes.TRACKED
+TRACKED = [
+    ('Club', 'club'),
+    ('Event', 'event'),
+    ('ClubMembership', 'membership'),
+    ('EventRegistration', 'registration'),
+    ('Message', 'message'),
+]
+
+
+def seed_change_log(apps, schema_editor):
+    ChangeLogEntry = apps.get_model('cmsapp', 'ChangeLogEntry')
+
+    # Rows that existed before the change log get an insert entry, so a
+    # consumer starting from sequence number 0 sees every object
+    now = timezone.now()
+    for model_name, name in TRACKED:
+        model = apps.get_model('cmsapp', model_name)
+        logged = ChangeLogEntry.objects.filter(model=name).values('object_id')
+        missing = model.objects.exclude(pk__in=logged).order_by('pk').values_list('pk', flat=True)
+        ChangeLogEntry.objects.bulk_create(
+            (ChangeLogEntry(model=name, object_id=pk, action='insert', timestamp=now) for pk in missing.iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cmsapp', '0026_changelogpurge'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_change_log, migrations.RunPython.noop),
+    ]
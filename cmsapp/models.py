@@ -1,9 +1,14 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.crypto import get_random_string
 
 # Create your models here.
 
+def new_calendar_secret():
+    return get_random_string(32)
+
 class UserProfile(models.Model):
     USER_ROLES = (
         ('admin', 'Admin'),
@@ -15,6 +20,10 @@ class UserProfile(models.Model):
     bio = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     date_joined = models.DateTimeField(default=timezone.now)
+    # Receive the daily activity digest (cmsapp.digest)
+    email_digest = models.BooleanField(default=True)
+    # Signed into calendar feed URLs (cmsapp.ical); replacing it revokes them
+    calendar_secret = models.CharField(max_length=32, default=new_calendar_secret, editable=False)
     
     # Leader-specific fields
     phone_number = models.CharField(max_length=20, blank=True, null=True)
@@ -32,7 +41,18 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
-class Club(models.Model):
+# Models whose changes go into the change log (cmsapp.changes). Saving runs
+# in a transaction so the entry written from post_save commits with the row;
+# deletes already run in one.
+class ChangeTrackedModel(models.Model):
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+
+class Club(ChangeTrackedModel):
     name = models.CharField(max_length=100)
     description = models.TextField()
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_clubs')
@@ -41,11 +61,30 @@ class Club(models.Model):
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_clubs')
     logo = models.ImageField(upload_to='club_logos/', blank=True, null=True)
     members = models.ManyToManyField(User, through='ClubMembership', related_name='joined_clubs')
+    message_retention_days = models.PositiveIntegerField(
+        null=True, blank=True,
+        help_text='Messages older than this many days are moved to the archive. Leave blank for the site default.',
+    )
+    # Bumped by signals whenever one of the club's events changes; drives calendar feed ETags
+    events_version = models.PositiveIntegerField(default=0, editable=False)
+    events_updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Bumped by signals on any change shown on the club page; drives its ETag
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed activity score in log space, maintained by signals (see cmsapp.trending)
+    trending_score = models.FloatField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Keyset pagination of club listings
+            models.Index(fields=['name', 'id']),
+            # Trending clubs, highest score first
+            models.Index(fields=['-trending_score', 'id']),
+        ]
     
     def __str__(self):
         return self.name
 
-class ClubMembership(models.Model):
+class ClubMembership(ChangeTrackedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     club = models.ForeignKey(Club, on_delete=models.CASCADE)
     date_joined = models.DateTimeField(default=timezone.now)
@@ -57,7 +96,7 @@ class ClubMembership(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.club.name}"
 
-class Event(models.Model):
+class Event(ChangeTrackedModel):
     title = models.CharField(max_length=100)
     description = models.TextField()
     club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='events')
@@ -68,6 +107,25 @@ class Event(models.Model):
     image = models.ImageField(upload_to='event_images/', blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     participants = models.ManyToManyField(User, related_name='participating_events', blank=True)
+    # Number of EventRegistration rows, maintained by signals
+    registrant_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by signals on any change shown on the event page; drives its ETag
+    version = models.PositiveIntegerField(default=0, editable=False)
+    
+    # Repeating series: start_date/end_date are the first occurrence (see cmsapp.recurrence)
+    RECURRENCE_CHOICES = [
+        ('', 'Does not repeat'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ]
+    recurrence = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, default='', blank=True)
+    recurrence_interval = models.PositiveSmallIntegerField(
+        default=1, help_text='Repeat every this many days, weeks or months.',
+    )
+    recurrence_until = models.DateField(null=True, blank=True, help_text='Last date an occurrence may start on.')
+    # End of the last occurrence, set by signals; bounds range queries over series
+    series_end = models.DateTimeField(null=True, editable=False)
     
     REGISTRATION_CHOICES = [
         ('individual', 'Individual'),
@@ -79,12 +137,24 @@ class Event(models.Model):
         default='individual',
     )
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of upcoming event listings
+            models.Index(fields=['start_date', 'id']),
+            # A club's newest events (home feed)
+            models.Index(fields=['club', 'created_at', 'id']),
+            # Venue double-booking checks (cmsapp.scheduling)
+            models.Index(fields=['location', 'start_date', 'end_date']),
+            # Events and series overlapping a time window
+            models.Index(fields=['series_end', 'start_date']),
+        ]
+
     def __str__(self):
         return self.title
         
     @property
     def is_closed(self):
-        return timezone.now() > self.end_date
+        return timezone.now() > (self.series_end or self.end_date)
 
 class Team(models.Model):
     name = models.CharField(max_length=100)
@@ -95,16 +165,25 @@ class Team(models.Model):
     def __str__(self):
         return self.name
 
-class EventRegistration(models.Model):
+class EventRegistration(ChangeTrackedModel):
     event = models.ForeignKey(Event, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     registration_date = models.DateTimeField(auto_now_add=True)
     team = models.ForeignKey(Team, on_delete=models.CASCADE, null=True, blank=True)
+    # Which occurrence of a recurring event; always 0 for one-off events
+    occurrence = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('event', 'user', 'occurrence')
+        indexes = [
+            # Keyset pagination of an event's roster
+            models.Index(fields=['event', 'registration_date', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.user.username} registered for {self.event.title}'
 
-class Message(models.Model):
+class Message(ChangeTrackedModel):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='club_messages')
     content = models.TextField()
@@ -113,6 +192,12 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Daily digest reads one day of messages across all clubs
+            models.Index(fields=['timestamp']),
+            # A club's newest messages (home feed, archiving)
+            models.Index(fields=['club', 'timestamp', 'id']),
+        ]
     
     def __str__(self):
         return f"Message from {self.sender.username} in {self.club.name}"
@@ -124,9 +209,213 @@ class ClubJoinRequest(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     is_approved = models.BooleanField(default=False)
     is_rejected = models.BooleanField(default=False)
+    decided_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         unique_together = ('user', 'club')
+        indexes = [
+            models.Index(fields=['decided_at']),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.club.name}"
+
+# A unit of background work; see cmsapp.taskqueue
+class Task(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Higher priority runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim order: due queued tasks, highest priority first
+            models.Index(fields=['status', '-priority', 'run_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+# One reminder for one event start time; see cmsapp.reminders
+class EventReminder(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='reminders')
+    offset_minutes = models.PositiveIntegerField()
+    # The start time the reminder was computed for; rescheduling an event
+    # gives it fresh reminders
+    event_start = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    sent_count = models.PositiveIntegerField(default=0)
+    # Highest user id mailed so far, so a retried send resumes where it stopped
+    last_user_id = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('event', 'offset_minutes', 'event_start')
+        indexes = [
+            models.Index(fields=['event_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.event.title} - {self.offset_minutes} min before"
+
+# An immutable gzip file of archived messages; see cmsapp.archive
+class MessageArchiveSegment(models.Model):
+    club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='archive_segments')
+    # Relative to CMS_MESSAGE_ARCHIVE['DIRECTORY']
+    path = models.CharField(max_length=255, unique=True)
+    message_count = models.PositiveIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    size_bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Browsing a club's archive, newest segment first
+            models.Index(fields=['club', 'last_timestamp', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.club.name}: {self.message_count} messages up to {self.last_timestamp:%Y-%m-%d}"
+
+# Append-only record of who did what; written through cmsapp.activity
+class ActivityLog(models.Model):
+    USER_REGISTERED = 'user_registered'
+    CLUB_CREATED = 'club_created'
+    CLUB_APPROVED = 'club_approved'
+    CLUB_REJECTED = 'club_rejected'
+    MEMBER_JOINED = 'member_joined'
+    MEMBER_LEFT = 'member_left'
+    LEADER_PROMOTED = 'leader_promoted'
+    EVENT_CREATED = 'event_created'
+    EVENT_UPDATED = 'event_updated'
+    EVENT_DELETED = 'event_deleted'
+    EVENT_REGISTERED = 'event_registered'
+    ACTION_CHOICES = [
+        (USER_REGISTERED, 'User registered'),
+        (CLUB_CREATED, 'Club created'),
+        (CLUB_APPROVED, 'Club approved'),
+        (CLUB_REJECTED, 'Club rejected'),
+        (MEMBER_JOINED, 'Member joined'),
+        (MEMBER_LEFT, 'Member left'),
+        (LEADER_PROMOTED, 'Leader promoted'),
+        (EVENT_CREATED, 'Event created'),
+        (EVENT_UPDATED, 'Event updated'),
+        (EVENT_DELETED, 'Event deleted'),
+        (EVENT_REGISTERED, 'Event registration'),
+    ]
+
+    timestamp = models.DateTimeField(default=timezone.now)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='activity')
+    action = models.CharField(max_length=32, choices=ACTION_CHOICES)
+    club = models.ForeignKey(Club, on_delete=models.SET_NULL, null=True, blank=True, related_name='activity')
+    # Shown after the actor's name; plain text so the entry outlives what it mentions
+    summary = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            # Site-wide feed and per-club audit trail, newest first
+            models.Index(fields=['timestamp', 'id']),
+            models.Index(fields=['club', 'timestamp', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.actor} {self.summary}"
+
+# Top-K most similar clubs per club by co-membership; rebuilt by the
+# compute_club_similarity command (see cmsapp.recommendations)
+class ClubSimilarity(models.Model):
+    club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='similar_clubs')
+    similar = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='+')
+    # Cosine similarity of the two clubs' member sets, in (0, 1]
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('club', 'similar')
+        verbose_name_plural = 'club similarities'
+
+    def __str__(self):
+        return f"{self.club.name} ~ {self.similar.name} ({self.score:.3f})"
+
+# Cancels or reschedules one occurrence of a recurring event
+class EventOccurrenceException(models.Model):
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='occurrence_exceptions')
+    occurrence = models.PositiveIntegerField()
+    is_cancelled = models.BooleanField(default=False)
+    # Both set when the occurrence is moved
+    start_date = models.DateTimeField(null=True, blank=True)
+    end_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('event', 'occurrence')
+
+    def clean(self):
+        if (self.start_date is None) != (self.end_date is None):
+            raise ValidationError('Set both the new start and end, or neither.')
+        if self.start_date and self.end_date <= self.start_date:
+            raise ValidationError('The occurrence must end after it starts.')
+
+    def __str__(self):
+        change = 'cancelled' if self.is_cancelled else 'moved'
+        return f"{self.event.title} #{self.occurrence} {change}"
+
+
+# Inserts, updates and deletes of the models downstream systems mirror; the
+# id is the change sequence number. Written through cmsapp.changes
+class ChangeLogEntry(models.Model):
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (INSERT, 'Insert'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+
+    # Short model name, e.g. 'event' (see cmsapp.changes.TRACKED)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'change log entries'
+        indexes = [
+            # Consumers following only some models
+            models.Index(fields=['model', 'id']),
+            # Purging entries past the retention period
+            models.Index(fields=['timestamp']),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model} {self.object_id}"
+
+# High-water mark of purged change log entries: every sequence number up to
+# `through` may be gone. Kept apart from the log, which a purge can empty
+class ChangeLogPurge(models.Model):
+    through = models.BigIntegerField()
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Purged through #{self.through}"
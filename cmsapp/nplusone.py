@@ -0,0 +1,144 @@
+"""
+N+1 query detection for development and staging.
+
+NPlusOneMiddleware fingerprints every SELECT issued while serving a request.
+When one query shape runs more than CMS_NPLUSONE['THRESHOLD'] times, the
+detector reports the template node or code location that issued it together
+with the select_related()/prefetch_related() call that would avoid it.
+MODE decides what a report does: 'warn' emits an NPlusOneWarning, 'log'
+writes a warning to the cmsapp.nplusone logger and 'raise' fails the request
+with NPlusOneError.
+"""
+import functools
+import logging
+import re
+import warnings
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+
+from .sqlinspect import normalize_sql, fingerprint, call_site, describe_call_site
+
+logger = logging.getLogger(__name__)
+
+MODES = ('warn', 'log', 'raise')
+
+_FROM_TABLE = re.compile(r'\bFROM "(\w+)"')
+_WHERE_COLUMN = re.compile(r'\bWHERE \(?"(\w+)"\."(\w+)" = \?')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+def get_config():
+    config = {'ENABLED': settings.DEBUG, 'THRESHOLD': 5, 'MODE': 'warn'}
+    config.update(getattr(settings, 'CMS_NPLUSONE', {}))
+    if config['MODE'] not in MODES:
+        raise ValueError(f"CMS_NPLUSONE['MODE'] must be one of {', '.join(MODES)}")
+    return config
+
+
+@functools.lru_cache(maxsize=None)
+def _relations_by_name():
+    # accessor name -> [(target table, is many-valued)] across all installed models
+    relations = {}
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if not field.is_relation or field.related_model is None:
+                continue
+            name = field.get_accessor_name() if field.auto_created and not field.concrete else field.name
+            if not name:
+                continue
+            many = bool(field.many_to_many or field.one_to_many)
+            relations.setdefault(name, []).append((field.related_model._meta.db_table, many))
+    return relations
+
+
+def _model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def suggest(normalized_sql, site):
+    table_match = _FROM_TABLE.search(normalized_sql)
+    if not table_match:
+        return None
+    table = table_match.group(1)
+
+    # Template variables tell us the exact relation path, e.g. membership.user.username
+    relations = _relations_by_name()
+    for bit in (site.get('node') or '').split():
+        chain = bit.split('|')[0].split('.')
+        for i in range(1, len(chain)):
+            for target, many in relations.get(chain[i], ()):
+                if target == table:
+                    path = '__'.join(chain[1:i + 1])
+                    method = 'prefetch_related' if many else 'select_related'
+                    return f"{method}('{path}') on the queryset that yields '{chain[0]}'"
+
+    # Otherwise work from the lookup column
+    model = _model_for_table(table)
+    where = _WHERE_COLUMN.search(normalized_sql)
+    if model is None or where is None or where.group(1) != table:
+        return None
+    column = where.group(2)
+    if column == model._meta.pk.column:
+        return f'select_related() on the foreign key to {model.__name__}'
+    for field in model._meta.concrete_fields:
+        if field.is_relation and field.column == column:
+            accessor = field.remote_field.get_accessor_name()
+            if field.one_to_one:
+                return f"select_related('{accessor}') on the {field.related_model.__name__} queryset"
+            return f"prefetch_related('{accessor}') on the {field.related_model.__name__} queryset"
+    return None
+
+
+class NPlusOneDetector:
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.counts = Counter()
+        self.findings = []
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return result
+
+        normalized = normalize_sql(sql)
+        key = fingerprint(normalized)
+        self.counts[key] += 1
+        if self.counts[key] == self.config['THRESHOLD'] + 1:
+            site = call_site()
+            finding = {
+                'fingerprint': key,
+                'sql': normalized,
+                'call_site': site,
+                'suggestion': suggest(normalized, site),
+            }
+            self.findings.append(finding)
+            self.report(finding)
+        return result
+
+    def report(self, finding):
+        message = (
+            f"Possible N+1 query: more than {self.config['THRESHOLD']} queries shaped like "
+            f"{finding['sql'][:200]!r} from {describe_call_site(finding['call_site'])}"
+        )
+        if finding['suggestion']:
+            message += f"; try {finding['suggestion']}"
+
+        mode = self.config['MODE']
+        if mode == 'raise':
+            raise NPlusOneError(message)
+        if mode == 'log':
+            logger.warning(message)
+        else:
+            warnings.warn(message, NPlusOneWarning, stacklevel=2)
@@ -0,0 +1,135 @@
+"""
+Keyset (cursor) pagination.
+
+A page is fetched with a WHERE clause on the ordering columns of the last row
+seen instead of an OFFSET, so every page costs one indexed range scan no
+matter how deep it is. The ordering must be non-null and end in a unique
+column (normally the primary key) so that rows never tie.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds, which would make
+    # rows that differ only in microseconds repeat across pages
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class CursorPaginator:
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+        # (field name, descending)
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+    def _order_by(self, reverse):
+        return [
+            f'-{name}' if descending != reverse else name
+            for name, descending in self.fields
+        ]
+
+    def _value(self, item, name):
+        if isinstance(item, dict):
+            return item[name]
+        if name == 'pk':
+            return item.pk
+        return getattr(item, name)
+
+    def _to_python(self, name, value):
+        opts = self.queryset.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError as exc:
+            raise InvalidCursor(str(exc)) from exc
+
+    def encode(self, item, reverse=False):
+        values = [self._value(item, name) for name, _ in self.fields]
+        payload = json.dumps({'v': values, 'r': reverse}, cls=_CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values, reverse = payload['v'], bool(payload['r'])
+        except (ValueError, TypeError, KeyError) as exc:
+            raise InvalidCursor('Malformed cursor') from exc
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor('Cursor does not match the ordering')
+        return [self._to_python(name, value) for (name, _), value in zip(self.fields, values)], reverse
+
+    def _after(self, values, reverse):
+        # Rows strictly after `values` in (possibly reversed) sort order:
+        # (a > x) OR (a = x AND b > y) OR ...
+        condition = Q()
+        for i, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for j, (previous, _) in enumerate(self.fields[:i]):
+                term &= Q(**{previous: values[j]})
+            condition |= term
+        return condition
+
+    def page(self, cursor=None):
+        reverse = False
+        queryset = self.queryset
+        if cursor:
+            values, reverse = self.decode(cursor)
+            queryset = queryset.filter(self._after(values, reverse))
+
+        items = list(queryset.order_by(*self._order_by(reverse))[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if reverse:
+            items.reverse()
+        if not items:
+            return CursorPage(items)
+
+        if reverse:
+            next_cursor = self.encode(items[-1])
+            previous_cursor = self.encode(items[0], reverse=True) if has_more else None
+        else:
+            next_cursor = self.encode(items[-1]) if has_more else None
+            previous_cursor = self.encode(items[0], reverse=True) if cursor else None
+        return CursorPage(items, next_cursor, previous_cursor)
@@ -0,0 +1,195 @@
+"""
+Per-request profiling used by SamplingProfilerMiddleware.
+
+A profiled request is run under cProfile while a background thread samples
+its stack for a flame-graph friendly "collapsed stacks" file. SQL time is
+measured with a database execute wrapper, template time comes from the
+cumulative time of Template._render, and whatever is left is Python time.
+Artifacts are written to CMS_PROFILER['DIRECTORY'] as
+
+    <ns>-<pid>-<url_name>.json        summary (times split by SQL/template/Python)
+    <ns>-<pid>-<url_name>.prof        cProfile stats, readable with pstats/snakeviz
+    <ns>-<pid>-<url_name>.collapsed   "frame;frame;frame count" lines
+
+and only the newest MAX_PROFILES sets are kept.
+"""
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'DIRECTORY': Path(settings.BASE_DIR) / 'var' / 'profiles',
+    'MAX_PROFILES': 200,
+    'SAMPLE_INTERVAL': 0.005,
+    'HEADER': 'HTTP_X_CMS_PROFILE',
+    'TOKEN_MAX_AGE': 24 * 60 * 60,
+}
+
+TOKEN_SALT = 'cmsapp.profiling'
+
+_TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_PROFILER', {}))
+    config['DIRECTORY'] = Path(config['DIRECTORY'])
+    return config
+
+
+# Signed header support
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def check_token(value, max_age):
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=max_age) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+def _in_template_render(frame):
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == '_render' and code.co_filename.endswith(_TEMPLATE_BASE):
+            return True
+        frame = frame.f_back
+    return False
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+class RequestProfile:
+    def __init__(self, config):
+        self.config = config
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), config['SAMPLE_INTERVAL'])
+        self.queries = 0
+        self.sql_time = 0.0
+        self.sql_in_templates = 0.0
+        self.total_time = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.sql_time += elapsed
+            if _in_template_render(sys._getframe(1)):
+                self.sql_in_templates += elapsed
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.total_time = time.perf_counter() - self._start
+
+    def template_time(self):
+        stats = pstats.Stats(self.profiler).stats
+        return sum(
+            cumtime
+            for (filename, _, funcname), (_, _, _, cumtime, _) in stats.items()
+            if funcname == '_render' and filename.endswith(_TEMPLATE_BASE)
+        )
+
+    def summary(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        template_time = max(self.template_time() - self.sql_in_templates, 0.0)
+        return {
+            'url_name': (match.url_name if match else None) or 'unresolved',
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'timestamp': time.time(),
+            'total': self.total_time,
+            'sql': self.sql_time,
+            'template': template_time,
+            'python': max(self.total_time - self.sql_time - template_time, 0.0),
+            'queries': self.queries,
+        }
+
+    def save(self, request, response):
+        directory = self.config['DIRECTORY']
+        directory.mkdir(parents=True, exist_ok=True)
+
+        summary = self.summary(request, response)
+        stem = '%d-%d-%s' % (time.time_ns(), os.getpid(), summary['url_name'].replace('/', '_'))
+        summary['profile'] = stem + '.prof'
+
+        self.profiler.dump_stats(directory / (stem + '.prof'))
+        with open(directory / (stem + '.collapsed'), 'w') as fh:
+            for stack, count in self.sampler.stacks.most_common():
+                fh.write(f'{stack} {count}\n')
+        # Summary goes last: readers only pick up complete profiles
+        with open(directory / (stem + '.json'), 'w') as fh:
+            json.dump(summary, fh)
+
+        rotate(directory, self.config['MAX_PROFILES'])
+        return summary
+
+
+def rotate(directory, keep):
+    summaries = sorted(directory.glob('*.json'))
+    for path in summaries[:max(len(summaries) - keep, 0)]:
+        for suffix in ('.json', '.prof', '.collapsed'):
+            try:
+                path.with_suffix(suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def load_summaries(directory):
+    summaries = []
+    for path in sorted(Path(directory).glob('*.json')):
+        try:
+            with open(path) as fh:
+                summaries.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return summaries
@@ -0,0 +1,113 @@
+"""
+"Clubs you may like": item-to-item recommendations from co-membership.
+
+compute_similarities() runs offline (the compute_club_similarity command). It
+builds the sparse user x club membership matrix M, takes the club x club
+co-membership counts C = M.T @ M in one sparse product, and scales them to
+cosine similarity, C[a, b] / sqrt(|a| * |b|), where |a| is the number of
+members of club a (the diagonal of C). Only the TOP_K most similar clubs of
+each club are kept in ClubSimilarity, replacing the previous table in one
+transaction.
+
+recommended_clubs() is then one indexed lookup of the similarity rows of the
+user's clubs; the rows are merged in Python by summing each candidate's
+scores, so a club similar to several of the user's clubs ranks higher.
+
+NumPy and SciPy are only needed by the command, not by the web process.
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Club, ClubMembership, ClubSimilarity
+
+DEFAULTS = {
+    # Similar clubs stored per club
+    'TOP_K': 20,
+    # Pairs of clubs sharing fewer members than this are not considered similar
+    'MIN_COMMON_MEMBERS': 2,
+    # Recommendations shown on the club list
+    'LIMIT': 6,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_RECOMMENDATIONS', {}))
+    return config
+
+
+def _import_numpy():
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError as exc:
+        raise ImproperlyConfigured('Computing club similarity requires numpy and scipy.') from exc
+    return numpy, sparse
+
+
+def compute_similarities(config=None):
+    # Yields (club_id, similar_id, score), each club's rows by descending score
+    config = config or get_config()
+    np, sparse = _import_numpy()
+
+    pairs = np.array(list(ClubMembership.objects.values_list('user_id', 'club_id').iterator(chunk_size=5000)),
+                     dtype=np.int64).reshape(-1, 2)
+    if not len(pairs):
+        return
+    _, user_index = np.unique(pairs[:, 0], return_inverse=True)
+    club_ids, club_index = np.unique(pairs[:, 1], return_inverse=True)
+    members = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float64), (user_index, club_index)),
+        shape=(user_index.max() + 1, len(club_ids)),
+    )
+
+    common = (members.T @ members).tocsr()
+    scale = sparse.diags(1.0 / np.sqrt(common.diagonal()))
+    common.setdiag(0)
+    common.data[common.data < config['MIN_COMMON_MEMBERS']] = 0
+    common.eliminate_zeros()
+    similarity = (scale @ common @ scale).tocsr()
+
+    top_k = config['TOP_K']
+    for row, club_id in enumerate(club_ids):
+        start, end = similarity.indptr[row], similarity.indptr[row + 1]
+        scores = similarity.data[start:end]
+        columns = similarity.indices[start:end]
+        if len(scores) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+            scores, columns = scores[keep], columns[keep]
+        for i in np.argsort(-scores, kind='stable'):
+            yield int(club_id), int(club_ids[columns[i]]), float(scores[i])
+
+
+@transaction.atomic
+def rebuild(config=None):
+    rows = [
+        ClubSimilarity(club_id=club_id, similar_id=similar_id, score=score)
+        for club_id, similar_id, score in compute_similarities(config)
+    ]
+    ClubSimilarity.objects.all().delete()
+    ClubSimilarity.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def recommended_clubs(user, limit=None):
+    limit = limit or get_config()['LIMIT']
+    rows = (
+        ClubSimilarity.objects.filter(club__clubmembership__user=user, similar__is_approved=True)
+        .exclude(Exists(ClubMembership.objects.filter(user=user, club=OuterRef('similar_id'))))
+        .values_list('similar_id', 'score')
+    )
+    totals = defaultdict(float)
+    for similar_id, score in rows:
+        totals[similar_id] += score
+    if not totals:
+        return []
+    best = heapq.nlargest(limit, totals.items(), key=lambda item: (item[1], -item[0]))
+    clubs = Club.objects.select_related('created_by').in_bulk([club_id for club_id, _ in best])
+    return [clubs[club_id] for club_id, _ in best if club_id in clubs]
@@ -0,0 +1,316 @@
+"""
+Recurring events.
+
+A series is stored as one Event row: its start_date/end_date are the first
+occurrence, `recurrence` and `recurrence_interval` give the rule (every N
+days, weeks or months, in local time so a weekly 6 pm session stays at 6 pm
+across DST changes) and `recurrence_until` the last date an occurrence may
+start on. Occurrences are numbered from 0 and never stored; they are
+expanded on demand, and only within the window a caller asks for.
+EventOccurrenceException rows cancel or reschedule single occurrences, and
+EventRegistration.occurrence says which occurrence a registration is for.
+
+Event.series_end (the end of the series' last occurrence, kept up to date by
+signals) bounds every range query: the events that can have an occurrence
+overlapping [start, end) are exactly those with start_date < end and
+series_end > start.
+"""
+import base64
+import calendar
+import heapq
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Event, EventOccurrenceException
+
+# Upper bound on the occurrences of one series
+MAX_OCCURRENCES = 520
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+MONTHLY = 'monthly'
+STEP_DAYS = {DAILY: 1, WEEKLY: 7}
+
+
+class Occurrence:
+    """
+    One occurrence of an event. Attributes other than the occurrence's own
+    times come from the event, so templates can treat it like an Event.
+    """
+
+    def __init__(self, event, index, start_date, end_date, is_cancelled=False, is_moved=False):
+        self.event = event
+        self.index = index
+        self.start_date = start_date
+        self.end_date = end_date
+        self.is_cancelled = is_cancelled
+        self.is_moved = is_moved
+
+    def __getattr__(self, name):
+        if name == 'event' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.event, name)
+
+    def __repr__(self):
+        return f'<Occurrence {self.event.pk}#{self.index} {self.start_date:%Y-%m-%d %H:%M}>'
+
+    @property
+    def is_closed(self):
+        return timezone.now() > self.end_date
+
+    def sort_key(self):
+        return (self.start_date, self.event.pk, self.index)
+
+
+def _add_months(value, months):
+    month = value.month - 1 + months
+    year, month = value.year + month // 12, month % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def _local_start(event, index):
+    # Wall-clock start of occurrence `index`, before applying exceptions
+    first = timezone.localtime(event.start_date).replace(tzinfo=None)
+    if event.recurrence == MONTHLY:
+        naive = _add_months(first, index * event.recurrence_interval)
+    else:
+        naive = first + timedelta(days=index * STEP_DAYS[event.recurrence] * event.recurrence_interval)
+    return naive
+
+
+def rule_start(event, index):
+    if index == 0 or not event.recurrence:
+        return event.start_date
+    return timezone.make_aware(_local_start(event, index))
+
+
+def occurrence_count(event, limit=MAX_OCCURRENCES):
+    # Number of occurrences by the rule; only `limit` are ever expanded
+    if not event.recurrence:
+        return 1
+    if event.recurrence_until is None:
+        return limit
+    first = timezone.localtime(event.start_date).date()
+    if event.recurrence == MONTHLY:
+        months = (event.recurrence_until.year - first.year) * 12 + event.recurrence_until.month - first.month
+        count = months // event.recurrence_interval + 1
+        # The last month may end before the series' day of the month comes round
+        if _local_start(event, count - 1).date() > event.recurrence_until:
+            count -= 1
+    else:
+        count = (event.recurrence_until - first).days // (STEP_DAYS[event.recurrence] * event.recurrence_interval) + 1
+    count = max(1, count)
+    return count if limit is None else min(count, limit)
+
+
+def rule_error(event):
+    # Why the repeat rule of an unsaved `event` is unusable, or None
+    if not event.recurrence:
+        return None
+    if event.recurrence_until is None:
+        return 'Choose the last date of a repeating event.'
+    if event.recurrence_until < timezone.localtime(event.start_date).date():
+        return 'The last date cannot be before the first occurrence.'
+    if occurrence_count(event, limit=None) > MAX_OCCURRENCES:
+        return f'A repeating event can have at most {MAX_OCCURRENCES} occurrences.'
+    return None
+
+
+def _first_index_from(event, moment):
+    # Lowest index whose occurrence may still end after `moment`; a slight
+    # underestimate is fine, callers skip occurrences that end too early
+    if not event.recurrence or moment <= event.start_date:
+        return 0
+    duration = event.end_date - event.start_date
+    elapsed = moment - duration - event.start_date
+    if event.recurrence == MONTHLY:
+        return max(0, int(elapsed.days // 31 // event.recurrence_interval) - 1)
+    return max(0, elapsed.days // (STEP_DAYS[event.recurrence] * event.recurrence_interval) - 1)
+
+
+def series_end(event, exceptions=()):
+    duration = event.end_date - event.start_date
+    end = rule_start(event, occurrence_count(event) - 1) + duration
+    for exception in exceptions:
+        if exception.end_date and exception.end_date > end:
+            end = exception.end_date
+    return end
+
+
+def next_index(event, moment):
+    # Index of the first occurrence (by rule) still running at `moment`, or None
+    duration = event.end_date - event.start_date
+    for index in range(_first_index_from(event, moment), occurrence_count(event)):
+        if rule_start(event, index) + duration > moment:
+            return index
+    return None
+
+
+def load_exceptions(events):
+    # {event id: {index: EventOccurrenceException}} for the recurring events given
+    ids = [event.pk for event in events if event.recurrence]
+    found = defaultdict(dict)
+    if ids:
+        for exception in EventOccurrenceException.objects.filter(event_id__in=ids):
+            found[exception.event_id][exception.occurrence] = exception
+    return found
+
+
+def _make(event, index, exception=None):
+    start = rule_start(event, index)
+    end = start + (event.end_date - event.start_date)
+    if exception is None:
+        return Occurrence(event, index, start, end)
+    moved = exception.start_date is not None
+    return Occurrence(
+        event, index,
+        exception.start_date if moved else start,
+        exception.end_date if moved else end,
+        is_cancelled=exception.is_cancelled, is_moved=moved,
+    )
+
+
+def occurrence(event, index, exceptions=None):
+    # Occurrence `index` of `event`, or None if the series has no such occurrence
+    if index < 0 or index >= occurrence_count(event):
+        return None
+    if exceptions is None:
+        exceptions = load_exceptions([event])
+    return _make(event, index, exceptions.get(event.pk, {}).get(index))
+
+
+def _rule_occurrences(event, start, end, overrides):
+    # Occurrences left where the rule puts them, in order; start/end of None
+    # leave that side of the window open
+    duration = event.end_date - event.start_date
+    first = _first_index_from(event, start) if start is not None else 0
+    for index in range(first, occurrence_count(event)):
+        rule = rule_start(event, index)
+        if end is not None and rule >= end:
+            break
+        if start is not None and rule + duration <= start:
+            continue
+        if index not in overrides or overrides[index].start_date is None:
+            yield _make(event, index, overrides.get(index))
+
+
+def _moved_occurrences(event, start, end, overrides):
+    # Rescheduled occurrences land wherever their exception puts them
+    for index, exception in overrides.items():
+        if exception.start_date is not None and index < occurrence_count(event):
+            if (end is None or exception.start_date < end) and (start is None or exception.end_date > start):
+                yield _make(event, index, exception)
+
+
+def _event_occurrences(event, start, end, exceptions):
+    overrides = exceptions.get(event.pk, {})
+    yield from _rule_occurrences(event, start, end, overrides)
+    yield from _moved_occurrences(event, start, end, overrides)
+
+
+def expand(events, start=None, end=None, include_cancelled=False, exceptions=None):
+    # Occurrences of `events` overlapping [start, end), ordered by start
+    events = list(events)
+    if exceptions is None:
+        exceptions = load_exceptions(events)
+    found = []
+    for event in events:
+        for item in _event_occurrences(event, start, end, exceptions):
+            if include_cancelled or not item.is_cancelled:
+                found.append(item)
+    found.sort(key=Occurrence.sort_key)
+    return found
+
+
+def next_occurrences(event, after, limit, exceptions=None):
+    # The next `limit` occurrences still running at `after`, cancelled ones included
+    if exceptions is None:
+        exceptions = load_exceptions([event])
+    overrides = exceptions.get(event.pk, {})
+    items = list(islice(_rule_occurrences(event, after, None, overrides), limit))
+    items.extend(_moved_occurrences(event, after, None, overrides))
+    items.sort(key=Occurrence.sort_key)
+    return items[:limit]
+
+
+def in_range(queryset, start, end):
+    # The series of `queryset` that can have an occurrence overlapping [start, end)
+    if start is not None:
+        queryset = queryset.filter(series_end__gt=start)
+    if end is not None:
+        queryset = queryset.filter(start_date__lt=end)
+    return queryset
+
+
+def occurrences_between(queryset, start, end, include_cancelled=False):
+    return expand(in_range(queryset, start, end), start, end, include_cancelled)
+
+
+def upcoming(queryset, after, limit, position=None):
+    """
+    The first `limit` occurrences (plus one, to signal a next page) starting
+    at or after `after`, or strictly after the (start, event id, index)
+    `position` of the last occurrence already shown.
+
+    One-off events are read in start_date order with a LIMIT; only the
+    recurring series still running are expanded, lazily, and merged in.
+    """
+    since = position[0] if position else after
+
+    def wanted(item):
+        if item.is_cancelled:
+            return False
+        return item.sort_key() > position if position else item.start_date >= after
+
+    singles = queryset.filter(recurrence='')
+    if position:
+        singles = singles.filter(Q(start_date__gt=since) | Q(start_date=since, id__gt=position[1]))
+    else:
+        singles = singles.filter(start_date__gte=since)
+    single = list(singles.order_by('start_date', 'id')[:limit + 1])
+    # Occurrences starting after the last one-off event fetched are not needed
+    horizon = single[-1].start_date + timedelta(microseconds=1) if len(single) > limit else None
+    series = list(in_range(queryset.exclude(recurrence=''), since, horizon))
+    exceptions = load_exceptions(series)
+
+    def stream(event):
+        # No series contributes more than limit + 1 occurrences, so its rule
+        # is only expanded that far
+        overrides = exceptions.get(event.pk, {})
+        items = list(islice(filter(wanted, _rule_occurrences(event, since, horizon, overrides)), limit + 1))
+        items.extend(filter(wanted, _moved_occurrences(event, since, horizon, overrides)))
+        return sorted(items, key=Occurrence.sort_key)
+
+    streams = [stream(event) for event in series]
+    merged = heapq.merge(
+        (Occurrence(event, 0, event.start_date, event.end_date) for event in single), *streams,
+        key=Occurrence.sort_key,
+    )
+    items = []
+    for item in merged:
+        items.append(item)
+        if len(items) > limit:
+            break
+    return items
+
+
+def encode_position(item):
+    payload = [item.start_date.isoformat(), item.event.pk, item.index]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_position(value):
+    # The (start, event id, index) of an encoded occurrence, or None if malformed
+    try:
+        start, event_id, index = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        start = datetime.fromisoformat(start)
+        if timezone.is_naive(start):
+            return None
+        return start, int(event_id), int(index)
+    except (ValueError, TypeError):
+        return None
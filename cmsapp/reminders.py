@@ -0,0 +1,165 @@
+"""
+Event reminder scheduling.
+
+ReminderScheduler keeps a min-heap of (fire_at, event, offset) triggers for
+the events starting within the next LOOKAHEAD seconds (plus the largest
+offset), so the `run_reminders` loop only sleeps until the next trigger
+instead of scanning every event. Event saves and deletes bump
+Club.events_updated_at (see cmsapp.signals); the scheduler polls its maximum
+with one aggregate query and rebuilds the heap when it moves. Each trigger is
+also rechecked against the event's current start time before it fires, so a
+rescheduled or deleted event never gets a stale reminder. Recurring events
+get reminders for each occurrence (see cmsapp.recurrence).
+
+A fired trigger claims its EventReminder row, whose unique key makes every
+reminder go out at most once, and then hands the mailing to the task queue.
+send_reminder() mails the registrants in batches with send_mass_mail.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import recurrence
+from .models import Club, Event, EventReminder, EventRegistration
+
+DEFAULTS = {
+    # Minutes before the start of an event at which reminders go out
+    'OFFSETS': [24 * 60, 60],
+    # Seconds of upcoming triggers held in the heap
+    'LOOKAHEAD': 6 * 3600,
+    # Longest the scheduler sleeps before checking for changed events
+    'RECHECK_INTERVAL': 30,
+    'BATCH_SIZE': 200,
+    'FROM_EMAIL': None,
+    # Prefix for links in the email, e.g. 'https://clubs.example.edu'
+    'SITE_URL': '',
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_REMINDERS', {}))
+    return config
+
+
+class ReminderScheduler:
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.offsets = sorted(set(self.config['OFFSETS']))
+        self.heap = []
+        self.loaded_until = None
+        self.stamp = None
+
+    def _changes_stamp(self):
+        return Club.objects.aggregate(stamp=Max('events_updated_at'))['stamp']
+
+    def refresh(self, now):
+        stamp = self._changes_stamp()
+        lookahead = timedelta(seconds=self.config['LOOKAHEAD'])
+        if self.loaded_until is None or stamp != self.stamp or now >= self.loaded_until - lookahead / 2:
+            self.load(now)
+            self.stamp = stamp
+
+    def load(self, now):
+        until = now + timedelta(seconds=self.config['LOOKAHEAD'])
+        latest_start = until + timedelta(minutes=self.offsets[-1])
+        claimed = set(
+            EventReminder.objects.filter(event_start__gt=now, event_start__lte=latest_start)
+            .values_list('event_id', 'offset_minutes', 'event_start')
+        )
+        heap = []
+        events = recurrence.in_range(Event.objects.all(), now, latest_start + timedelta(microseconds=1))
+        for occurrence in recurrence.expand(events, now, latest_start + timedelta(microseconds=1)):
+            event_id, start = occurrence.event.pk, occurrence.start_date
+            if not now < start <= latest_start:
+                continue
+            # Offsets ascend, so fire times descend
+            triggers = [(start - timedelta(minutes=offset), event_id, offset, start) for offset in self.offsets]
+            if any((event_id, offset, start) in claimed for offset in self.offsets):
+                # An earlier reminder went out: later ones are still due
+                triggers = [t for t in triggers if t[0] > now and (event_id, t[2], start) not in claimed]
+            else:
+                # Reminders missed while the scheduler was down (or before the
+                # event existed) collapse into one, unless a later one is still ahead
+                upcoming = [t for t in triggers if t[0] > now]
+                triggers = upcoming or triggers[:1]
+            heap.extend(t for t in triggers if t[0] <= until)
+        heapq.heapify(heap)
+        self.heap = heap
+        self.loaded_until = until
+
+    def next_fire_at(self):
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        while self.heap and self.heap[0][0] <= now:
+            yield heapq.heappop(self.heap)
+
+    def fire(self, trigger):
+        _, event_id, offset, start = trigger
+        event = Event.objects.filter(pk=event_id).first()
+        if event is None or occurrence_at(event, start) is None:
+            return None
+        try:
+            with transaction.atomic():
+                reminder = EventReminder.objects.create(
+                    event_id=event_id, offset_minutes=offset, event_start=start,
+                )
+        except IntegrityError:
+            # Another scheduler got there first
+            return None
+        from .tasks import send_event_reminder
+        send_event_reminder.delay(reminder.pk)
+        return reminder
+
+
+def occurrence_at(event, start):
+    # The occurrence of `event` starting at `start`, unless it was cancelled or moved
+    for occurrence in recurrence.expand([event], start, start + timedelta(microseconds=1)):
+        if occurrence.start_date == start:
+            return occurrence
+    return None
+
+
+def send_reminder(reminder_id, config=None):
+    config = config or get_config()
+    reminder = EventReminder.objects.select_related('event__club').filter(pk=reminder_id, sent_at__isnull=True).first()
+    if reminder is None:
+        return 0
+    occurrence = occurrence_at(reminder.event, reminder.event_start)
+    if occurrence is None:
+        # Rescheduled after the trigger fired; the new start has its own reminders
+        return 0
+
+    subject = f'Reminder: {occurrence.title} starts {timezone.localtime(occurrence.start_date):%b %d, %H:%M}'
+    body = render_to_string('cmsapp/email/event_reminder.txt', {
+        'event': occurrence,
+        'reminder': reminder,
+        'site_url': config['SITE_URL'].rstrip('/'),
+    })
+    from_email = config['FROM_EMAIL'] or settings.DEFAULT_FROM_EMAIL
+
+    registrants = (
+        EventRegistration.objects.filter(event=occurrence.event, occurrence=occurrence.index).exclude(user__email='')
+        .order_by('user_id').values_list('user_id', 'user__email')
+    )
+    while True:
+        batch = list(registrants.filter(user_id__gt=reminder.last_user_id)[:config['BATCH_SIZE']])
+        if not batch:
+            break
+        # One message per recipient so addresses are not disclosed to each other;
+        # send_mass_mail delivers the whole batch over a single connection
+        sent = send_mass_mail([(subject, body, from_email, [email]) for _, email in batch])
+        reminder.sent_count += sent
+        reminder.last_user_id = batch[-1][0]
+        reminder.save(update_fields=['sent_count', 'last_user_id'])
+
+    reminder.sent_at = timezone.now()
+    reminder.save(update_fields=['sent_at'])
+    return reminder.sent_count
@@ -0,0 +1,180 @@
+"""
+Event scheduling conflicts: two events at the same location whose times
+overlap, and a member registered for two overlapping events.
+
+Times are half-open [start_date, end_date), so back-to-back events do not
+conflict, and recurring events are checked occurrence by occurrence (see
+cmsapp.recurrence). A check is one range query: for a venue the index on
+(location, start_date, end_date) narrows the search to the location's events
+starting before the checked time span ends. When several intervals are
+checked at once (every occurrence of a new series, or a batch of imported
+events) the stored occurrences go into an IntervalTree instead of being
+compared pairwise. report_conflicts() finds every overlapping pair with a
+sweep over the occurrences sorted by start, O(n log n) plus the number of
+conflicts, rather than comparing all pairs.
+"""
+import heapq
+from itertools import groupby
+
+from . import recurrence
+from .models import Event, EventRegistration
+
+
+class IntervalTree:
+    """
+    Static interval tree over (start, end, item) triples.
+
+    The intervals are kept sorted by start; the middle of every index range
+    is that range's root, and max_end[i] is the latest end in the subtree
+    rooted at i, so a query skips every subtree that ends before it starts.
+    overlapping() runs in O(log n + matches).
+    """
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.max_end = [None] * len(self.intervals)
+        self._build(0, len(self.intervals))
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        latest = self.intervals[mid][1]
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and child > latest:
+                latest = child
+        self.max_end[mid] = latest
+        return latest
+
+    def overlapping(self, start, end):
+        # Intervals overlapping [start, end), ordered by start
+        found = []
+        ranges = [(0, len(self.intervals))]
+        while ranges:
+            lo, hi = ranges.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_end[mid] <= start:
+                continue
+            ranges.append((lo, mid))
+            interval = self.intervals[mid]
+            # Everything right of mid starts no earlier than it does
+            if interval[0] < end:
+                if interval[1] > start:
+                    found.append(interval)
+                ranges.append((mid + 1, hi))
+        found.sort(key=lambda interval: (interval[0], interval[1]))
+        return found
+
+
+def overlapping_pairs(intervals):
+    # Yields every overlapping pair of (start, end, item) triples once, earlier start first
+    active = []
+    ordered = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+    for seq, interval in enumerate(ordered):
+        while active and active[0][0] <= interval[0]:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, interval
+        heapq.heappush(active, (interval[1], seq, interval))
+
+
+def venue_conflicts(location, intervals, exclude=None):
+    # Stored occurrences at `location` overlapping any of the (start, end) intervals
+    intervals = list(intervals)
+    if not intervals:
+        return []
+    events = Event.objects.filter(location=location).select_related('club')
+    if exclude is not None:
+        events = events.exclude(pk=exclude)
+    stored = recurrence.occurrences_between(
+        events, min(start for start, _ in intervals), max(end for _, end in intervals),
+    )
+    if len(intervals) == 1:
+        return stored
+    tree = IntervalTree((item.start_date, item.end_date, item) for item in stored)
+    found = {}
+    for start, end in intervals:
+        for _, _, item in tree.overlapping(start, end):
+            found[item.event.pk, item.index] = item
+    return sorted(found.values(), key=recurrence.Occurrence.sort_key)
+
+
+def attendee_conflicts(user, occurrence):
+    # Occurrences the user registered for that overlap `occurrence`
+    registrations = list(
+        EventRegistration.objects.filter(
+            user=user, event__start_date__lt=occurrence.end_date, event__series_end__gt=occurrence.start_date,
+        ).select_related('event__club')
+    )
+    exceptions = recurrence.load_exceptions([registration.event for registration in registrations])
+    found = []
+    for registration in registrations:
+        if (registration.event_id, registration.occurrence) == (occurrence.event.pk, occurrence.index):
+            continue
+        other = recurrence.occurrence(registration.event, registration.occurrence, exceptions)
+        if (other is not None and not other.is_cancelled
+                and other.start_date < occurrence.end_date and other.end_date > occurrence.start_date):
+            found.append(other)
+    found.sort(key=recurrence.Occurrence.sort_key)
+    return found
+
+
+def batch_venue_conflicts(candidates):
+    # candidates: (location, start, end) triples, e.g. events about to be
+    # imported. Returns {index: [conflicting Occurrences or candidate indexes]}
+    # covering clashes with stored events and between the candidates.
+    if not candidates:
+        return {}
+    span_start = min(start for _, start, _ in candidates)
+    span_end = max(end for _, _, end in candidates)
+    trees = {}
+    stored = recurrence.occurrences_between(
+        Event.objects.filter(location__in={location for location, _, _ in candidates}).select_related('club'),
+        span_start, span_end,
+    )
+    for item in stored:
+        trees.setdefault(item.location, []).append((item.start_date, item.end_date, item))
+    for index, (location, start, end) in enumerate(candidates):
+        trees.setdefault(location, []).append((start, end, index))
+    trees = {location: IntervalTree(intervals) for location, intervals in trees.items()}
+
+    conflicts = {}
+    for index, (location, start, end) in enumerate(candidates):
+        found = [item for _, _, item in trees[location].overlapping(start, end) if item != index]
+        if found:
+            conflicts[index] = found
+    return conflicts
+
+
+def report_conflicts(events=None, start=None):
+    # Yields (location, first, second) for every pair of overlapping occurrences
+    # at one location, ignoring occurrences that ended before `start`
+    events = recurrence.in_range(Event.objects.all() if events is None else events, start, None)
+    rows = events.exclude(location='').select_related('club').order_by('location', 'start_date', 'id')
+    for location, group in groupby(rows.iterator(chunk_size=2000), key=lambda event: event.location):
+        occurrences = recurrence.expand(group, start)
+        for first, second in overlapping_pairs((item.start_date, item.end_date, item) for item in occurrences):
+            yield location, first[2], second[2]
+
+
+def report_attendee_conflicts(events=None, start=None):
+    # Yields (user, first, second) for every member registered for two overlapping occurrences
+    events = recurrence.in_range(Event.objects.all() if events is None else events, start, None)
+    exceptions = recurrence.load_exceptions(events.exclude(recurrence='').only('pk', 'recurrence'))
+    registrations = (
+        EventRegistration.objects.filter(event__in=events).select_related('user', 'event')
+        .order_by('user_id', 'event__start_date', 'event_id')
+    )
+    for user, group in groupby(registrations.iterator(chunk_size=2000), key=lambda registration: registration.user):
+        intervals = []
+        for registration in group:
+            item = recurrence.occurrence(registration.event, registration.occurrence, exceptions)
+            if item is not None and not item.is_cancelled and (start is None or item.end_date > start):
+                intervals.append((item.start_date, item.end_date, item))
+        for first, second in overlapping_pairs(intervals):
+            yield user, first[2], second[2]
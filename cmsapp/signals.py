@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.dispatch import receiver
-from .models import UserProfile
+from .models import UserProfile, Club, ClubMembership, ClubJoinRequest, Event, EventRegistration, Team, Message, MessageArchiveSegment, EventOccurrenceException, ChangeLogEntry
+from .cache import bump_club_stamp, bump_event_stamp, bump_generation, bump_user_stamp
+from . import activity, archive, changes, trending, recurrence
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
@@ -13,5 +19,160 @@ def create_profile(sender, instance, created, **kwargs):
             UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+def save_profile(sender, instance, update_fields=None, **kwargs):
+    # Logging in only stamps last_login, which the profile does not show
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    instance.profile.save()
+
+# Invalidate cmsapp.cache entries for every worker once the write is visible.
+# Profiles are cached under their user's stamp (bump_layout_stamp below).
+@receiver([post_save, post_delete], sender=Club)
+@receiver([post_save, post_delete], sender=ClubMembership)
+@receiver([post_save, post_delete], sender=Event)
+def bump_cache_generation(sender, **kwargs):
+    transaction.on_commit(lambda: bump_generation(sender))
+
+# Drop the cached layout fragments of a user whose role or memberships changed.
+# Saving a User also saves its profile (save_profile above), so renames land here too.
+@receiver([post_save, post_delete], sender=UserProfile)
+@receiver([post_save, post_delete], sender=ClubMembership)
+def bump_layout_stamp(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_user_stamp(user_id))
+
+# Club pages list their members' and applicants' usernames, which a User save
+# can change without touching the club; their ETags include the club stamp.
+@receiver(post_save, sender=User)
+def bump_member_clubs(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) == {'last_login'}):
+        return
+    club_ids = set(ClubMembership.objects.filter(user=instance).values_list('club_id', flat=True))
+    club_ids.update(ClubJoinRequest.objects.filter(
+        user=instance, is_approved=False, is_rejected=False,
+    ).values_list('club_id', flat=True))
+
+    def bump():
+        for club_id in club_ids:
+            bump_club_stamp(club_id)
+    transaction.on_commit(bump)
+
+# Club.version / Event.version change whenever anything shown on the club or
+# event page changes; the detail views derive their ETags from them. Counters
+# maintained here are written with F() so concurrent bumps are never lost.
+def _touch_club(club_id, **changes):
+    Club.objects.filter(pk=club_id).update(version=F('version') + 1, **changes)
+    transaction.on_commit(lambda: bump_club_stamp(club_id))
+    if 'trending_score' in changes:
+        transaction.on_commit(trending.scores_changed)
+
+def _touch_event(event_id, **changes):
+    Event.objects.filter(pk=event_id).update(version=F('version') + 1, **changes)
+    transaction.on_commit(lambda: bump_event_stamp(event_id))
+
+# A plain save() would write back whatever counter values the instance was
+# loaded with, undoing bumps made since; keep the database values instead,
+# and load them back afterwards so the instance holds values, not expressions.
+CLUB_COUNTERS = ['version', 'events_version', 'events_updated_at', 'trending_score']
+EVENT_COUNTERS = ['version', 'registrant_count']
+
+@receiver(pre_save, sender=Club)
+def preserve_club_counters(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance.version = F('version') + 1
+        instance.events_version = F('events_version')
+        instance.events_updated_at = F('events_updated_at')
+        instance.trending_score = F('trending_score')
+
+@receiver(pre_save, sender=Event)
+def preserve_event_counters(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance.version = F('version') + 1
+        instance.registrant_count = F('registrant_count')
+
+@receiver(post_save, sender=Club)
+@receiver(post_save, sender=Event)
+def reload_counters(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.refresh_from_db(fields=CLUB_COUNTERS if sender is Club else EVENT_COUNTERS)
+
+# New members, messages, events and registrations also raise the club's
+# trending score; the score rides along with the version bump where there is one
+TRENDING_KINDS = {ClubMembership: 'join', Message: 'message'}
+
+@receiver([post_save, post_delete], sender=ClubMembership)
+@receiver([post_save, post_delete], sender=ClubJoinRequest)
+@receiver([post_save, post_delete], sender=Message)
+def bump_club_version(sender, instance, created=False, **kwargs):
+    changes = trending.bump_changes(TRENDING_KINDS[sender]) if created and sender in TRENDING_KINDS else {}
+    _touch_club(instance.club_id, **changes)
+
+# Calendar feeds key their ETag on the club's events_version
+@receiver([post_save, post_delete], sender=Event)
+def bump_club_events_version(sender, instance, created=False, **kwargs):
+    changes = trending.bump_changes('event') if created else {}
+    _touch_club(instance.club_id, events_version=F('events_version') + 1, events_updated_at=timezone.now(), **changes)
+
+# Event.registrant_count follows the event's EventRegistration rows
+@receiver(post_save, sender=EventRegistration)
+def count_registration(sender, instance, created, **kwargs):
+    if created:
+        _touch_event(instance.event_id, registrant_count=F('registrant_count') + 1)
+        changes = trending.bump_changes('registration')
+        if changes:
+            # Only the score changes; the club's page shows nothing new
+            Club.objects.filter(events=instance.event_id).update(**changes)
+            transaction.on_commit(trending.scores_changed)
+    else:
+        _touch_event(instance.event_id)
+
+@receiver(post_delete, sender=EventRegistration)
+def uncount_registration(sender, instance, **kwargs):
+    _touch_event(instance.event_id, registrant_count=F('registrant_count') - 1)
+
+@receiver([post_save, post_delete], sender=Team)
+def bump_event_version(sender, instance, **kwargs):
+    _touch_event(instance.event_id)
+
+# Event.series_end bounds range queries over recurring series (cmsapp.recurrence)
+@receiver(pre_save, sender=Event)
+def set_series_end(sender, instance, **kwargs):
+    exceptions = ()
+    if instance.recurrence and not instance._state.adding:
+        exceptions = EventOccurrenceException.objects.filter(event_id=instance.pk, start_date__isnull=False)
+    instance.series_end = recurrence.series_end(instance, exceptions)
+
+# Cancelled and moved occurrences change the event page and calendar feeds
+@receiver([post_save, post_delete], sender=EventOccurrenceException)
+def apply_occurrence_exception(sender, instance, **kwargs):
+    event = Event.objects.filter(pk=instance.event_id).first()
+    if event is None:
+        # Deleted along with its event
+        return
+    exceptions = EventOccurrenceException.objects.filter(event_id=event.pk, start_date__isnull=False)
+    _touch_event(event.pk, series_end=recurrence.series_end(event, exceptions))
+    _touch_club(event.club_id, events_version=F('events_version') + 1, events_updated_at=timezone.now())
+
+# Downstream sync follows the change feed (cmsapp.changes)
+@receiver([post_save, post_delete], sender=Club)
+@receiver([post_save, post_delete], sender=Event)
+@receiver([post_save, post_delete], sender=ClubMembership)
+@receiver([post_save, post_delete], sender=EventRegistration)
+@receiver([post_save, post_delete], sender=Message)
+def record_change(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete:
+        action = ChangeLogEntry.DELETE
+    else:
+        action = ChangeLogEntry.INSERT if created else ChangeLogEntry.UPDATE
+    changes.record(sender, instance.pk, action)
+
+# Archive segment rows go away with their club; take the files with them
+@receiver(post_delete, sender=MessageArchiveSegment)
+def delete_archive_segment_file(sender, instance, **kwargs):
+    path = archive.segment_path(instance)
+    transaction.on_commit(lambda: path.unlink(missing_ok=True))
+
+# Write buffered activity log entries that have waited long enough
+@receiver(request_finished)
+def flush_activity_log(sender, **kwargs):
+    activity.buffer.flush()
@@ -0,0 +1,143 @@
+"""
+Slow-query log.
+
+SlowQueryMiddleware installs SlowQueryRecorder as a database execute wrapper.
+Any statement slower than CMS_SLOW_QUERIES['THRESHOLD_MS'] is recorded with
+its normalized SQL, a fingerprint of its parameters (never the values), the
+view being served and the application frame / template node that issued it.
+Records go to an in-process ring buffer and are appended to a JSON-lines
+file shared by all workers, which the slow query page aggregates.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+from .sqlinspect import normalize_sql, fingerprint, params_fingerprint, call_site, describe_call_site
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'BUFFER_SIZE': 500,
+    'LOG_FILE': Path(settings.BASE_DIR) / 'var' / 'slow_queries.jsonl',
+    'MAX_FILE_BYTES': 10 * 1024 * 1024,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_SLOW_QUERIES', {}))
+    if config['LOG_FILE']:
+        config['LOG_FILE'] = Path(config['LOG_FILE'])
+    return config
+
+
+current_request = contextvars.ContextVar('cmsapp_slowlog_request', default=None)
+
+recent = deque(maxlen=get_config()['BUFFER_SIZE'])
+_file_lock = threading.Lock()
+
+
+def _view_name():
+    request = current_request.get()
+    match = getattr(request, 'resolver_match', None)
+    if match is not None:
+        return match.view_name
+    return request.path if request is not None else None
+
+
+def record(sql, params, duration, config):
+    normalized = normalize_sql(sql)
+    entry = {
+        'timestamp': time.time(),
+        'duration_ms': round(duration * 1000, 3),
+        'fingerprint': fingerprint(normalized),
+        'sql': normalized,
+        'params_fingerprint': params_fingerprint(params),
+        'view': _view_name(),
+        'call_site': call_site(),
+        'pid': os.getpid(),
+    }
+    recent.append(entry)
+
+    path = config['LOG_FILE']
+    if path:
+        line = json.dumps(entry) + '\n'
+        with _file_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                if path.stat().st_size > config['MAX_FILE_BYTES']:
+                    os.replace(path, path.with_suffix(path.suffix + '.1'))
+            except FileNotFoundError:
+                pass
+            with open(path, 'a') as fh:
+                fh.write(line)
+    return entry
+
+
+class SlowQueryRecorder:
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.threshold = self.config['THRESHOLD_MS'] / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                try:
+                    record(sql, params, duration, self.config)
+                except OSError:
+                    pass
+
+
+def load_records(config=None):
+    config = config or get_config()
+    path = config['LOG_FILE']
+    if not path:
+        return list(recent)
+
+    records = []
+    for candidate in (path.with_suffix(path.suffix + '.1'), path):
+        try:
+            with open(candidate) as fh:
+                for line in fh:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+    return records
+
+
+def aggregate(records):
+    # Worst statements first, by total time spent per fingerprint
+    groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': set(), 'call_sites': defaultdict(int)})
+    for entry in records:
+        group = groups[entry['fingerprint']]
+        group['fingerprint'] = entry['fingerprint']
+        group['sql'] = entry['sql']
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['last_seen'] = max(group.get('last_seen', 0), entry['timestamp'])
+        if entry.get('view'):
+            group['views'].add(entry['view'])
+        group['call_sites'][describe_call_site(entry.get('call_site') or {})] += 1
+
+    rows = []
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+        group['views'] = sorted(group['views'])
+        group['call_sites'] = sorted(group['call_sites'].items(), key=lambda item: -item[1])
+        rows.append(group)
+    rows.sort(key=lambda row: row['total_ms'], reverse=True)
+    return rows
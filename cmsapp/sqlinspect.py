@@ -0,0 +1,88 @@
+"""
+Helpers for describing SQL statements: normalizing them into a shape that
+is stable across parameter values, and finding which application code or
+template node issued them.
+"""
+import hashlib
+import os
+import re
+import sys
+
+from django.conf import settings
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_APP_ROOT = os.path.join(str(settings.BASE_DIR), '')
+_TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+# Instrumentation, caching helpers and entry points never count as the call site
+_SKIP_FILES = tuple(
+    os.path.join(os.path.dirname(__file__), name)
+    for name in ('sqlinspect.py', 'slowlog.py', 'nplusone.py', 'middleware.py', 'profiling.py',
+                 'metrics.py', 'template_backend.py', 'cache.py')
+) + tuple(
+    os.path.join(str(settings.BASE_DIR), name)
+    for name in ('manage.py', os.path.join('cmspro', 'wsgi.py'), os.path.join('cmspro', 'asgi.py'))
+)
+
+
+def normalize_sql(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def params_fingerprint(params):
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+
+def _is_app_file(filename):
+    return (
+        filename.startswith(_APP_ROOT)
+        and 'site-packages' not in filename
+        and not filename.startswith(_SKIP_FILES)
+    )
+
+
+def call_site(frame=None):
+    # First application frame and innermost template node on the stack
+    if frame is None:
+        frame = sys._getframe(1)
+
+    site = {'file': None, 'line': None, 'function': None, 'template': None, 'template_line': None, 'node': None}
+    while frame is not None:
+        code = frame.f_code
+        if site['template'] is None and code.co_name == 'render_annotated' and code.co_filename.endswith(_TEMPLATE_BASE):
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                site['template'] = origin.template_name or origin.name
+                site['template_line'] = token.lineno
+                site['node'] = token.contents[:200]
+        if site['file'] is None and _is_app_file(code.co_filename):
+            site['file'] = os.path.relpath(code.co_filename, _APP_ROOT)
+            site['line'] = frame.f_lineno
+            site['function'] = code.co_name
+        if site['file'] is not None and site['template'] is not None:
+            break
+        frame = frame.f_back
+    return site
+
+
+def describe_call_site(site):
+    parts = []
+    if site.get('template'):
+        parts.append(f"{site['template']}:{site['template_line']} ({site['node']})")
+    if site.get('file'):
+        parts.append(f"{site['file']}:{site['line']} in {site['function']}")
+    return ' via '.join(parts) or 'unknown'
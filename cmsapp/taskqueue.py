@@ -0,0 +1,199 @@
+"""
+Background task queue stored in the application database.
+
+Functions decorated with @task are registered by name; calling
+func.delay(...) stores a Task row (arguments must be JSON-serializable).
+The run_worker management command claims due tasks, highest priority
+first, runs them in a process pool and acknowledges them. A failed task is
+retried with exponential backoff until it runs out of attempts. While a task
+runs, its worker refreshes the task's lock every HEARTBEAT_INTERVAL seconds;
+a lock older than STALE_AFTER means the worker died, and the task is requeued,
+or failed once it has used up its attempts.
+
+Task modules are discovered as <app>.tasks for every installed app.
+"""
+import functools
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Task
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 5,
+    'BACKOFF_MAX': 3600,
+    'HEARTBEAT_INTERVAL': 60,
+    'STALE_AFTER': 600,
+    'KEEP_FINISHED_DAYS': 7,
+    # Run tasks inline at enqueue time instead of storing them (tests, local dev)
+    'EAGER': False,
+}
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_TASKS', {}))
+    return config
+
+
+registry = {}
+
+
+class UnknownTask(LookupError):
+    pass
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=None):
+    if func is None:
+        return functools.partial(task, name=name, priority=priority, max_attempts=max_attempts)
+
+    task_name = name or f'{func.__module__}.{func.__qualname__}'
+    registry[task_name] = func
+
+    def delay(*args, **kwargs):
+        return enqueue(task_name, args, kwargs, priority=priority, max_attempts=max_attempts)
+
+    func.task_name = task_name
+    func.delay = delay
+    return func
+
+
+def autodiscover():
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, run_at=None, max_attempts=None):
+    config = get_config()
+    if name not in registry:
+        raise UnknownTask(name)
+    if config['EAGER']:
+        registry[name](*args, **(kwargs or {}))
+        return None
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or config['MAX_ATTEMPTS'],
+    )
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _due():
+    return Task.objects.filter(status=Task.QUEUED, run_at__lte=timezone.now()).order_by('-priority', 'run_at', 'id')
+
+
+def claim(worker, limit=1):
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(_due().select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Task.objects.filter(id__in=ids).update(
+                status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+            )
+        return ids
+
+    # No row locks (SQLite): claim each candidate with a conditional UPDATE;
+    # whichever worker flips the status first owns the task.
+    claimed = []
+    for task_id in _due().values_list('id', flat=True)[:limit * 4]:
+        won = Task.objects.filter(id=task_id, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if won:
+            claimed.append(task_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def _claimed(task_obj):
+    # The task as long as it is still held by the claim that loaded it; a
+    # task requeued from under a worker is not acknowledged by it
+    return Task.objects.filter(
+        id=task_obj.id, status=Task.RUNNING, locked_by=task_obj.locked_by, attempts=task_obj.attempts,
+    )
+
+
+def heartbeat(worker, task_ids):
+    # Keeps requeue_stale() off tasks the worker is still running
+    return Task.objects.filter(id__in=list(task_ids), status=Task.RUNNING, locked_by=worker).update(
+        locked_at=timezone.now(),
+    )
+
+
+def ack(task_obj):
+    return _claimed(task_obj).update(status=Task.DONE, finished_at=timezone.now(), last_error='')
+
+
+def backoff(attempts, config=None):
+    config = config or get_config()
+    delay = min(config['BACKOFF_BASE'] * 2 ** (attempts - 1), config['BACKOFF_MAX'])
+    # Jitter so tasks that failed together do not retry together
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def fail(task_obj, error):
+    if task_obj.attempts < task_obj.max_attempts:
+        return _claimed(task_obj).update(
+            status=Task.QUEUED, run_at=timezone.now() + backoff(task_obj.attempts),
+            locked_by='', locked_at=None, last_error=error,
+        )
+    return _claimed(task_obj).update(
+        status=Task.FAILED, finished_at=timezone.now(), last_error=error,
+    )
+
+
+def run(task_id, worker):
+    # Executes one task claimed by `worker`; runs inside a worker process
+    task_obj = Task.objects.filter(id=task_id, status=Task.RUNNING, locked_by=worker).first()
+    if task_obj is None:
+        return None
+    func = registry.get(task_obj.name)
+    if func is None:
+        _claimed(task_obj).update(
+            status=Task.FAILED, finished_at=timezone.now(), last_error=f'Unknown task {task_obj.name!r}',
+        )
+        return False
+    try:
+        func(*task_obj.args, **task_obj.kwargs)
+    except Exception:
+        fail(task_obj, traceback.format_exc())
+        return False
+    ack(task_obj)
+    return True
+
+
+def requeue_stale(config=None):
+    # Returns the number of abandoned tasks requeued and failed
+    config = config or get_config()
+    now = timezone.now()
+    stale = Task.objects.filter(status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=config['STALE_AFTER']))
+    # A task that keeps killing its worker must not be retried forever
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, finished_at=now, last_error='The worker running the task stopped responding.',
+    )
+    requeued = stale.update(status=Task.QUEUED, locked_by='', locked_at=None)
+    return requeued, failed
+
+
+def purge_finished(config=None):
+    config = config or get_config()
+    cutoff = timezone.now() - timedelta(days=config['KEEP_FINISHED_DAYS'])
+    deleted, _ = Task.objects.filter(status__in=[Task.DONE, Task.FAILED], finished_at__lt=cutoff).delete()
+    return deleted
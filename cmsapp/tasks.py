@@ -0,0 +1,12 @@
+from .taskqueue import task
+from . import calendar_grid, reminders
+
+
+@task(priority=5)
+def send_event_reminder(reminder_id):
+    reminders.send_reminder(reminder_id)
+
+
+@task(priority=-1)
+def prefetch_calendar(kind, value, club_ids):
+    calendar_grid.warm(kind, value, club_ids)
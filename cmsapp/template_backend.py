@@ -0,0 +1,28 @@
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from .metrics import TEMPLATE_RENDER
+
+
+class Template(django_backend.Template):
+    # Records the render time of every template a view renders
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            name = self.template.origin.template_name or 'string'
+            TEMPLATE_RENDER.observe(time.perf_counter() - start, template=name)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache as shared_cache
+from django.test import TestCase
+from django.utils import timezone
+
+from cmsapp import cache
+from cmsapp.models import Club, ClubMembership, Event
+
+
+def aware(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class CmsTestCase(TestCase):
+    """An admin and a member of one approved club, with every cache tier empty."""
+
+    def setUp(self):
+        shared_cache.clear()
+        cache.local_cache.clear()
+        cache.local_counters.clear()
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'pw')
+        self.admin.profile.role = 'admin'
+        self.admin.profile.save()
+        self.member = User.objects.create_user('member', 'member@example.com', 'pw')
+        self.club = Club.objects.create(name='Chess', description='d', created_by=self.admin, is_approved=True)
+        ClubMembership.objects.create(user=self.admin, club=self.club, is_leader=True)
+        ClubMembership.objects.create(user=self.member, club=self.club)
+
+    def create_event(self, start, hours=1, **kwargs):
+        kwargs.setdefault('title', 'Practice')
+        kwargs.setdefault('location', 'Hall')
+        kwargs.setdefault('club', self.club)
+        return Event.objects.create(
+            description='d', start_date=start, end_date=start + timedelta(hours=hours),
+            created_by=self.admin, **kwargs,
+        )
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.signals import request_finished
+from django.db import DatabaseError, transaction
+from django.test import override_settings
+
+from cmsapp import activity
+from cmsapp.models import ActivityLog
+
+from .base import CmsTestCase
+
+
+class ActivityBufferTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(activity, 'buffer', activity.ActivityBuffer())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def log(self, summary='did something'):
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.log(self.member, ActivityLog.MEMBER_JOINED, summary, self.club)
+
+    def test_entries_wait_in_the_buffer(self):
+        self.log()
+        self.assertEqual(len(activity.buffer.entries), 1)
+        self.assertFalse(ActivityLog.objects.exists())
+        self.assertEqual(activity.flush(), 1)
+        entry = ActivityLog.objects.get()
+        self.assertEqual((entry.actor, entry.club, entry.summary), (self.member, self.club, 'did something'))
+
+    def test_rolled_back_actions_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    activity.log(self.member, ActivityLog.MEMBER_JOINED, 'never happened')
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertEqual(activity.buffer.entries, [])
+
+    @override_settings(CMS_ACTIVITY={'MAX_ITEMS': 3})
+    def test_full_buffer_is_written_at_once(self):
+        for n in range(2):
+            self.log(f'entry {n}')
+        self.assertEqual(ActivityLog.objects.count(), 0)
+        with self.assertNumQueries(1):
+            self.log('entry 2')
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        self.assertEqual(activity.buffer.entries, [])
+
+    def test_request_finished_flushes_old_entries(self):
+        self.log()
+        request_finished.send(sender=None)
+        self.assertFalse(ActivityLog.objects.exists())
+        with mock.patch('cmsapp.activity.time.monotonic', return_value=activity.buffer.oldest + 1.5):
+            request_finished.send(sender=None)
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    def test_forked_process_drops_inherited_entries(self):
+        self.log()
+        with mock.patch('cmsapp.activity.os.getpid', return_value=activity.buffer.pid + 1):
+            self.assertEqual(activity.flush(), 0)
+        self.assertFalse(ActivityLog.objects.exists())
+
+    def test_write_errors_are_logged(self):
+        self.log()
+        with mock.patch.object(ActivityLog.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertLogs('cmsapp.activity', 'ERROR') as logs:
+                self.assertEqual(activity.flush(), 0)
+        self.assertIn('Dropped 1 activity log entries', logs.output[0])
+
+    def test_dashboard_reads_pending_entries(self):
+        self.log('joined the club')
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin-dashboard/')
+        self.assertEqual([entry.summary for entry in response.context['recent_activity']], ['joined the club'])
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from cmsapp.models import Club, Message
+
+from .base import CmsTestCase
+
+
+class ApiTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hidden = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=False)
+        self.client.force_login(self.member)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        return response.status_code, response.json()
+
+    def test_requires_login_and_get(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/v1/clubs/').status_code, 401)
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.post('/api/v1/clubs/').status_code, 405)
+
+    def test_club_list_follows_visibility(self):
+        status, body = self.get('/api/v1/clubs/')
+        self.assertEqual(status, 200)
+        self.assertEqual([club['name'] for club in body['results']], ['Chess'])
+        self.client.force_login(self.admin)
+        _, body = self.get('/api/v1/clubs/')
+        self.assertEqual([club['name'] for club in body['results']], ['Chess', 'Go'])
+        self.assertEqual(self.get(f'/api/v1/clubs/{self.hidden.pk}/')[0], 200)
+
+    def test_hidden_club_is_not_found(self):
+        self.assertEqual(self.get(f'/api/v1/clubs/{self.hidden.pk}/')[0], 404)
+        self.assertEqual(self.get(f'/api/v1/clubs/{self.hidden.pk}/members/')[0], 404)
+
+    def test_field_selection(self):
+        _, body = self.get(f'/api/v1/clubs/{self.club.pk}/', fields='id,member_count,created_by')
+        self.assertEqual(body, {'id': self.club.pk, 'member_count': 2, 'created_by': 'admin'})
+        status, body = self.get('/api/v1/clubs/', fields='id,secret')
+        self.assertEqual(status, 400)
+        self.assertIn('Unknown field(s): secret', body['error'])
+
+    def test_members_pages(self):
+        for n in range(3):
+            user = User.objects.create_user(f'extra{n}', f'extra{n}@example.com', 'pw')
+            self.club.clubmembership_set.create(user=user)
+        _, body = self.get(f'/api/v1/clubs/{self.club.pk}/members/', limit=2)
+        names = [row['username'] for row in body['results']]
+        self.assertIsNone(body['previous'])
+        while body['next']:
+            body = self.client.get(body['next']).json()
+            names += [row['username'] for row in body['results']]
+        self.assertEqual(names, ['admin', 'member', 'extra0', 'extra1', 'extra2'])
+        self.assertEqual(self.get(f'/api/v1/clubs/{self.club.pk}/members/', cursor='garbage')[0], 400)
+        self.assertEqual(self.get(f'/api/v1/clubs/{self.club.pk}/members/', limit='x')[0], 400)
+
+    def test_messages_need_membership(self):
+        Message.objects.create(club=self.club, sender=self.admin, content='first')
+        Message.objects.create(club=self.club, sender=self.member, content='second')
+        _, body = self.get(f'/api/v1/clubs/{self.club.pk}/messages/')
+        self.assertEqual([row['content'] for row in body['results']], ['second', 'first'])
+
+        open_club = Club.objects.create(name='Open', description='d', created_by=self.admin, is_approved=True)
+        status, _ = self.get(f'/api/v1/clubs/{open_club.pk}/messages/')
+        self.assertEqual(status, 403)
+
+    def test_upcoming_events_expand_series(self):
+        now = timezone.now()
+        self.create_event(now + timedelta(days=1), title='One-off')
+        self.create_event(
+            now + timedelta(days=2), title='Weekly',
+            recurrence='weekly', recurrence_until=(now + timedelta(days=16)).date(),
+        )
+        _, body = self.get('/api/v1/events/upcoming/', limit=2, fields='title,occurrence')
+        results = body['results']
+        while body['next']:
+            body = self.client.get(body['next']).json()
+            results += body['results']
+        self.assertEqual(results, [
+            {'title': 'One-off', 'occurrence': 0},
+            {'title': 'Weekly', 'occurrence': 0},
+            {'title': 'Weekly', 'occurrence': 1},
+            {'title': 'Weekly', 'occurrence': 2},
+        ])
+        self.assertEqual(self.get('/api/v1/events/upcoming/', club='x')[0], 400)
+        self.assertEqual(self.get('/api/v1/events/upcoming/', cursor='garbage')[0], 400)
+
+    def test_upcoming_events_hide_other_clubs(self):
+        self.create_event(timezone.now() + timedelta(days=1), club=self.hidden)
+        _, body = self.get('/api/v1/events/upcoming/')
+        self.assertEqual(body['results'], [])
+        self.client.force_login(self.admin)
+        _, body = self.get('/api/v1/events/upcoming/', club=self.hidden.pk)
+        self.assertEqual(len(body['results']), 1)
@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from cmsapp import archive
+from cmsapp.models import Club, Message, MessageArchiveSegment
+
+from .base import CmsTestCase
+
+
+class ArchiveTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(CMS_MESSAGE_ARCHIVE={'DIRECTORY': directory, 'SEGMENT_SIZE': 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.now = timezone.now()
+        self.old = [
+            Message.objects.create(
+                club=self.club, sender=self.member, content=f'old {n}',
+                timestamp=self.now - timedelta(days=400, microseconds=-n),
+            )
+            for n in range(5)
+        ]
+        self.recent = Message.objects.create(club=self.club, sender=self.member, content='recent')
+
+    def test_round_trip(self):
+        version = Club.objects.get(pk=self.club.pk).version
+        self.assertEqual(archive.archive_club(self.club, self.now), 5)
+        self.assertEqual(list(Message.objects.all()), [self.recent])
+        self.assertEqual(Club.objects.get(pk=self.club.pk).version, version + 3)
+
+        segments = list(MessageArchiveSegment.objects.order_by('first_timestamp'))
+        self.assertEqual([segment.message_count for segment in segments], [2, 2, 1])
+        self.assertEqual(segments[0].path, f'club_{self.club.pk}/{self.old[0].pk}-{self.old[1].pk}.jsonl.gz')
+        rows = [row for segment in segments for row in archive.read_segment(segment)]
+        self.assertEqual([row['id'] for row in rows], [message.pk for message in self.old])
+        self.assertEqual([row['timestamp'] for row in rows], [message.timestamp for message in self.old])
+        self.assertEqual(rows[0]['content'], 'old 0')
+        self.assertEqual(rows[0]['sender_name'], 'member')
+        self.assertEqual(archive.archive_club(self.club, self.now), 0)
+
+    def test_club_retention_overrides_default(self):
+        Club.objects.filter(pk=self.club.pk).update(message_retention_days=500)
+        club = Club.objects.get(pk=self.club.pk)
+        self.assertEqual(archive.archive_club(club, self.now, dry_run=True), 0)
+        Club.objects.filter(pk=self.club.pk).update(message_retention_days=30)
+        club = Club.objects.get(pk=self.club.pk)
+        self.assertEqual(archive.archive_club(club, self.now, dry_run=True), 5)
+        self.assertEqual(Message.objects.count(), 6)
+
+    def test_deleting_a_segment_removes_its_file(self):
+        archive.archive_club(self.club, self.now)
+        paths = [archive.segment_path(segment) for segment in MessageArchiveSegment.objects.all()]
+        self.assertTrue(all(path.exists() for path in paths))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.club.delete()
+        self.assertFalse(any(path.exists() for path in paths))
+
+    def test_archive_page_reads_newest_segment(self):
+        archive.archive_club(self.club, self.now)
+        self.client.force_login(self.member)
+        response = self.client.get(f'/clubs/{self.club.pk}/messages/archive/')
+        self.assertEqual(
+            [row['content'] for row in response.context['archived_messages']], ['old 4'],
+        )
+        archive.segment_path(response.context['segment']).unlink()
+        response = self.client.get(f'/clubs/{self.club.pk}/messages/archive/')
+        self.assertContains(response, 'This part of the message archive is missing from storage.')
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_messages', '--dry-run', stdout=out)
+        self.assertEqual(
+            out.getvalue(), 'Chess: 5 messages due for archiving.\n5 messages due for archiving in total.\n',
+        )
+        out = StringIO()
+        call_command('archive_messages', '--club', str(self.club.pk), stdout=out)
+        self.assertEqual(out.getvalue(), 'Chess: 5 messages archived.\n5 messages archived in total.\n')
+        self.assertEqual(Message.objects.count(), 1)
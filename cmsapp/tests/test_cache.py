@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cmsapp import cache
+from cmsapp.models import Club, EventRegistration, Message, UserProfile
+
+from .base import CmsTestCase
+
+
+class CacheInvalidationTests(CmsTestCase):
+    def assertCached(self, value, lookup):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertIs(lookup(), value)
+        self.assertEqual(len(ctx), 0)
+
+    def test_club_is_reread_after_save(self):
+        club = cache.get_club(self.club.pk)
+        self.assertEqual(club.name, 'Chess')
+        self.assertCached(club, lambda: cache.get_club(self.club.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.club.name = 'Go'
+            self.club.save()
+        self.assertEqual(cache.get_club(self.club.pk).name, 'Go')
+        # Another process only sees the shared cache
+        cache.local_cache.clear()
+        cache.local_counters.clear()
+        self.assertEqual(cache.get_club(self.club.pk).name, 'Go')
+
+    def test_profile_is_reread_after_save(self):
+        self.assertEqual(cache.get_profile(self.member).role, 'member')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.profile.role = 'leader'
+            self.member.profile.save()
+        self.assertEqual(cache.get_profile(self.member).role, 'leader')
+
+    def test_profile_save_leaves_other_profiles_cached(self):
+        admin = cache.get_profile(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.profile.role = 'leader'
+            self.member.profile.save()
+        self.assertCached(admin, lambda: cache.get_profile(self.admin))
+
+    def test_login_leaves_profile_cached(self):
+        profile = cache.get_profile(self.member)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.client.login(username='member', password='pw'))
+        self.assertCached(profile, lambda: cache.get_profile(self.member))
+
+    def test_message_leaves_other_clubs_cached(self):
+        other = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        cached_other = cache.get_club(other.pk)
+        before = cache.get_club(self.club.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(club=self.club, sender=self.member, content='hi')
+        self.assertCached(cached_other, lambda: cache.get_club(other.pk))
+        self.assertEqual(cache.get_club(self.club.pk).version, before.version + 1)
+
+    def test_registration_leaves_other_events_cached(self):
+        start = timezone.now() + timedelta(days=1)
+        event = self.create_event(start)
+        other = self.create_event(start, title='Other')
+        cached_other = cache.get_event(other.pk)
+        self.assertEqual(cache.get_event(event.pk).registrant_count, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            EventRegistration.objects.create(event=event, user=self.member)
+        self.assertEqual(cache.get_event(event.pk).registrant_count, 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(cache.get_event(other.pk).version, cached_other.version)
+        self.assertEqual(len(ctx), 0)
+
+    def test_next_event_start_follows_the_club(self):
+        self.assertIsNone(cache.next_event_start(self.club.pk))
+        start = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_event(start)
+        self.assertEqual(cache.next_event_start(self.club.pk), start)
+
+    def test_missing_profile(self):
+        user = User.objects.create_user('ghost', 'ghost@example.com', 'pw')
+        UserProfile.objects.filter(user=user).delete()
+        with self.assertRaises(UserProfile.DoesNotExist):
+            cache.get_profile(user.pk)
@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cmsapp import cache, calendar_grid, recurrence
+from cmsapp.models import Club, Event, Task
+
+from .base import CmsTestCase, aware
+
+TODAY = date(2027, 3, 17)
+
+
+class PeriodTests(CmsTestCase):
+    def test_parse(self):
+        parse = calendar_grid.Period.parse
+        self.assertEqual(parse('month', '2027-05', TODAY).first, date(2027, 5, 1))
+        self.assertEqual(parse('month', '2027-05-20', TODAY).first, date(2027, 5, 1))
+        self.assertEqual(parse('week', '2027-05-20', TODAY).first, date(2027, 5, 17))
+        self.assertEqual(parse('month', 'garbage', TODAY).first, date(2027, 3, 1))
+        self.assertEqual(parse('month', '2500-01', TODAY).first, date(2027, 3, 1))
+
+    def test_neighbours(self):
+        january = calendar_grid.Period(calendar_grid.MONTH, date(2027, 1, 1))
+        self.assertEqual(january.previous().first, date(2026, 12, 1))
+        self.assertEqual(january.next().first, date(2027, 2, 1))
+        self.assertEqual(january.next().next().first, date(2027, 3, 1))
+        week = calendar_grid.Period(calendar_grid.WEEK, date(2027, 3, 15))
+        self.assertEqual(week.next().param, '2027-03-22')
+        self.assertEqual(len(week.weeks()), 1)
+        # March 2027 starts on a Monday and spans five weeks
+        self.assertEqual(len(calendar_grid.Period(calendar_grid.MONTH, date(2027, 3, 1)).weeks()), 5)
+
+    def test_overnight_events_fill_every_day(self):
+        event = self.create_event(aware(2027, 3, 16, 22), hours=26)
+        # Ends at midnight exactly: not on the 18th
+        items = [recurrence.Occurrence(event, 0, event.start_date, event.end_date)]
+        days = [date(2027, 3, 15) + timedelta(days=n) for n in range(7)]
+        self.assertEqual([len(day) for day in calendar_grid.bucket(items, days)], [0, 1, 1, 0, 0, 0, 0])
+
+
+class CalendarViewTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_event(
+            aware(2027, 3, 8, 18), title='Weekly', recurrence='weekly', recurrence_until=date(2027, 4, 30),
+        )
+        other = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        self.create_event(aware(2027, 3, 9, 18), title='Hidden', club=other)
+        self.client.force_login(self.member)
+
+    def grid(self, value):
+        return self.client.get('/events/calendar/', {'date': value})
+
+    def test_month_grid(self):
+        response = self.grid('2027-03')
+        weeks = response.context['period'].weeks()
+        self.assertEqual(weeks[0][0], date(2027, 3, 1))
+        self.assertContains(response, 'title="Weekly', count=4)
+        self.assertNotContains(response, 'Hidden')
+
+    def test_grid_is_cached_until_an_event_changes(self):
+        self.grid('2027-03')
+        with CaptureQueriesContext(connection) as cached:
+            self.grid('2027-03')
+        self.assertFalse(any('cmsapp_event' in query['sql'] for query in cached))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_event(aware(2027, 3, 20, 10), title='Tournament')
+        self.assertContains(self.grid('2027-03'), 'Tournament')
+
+    def test_neighbours_are_prefetched_once(self):
+        self.grid('2027-03')
+        self.assertEqual(
+            sorted(Task.objects.values_list('args', flat=True)),
+            [['month', '2027-02', [self.club.pk]], ['month', '2027-04', [self.club.pk]]],
+        )
+        self.grid('2027-03')
+        self.assertEqual(Task.objects.count(), 2)
+
+    @override_settings(CMS_TASKS={'EAGER': True})
+    def test_neighbours_are_rendered_ahead(self):
+        stamps = calendar_grid.scope_stamps(self.member, False)
+        april = calendar_grid.Period(calendar_grid.MONTH, date(2027, 4, 1))
+        self.assertFalse(cache.is_cached(calendar_grid.cache_key(april, stamps), []))
+        self.grid('2027-03')
+        self.assertTrue(cache.is_cached(calendar_grid.cache_key(april, stamps), []))
+        # Runs from March 29 to May 2
+        self.assertContains(self.grid('2027-04'), 'title="Weekly', count=5)
+        # Admins see every club
+        self.client.force_login(self.admin)
+        self.assertContains(self.grid('2027-03'), 'Hidden')
+
+    def test_warm_matches_the_view(self):
+        period = calendar_grid.Period(calendar_grid.MONTH, date(2027, 3, 1))
+        stamps = calendar_grid.scope_stamps(self.member, False)
+        calendar_grid.warm('month', '2027-03', [self.club.pk])
+        with self.assertNumQueries(0):
+            html = calendar_grid.get_grid(period, stamps, [self.club.pk])
+        self.assertEqual(html.count('title="Weekly'), 4)
+        self.assertFalse(Event.objects.filter(title='Weekly').exclude(club=self.club).exists())
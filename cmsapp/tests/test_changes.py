@@ -0,0 +1,118 @@
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from cmsapp import archive, changes, event_import
+from cmsapp.models import ChangeLogEntry, Message
+
+from .base import CmsTestCase, aware
+
+
+@override_settings(CMS_CHANGES={'SETTLE_SECONDS': 0})
+class ChangeFeedTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def feed(self, since, **params):
+        response = self.client.get('/api/v1/changes/', {'since': since, **params})
+        if response.status_code != 200:
+            return response, None
+        return response, [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def actions(self, lines):
+        return [(line['model'], line['action']) for line in lines]
+
+    def test_paging(self):
+        start = ChangeLogEntry.objects.latest('id').id
+        event = self.create_event(aware(2027, 1, 1, 10))
+        event.title = 'Renamed'
+        event.save()
+        message = Message.objects.create(club=self.club, sender=self.member, content='hi')
+        message.delete()
+
+        response, lines = self.feed(start)
+        self.assertEqual(self.actions(lines), [('event', 'insert'), ('message', 'delete')])
+        self.assertEqual(lines[0]['data']['title'], 'Renamed')
+        self.assertIsNone(lines[1]['data'])
+        self.assertEqual(response['X-Changes-More'], 'false')
+
+        response, lines = self.feed(start, limit=2)
+        self.assertEqual([line['model'] for line in lines], ['event'])
+        self.assertEqual(response['X-Changes-More'], 'true')
+        response, lines = self.feed(response['X-Changes-Next'], limit=2)
+        self.assertEqual(self.actions(lines), [('message', 'delete')])
+        response, lines = self.feed(response['X-Changes-Next'])
+        self.assertEqual(lines, [])
+
+        self.assertEqual(self.feed('x')[0].status_code, 400)
+        self.assertEqual(self.feed(start, models='nope')[0].status_code, 400)
+
+    def test_admins_only(self):
+        self.client.force_login(self.member)
+        self.assertEqual(self.feed(0)[0].status_code, 403)
+
+    @override_settings(CMS_CHANGES={'SETTLE_SECONDS': 60})
+    def test_young_entries_are_held_back(self):
+        start = ChangeLogEntry.objects.latest('id').id
+        Message.objects.create(club=self.club, sender=self.member, content='hi')
+        response, lines = self.feed(start)
+        self.assertEqual(lines, [])
+        self.assertEqual(response['X-Changes-Next'], str(start))
+
+    def test_bulk_paths_are_recorded(self):
+        start = ChangeLogEntry.objects.latest('id').id
+        data = b'title,start,end,location\nImported,2027-03-02 10:00,2027-03-02 11:00,Hall\n'
+        event_import.import_events(io.BytesIO(data), 'csv', self.club, self.admin)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        old = Message.objects.create(
+            club=self.club, sender=self.member, content='old', timestamp=timezone.now() - timedelta(days=400),
+        )
+        with override_settings(CMS_MESSAGE_ARCHIVE={'DIRECTORY': directory}):
+            archive.archive_club(self.club)
+        _, lines = self.feed(start)
+        self.assertEqual(self.actions(lines), [('event', 'insert'), ('message', 'delete')])
+        self.assertEqual(lines[1]['id'], old.pk)
+
+    def test_expiry(self):
+        Message.objects.create(club=self.club, sender=self.member, content='hi')
+        last = ChangeLogEntry.objects.latest('id').id
+        expired = ChangeLogEntry.objects.update(timestamp=timezone.now() - timedelta(days=40))
+        self.assertEqual(changes.purge(), expired)
+        self.assertFalse(ChangeLogEntry.objects.exists())
+
+        response, _ = self.feed(last - 1)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['latest'], last)
+        self.assertIn('/api/v1/changes/snapshot/', response.json()['snapshot'])
+        response, lines = self.feed(last)
+        self.assertEqual(lines, [])
+        self.assertEqual(changes.purge(), 0)
+        with self.assertRaises(CommandError):
+            call_command('export_changes', '--since', str(last - 1), stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_snapshot(self):
+        ChangeLogEntry.objects.all().delete()
+        response = self.client.get('/api/v1/changes/snapshot/', {'models': 'club'})
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [(line['model'], line['id'], line['action']) for line in lines], [('club', self.club.pk, 'insert')],
+        )
+        self.assertEqual(response['X-Changes-Next'], '0')
+
+    def test_export_command(self):
+        start = ChangeLogEntry.objects.latest('id').id
+        Message.objects.create(club=self.club, sender=self.member, content='hi')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('export_changes', '--since', str(start), '--model', 'message', stdout=out, stderr=err)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(self.actions(lines), [('message', 'insert')])
+        self.assertEqual(err.getvalue().strip(), f'Next sequence number: {start + 1}')
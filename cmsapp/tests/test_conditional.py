@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+
+from cmsapp.models import Club, ClubJoinRequest, Message
+
+from .base import CmsTestCase
+
+
+class CounterTests(CmsTestCase):
+    def test_save_leaves_no_expressions(self):
+        club = Club.objects.get(pk=self.club.pk)
+        version = club.version
+        club.save()
+        self.assertEqual(club.version, version + 1)
+        club.save()
+        self.assertEqual(club.version, version + 2)
+        self.assertIsInstance(club.events_version, int)
+
+    def test_message_bumps_version(self):
+        version = Club.objects.get(pk=self.club.pk).version
+        Message.objects.create(club=self.club, sender=self.member, content='hi')
+        self.assertEqual(Club.objects.get(pk=self.club.pk).version, version + 1)
+
+
+class ClubEtagTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+        self.url = f'/clubs/{self.club.pk}/'
+        self.etag = self.client.get(self.url)['ETag']
+
+    def assertChanged(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        return response
+
+    def test_unchanged_page_returns_304(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_message_changes_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(club=self.club, sender=self.member, content='hi')
+        self.assertChanged()
+
+    def test_member_rename_changes_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.username = 'renamed'
+            self.member.save()
+        self.assertContains(self.assertChanged(), 'renamed')
+
+    def test_applicant_rename_changes_etag(self):
+        applicant = User.objects.create_user('applicant', 'applicant@example.com', 'pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            ClubJoinRequest.objects.create(user=applicant, club=self.club)
+        self.etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            applicant.username = 'applicant2'
+            applicant.save()
+        self.assertContains(self.assertChanged(), 'applicant2')
+
+    def test_login_of_member_keeps_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_class().login(username='member', password='pw')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
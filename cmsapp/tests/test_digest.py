@@ -0,0 +1,86 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cmsapp import digest
+from cmsapp.models import Club, ClubJoinRequest, ClubMembership, Message, UserProfile
+
+from .base import CmsTestCase, aware
+
+DAY = date(2027, 5, 10)
+
+
+@override_settings(CMS_DIGEST={'MESSAGES_PER_CLUB': 2, 'SITE_URL': 'https://clubs.example.edu'})
+class DigestTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.since, self.until = digest.day_window(DAY)
+        self.quiet = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        for hour, content in enumerate(['one', 'two', 'three'], start=9):
+            Message.objects.create(
+                club=self.club, sender=self.admin, content=content, timestamp=aware(2027, 5, 10, hour),
+            )
+        # Outside the day
+        Message.objects.create(club=self.club, sender=self.admin, content='old', timestamp=aware(2027, 5, 9, 23))
+        Message.objects.create(club=self.quiet, sender=self.admin, content='late', timestamp=aware(2027, 5, 11))
+        self.create_event(aware(2027, 6, 1, 18), title='Open night', created_at=aware(2027, 5, 10, 12))
+
+    def digests(self):
+        return {d.username: d for chunk in digest.build_digests(self.since, self.until) for d in chunk}
+
+    def test_club_summary_is_shared_by_members(self):
+        digests = self.digests()
+        self.assertEqual(set(digests), {'admin', 'member'})
+        club = digests['member'].clubs[0]
+        self.assertIs(club, digests['admin'].clubs[0])
+        self.assertEqual(club.name, 'Chess')
+        self.assertEqual(club.message_count, 3)
+        self.assertEqual([message['content'] for message in club.messages], ['two', 'three'])
+        self.assertEqual(club.more_messages, 1)
+        self.assertEqual([event['title'] for event in club.events], ['Open night'])
+
+    def test_join_decisions_reach_the_applicant(self):
+        applicant = User.objects.create_user('applicant', 'applicant@example.com', 'pw')
+        ClubJoinRequest.objects.create(
+            user=applicant, club=self.quiet, is_rejected=True, decided_at=aware(2027, 5, 10, 8),
+        )
+        digests = self.digests()
+        self.assertEqual(digests['applicant'].clubs, [])
+        self.assertEqual(digests['applicant'].decisions, [{'club': 'Go', 'approved': False}])
+
+    def test_opted_out_and_inactive_users_get_nothing(self):
+        UserProfile.objects.filter(user=self.member).update(email_digest=False)
+        self.admin.is_active = False
+        self.admin.save()
+        self.assertEqual(self.digests(), {})
+
+    def test_queries_do_not_grow_with_members(self):
+        with CaptureQueriesContext(connection) as before:
+            list(digest.build_digests(self.since, self.until))
+        for n in range(30):
+            user = User.objects.create_user(f'user{n}', f'user{n}@example.com', 'pw')
+            ClubMembership.objects.create(user=user, club=self.club)
+        with self.assertNumQueries(len(before)):
+            self.assertEqual(sum(len(chunk) for chunk in digest.build_digests(self.since, self.until)), 32)
+
+    def test_send_digest_command(self):
+        out = StringIO()
+        call_command('send_digest', '--date', '2027-05-10', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Sent 2 digests for 2027-05-10.')
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['admin@example.com', 'member@example.com'])
+        body = mail.outbox[0].body
+        self.assertEqual(mail.outbox[0].subject, 'Your club digest for May 10')
+        self.assertIn('3 new messages, latest 2:', body)
+        self.assertIn(f'https://clubs.example.edu/clubs/{self.club.pk}/messages/', body)
+
+    def test_dry_run_sends_nothing(self):
+        out = StringIO()
+        call_command('send_digest', '--date', '2027-05-10', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Built 2 digests for 2027-05-10.')
+        self.assertEqual(mail.outbox, [])
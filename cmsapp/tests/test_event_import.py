@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+from datetime import date
+
+from django.core.exceptions import PermissionDenied
+from django.core.management import CommandError, call_command
+
+from cmsapp import event_import, recurrence
+from cmsapp.models import Club, Event
+
+from .base import CmsTestCase, aware
+
+
+def ics(*events):
+    lines = ['BEGIN:VCALENDAR']
+    for properties in events:
+        lines += ['BEGIN:VEVENT', *properties, 'END:VEVENT']
+    return '\r\n'.join(lines + ['END:VCALENDAR', '']).encode()
+
+
+class ImportTests(CmsTestCase):
+    def run_import(self, data, file_format, **kwargs):
+        return event_import.import_events(io.BytesIO(data), file_format, self.club, self.admin, **kwargs)
+
+    def test_csv_errors_carry_line_numbers(self):
+        rows = [
+            'Title,Start,End,Location',
+            'Good,2027-03-02 10:00,2027-03-02 11:00,Hall',
+            ',2027-03-03 10:00,2027-03-03 11:00,Hall',
+            'Bad date,2027-13-03 10:00,2027-03-03 11:00,Hall',
+            'Backwards,2027-03-03 10:00,2027-03-03 09:00,Hall',
+            'Clash,2027-03-02 10:30,2027-03-02 11:30,Hall',
+        ]
+        report = self.run_import('\n'.join(rows).encode(), 'csv')
+        self.assertEqual((report.rows, report.created), (5, 1))
+        self.assertEqual([line for line, _ in report.errors], [3, 4, 5, 6])
+        self.assertEqual(list(Event.objects.values_list('title', flat=True)), ['Good'])
+
+    def test_csv_recurrence_sets_series_end(self):
+        rows = [
+            'title,start,end,location,recurrence,until',
+            'Weekly,2027-03-01 18:00,2027-03-01 19:00,Hall,weekly,2027-03-29',
+        ]
+        self.assertEqual(self.run_import('\n'.join(rows).encode(), 'csv').created, 1)
+        event = Event.objects.get()
+        self.assertEqual(recurrence.occurrence_count(event), 5)
+        self.assertEqual(event.series_end, aware(2027, 3, 29, 19))
+        self.assertEqual(Club.objects.get(pk=self.club.pk).events_version, self.club.events_version + 1)
+
+    def test_invalid_files(self):
+        for data in (b'a,b\n1,2', b'title,start,end,location\n\xff\xfe,1,2,3'):
+            with self.assertRaises(event_import.InvalidImportFile):
+                self.run_import(data, 'csv')
+        with self.assertRaises(event_import.InvalidImportFile):
+            self.run_import(b'garbage', 'ics')
+
+    def test_ics_errors(self):
+        data = ics(
+            ['SUMMARY:Good', 'LOCATION:Hall', 'DTSTART:20270111T190000Z', 'DTEND:20270111T200000Z'],
+            ['SUMMARY:No start', 'LOCATION:Hall', 'DTEND:20270112T200000Z'],
+        )
+        report = self.run_import(data, 'ics')
+        self.assertEqual((report.rows, report.created), (2, 1))
+        self.assertEqual(report.errors, [(8, 'The event has no DTSTART.')])
+
+    def test_ics_rrule_and_exdate(self):
+        data = ics([
+            'SUMMARY:Club night', 'LOCATION:Hall', 'DTSTART:20270104T180000Z', 'DURATION:PT2H',
+            'RRULE:FREQ=WEEKLY;COUNT=4;BYDAY=MO', 'EXDATE:20270111T180000Z',
+        ], [
+            'SUMMARY:Odd rule', 'LOCATION:Annex', 'DTSTART:20270104T180000Z', 'DURATION:PT1H',
+            'RRULE:FREQ=YEARLY;COUNT=2',
+        ])
+        report = self.run_import(data, 'ics')
+        self.assertEqual(report.errors, [(10, 'Only daily, weekly and monthly RRULEs can be imported.')])
+        event = Event.objects.get()
+        self.assertEqual(event.recurrence_until, date(2027, 1, 25))
+        self.assertEqual([item.index for item in recurrence.expand([event])], [0, 2, 3])
+
+    def test_dry_run_and_permissions(self):
+        data = b'title,start,end,location\nGood,2027-03-02 10:00,2027-03-02 11:00,Hall\n'
+        report = self.run_import(data, 'csv', dry_run=True)
+        self.assertEqual(report.created, 1)
+        self.assertFalse(Event.objects.exists())
+        with self.assertRaises(PermissionDenied):
+            event_import.import_events(io.BytesIO(data), 'csv', self.club, self.member)
+
+    def test_command(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(b'title,start,end,location\nGood,2027-03-02 10:00,2027-03-02 11:00,Hall\n,x,y,z\n')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_events', path, '--club', str(self.club.pk), '--user', 'admin', stdout=out, stderr=err)
+        self.assertEqual(out.getvalue(), 'Imported 1 of 2 events into Chess.\n')
+        self.assertTrue(err.getvalue().startswith('Line 3: '))
+        with self.assertRaisesMessage(CommandError, 'Only club leaders and admins can import events.'):
+            call_command('import_events', path, '--club', str(self.club.pk), '--user', 'member')
@@ -0,0 +1,70 @@
+import csv
+import io
+import zipfile
+
+from django.contrib.auth.models import User
+
+from cmsapp import exports
+from cmsapp.models import ClubJoinRequest, ClubMembership
+
+from .base import CmsTestCase
+
+
+class ExportTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.export_url = f'/clubs/{self.club.pk}/members/export/'
+        for i, first_name in enumerate(['=HYPERLINK("http://x")', '+1', '-2', '@SUM(A1)', 'Plain', '3']):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw', first_name=first_name)
+            ClubMembership.objects.create(user=user, club=self.club)
+
+    def download(self, **params):
+        response = self.client.get(self.export_url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_escapes_formulas(self):
+        self.client.force_login(self.admin)
+        response, content = self.download()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'club-{self.club.pk}-members.csv', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], ['Username', 'First name', 'Last name', 'Email', 'Joined', 'Leader'])
+        first_names = [row[1] for row in rows[1:]]
+        self.assertEqual(first_names, ['', '', '\'=HYPERLINK("http://x")', "'+1", "'-2", "'@SUM(A1)", 'Plain', '3'])
+        self.assertEqual([row[5] for row in rows[1:3]], ['Yes', 'No'])
+
+    def test_escaping(self):
+        self.assertEqual(exports._csv_value('\tcmd'), "'\tcmd")
+        self.assertEqual(exports._csv_value(-2), -2)
+        self.assertEqual(exports._csv_value(None), '')
+
+    def test_xlsx(self):
+        self.client.force_login(self.admin)
+        response, content = self.download(format='xlsx')
+        self.assertEqual(response['Content-Type'], exports.FORMATS['xlsx'])
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 9)
+        # Inline strings are never evaluated as formulas
+        self.assertIn('<t xml:space="preserve">=HYPERLINK("http://x")</t>', sheet)
+        self.assertNotIn('<f>', sheet)
+
+    def test_streams_in_chunks(self):
+        header, rows = exports.club_member_rows(self.club)
+        chunks = list(exports.stream_xlsx(header, rows, flush_every=2))
+        self.assertGreater(len(chunks), 3)
+        chunks = list(exports.stream_csv(header, exports.club_member_rows(self.club)[1]))
+        self.assertEqual(len(chunks), 9)
+
+    def test_join_requests_and_permissions(self):
+        ClubJoinRequest.objects.create(user=User.objects.get(username='user0'), club=self.club, message='=1+1')
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get(self.export_url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(self.export_url, {'format': 'pdf'}).status_code, 400)
+        response = self.client.get(f'/clubs/{self.club.pk}/join-requests/export/')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[1][2:], ["'=1+1", rows[1][3], 'Pending'])
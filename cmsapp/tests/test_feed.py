@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from cmsapp import feed
+from cmsapp.models import Club, ClubMembership, Message
+
+from .base import CmsTestCase, aware
+
+
+class HomeFeedTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.go = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        ClubMembership.objects.create(user=self.member, club=self.go)
+        other = Club.objects.create(name='Bridge', description='d', created_by=self.admin, is_approved=True)
+        start = aware(2027, 1, 1, 9)
+        for n in range(30):
+            club = (self.club, self.go, other)[n % 3]
+            # Every fifth message shares its timestamp with the one before
+            timestamp = start + timedelta(minutes=n - (n % 5 == 4))
+            Message.objects.create(club=club, sender=self.admin, content=f'm{n}', timestamp=timestamp)
+        for n in range(4):
+            self.create_event(
+                aware(2027, 2, 1, 18), title=f'e{n}', club=self.go, created_at=start + timedelta(minutes=n * 7),
+            )
+
+    def expected(self):
+        items = [
+            (message.timestamp, feed.MESSAGE, message.pk)
+            for message in Message.objects.filter(club__in=[self.club, self.go])
+        ]
+        items += [(event.created_at, feed.EVENT, event.pk) for event in self.go.events.all()]
+        return sorted(items, reverse=True)
+
+    def keys(self, items):
+        return [(item['timestamp'], item['kind'], item['id']) for item in items]
+
+    def test_pages_merge_the_users_clubs(self):
+        items, cursor = feed.first_page(self.member)
+        self.assertEqual(len(items), feed.PAGE_SIZE)
+        seen = self.keys(items)
+        while cursor:
+            items, cursor = feed.older_page(self.member, cursor)
+            seen += self.keys(items)
+        self.assertEqual(seen, self.expected())
+        self.assertEqual({item['club_name'] for item in feed.first_page(self.member)[0]}, {'Chess', 'Go'})
+
+    def test_first_page_is_cached_until_a_club_changes(self):
+        feed.first_page(self.member)
+        with self.assertNumQueries(1):
+            feed.first_page(self.member)
+        Message.objects.create(club=self.go, sender=self.admin, content='news', timestamp=aware(2027, 3, 1))
+        with CaptureQueriesContext(connection) as ctx:
+            items, _ = feed.first_page(self.member)
+        # Only the changed club's stream is rebuilt
+        self.assertEqual(len(ctx), 3)
+        self.assertEqual(items[0]['content'], 'news')
+
+    def test_home_and_feed_views(self):
+        self.client.force_login(self.member)
+        response = self.client.get('/')
+        next_cursor = response.context['feed_next']
+        self.assertIsNotNone(next_cursor)
+        response = self.client.get('/feed/', {'cursor': next_cursor})
+        self.assertEqual(
+            self.keys(response.context['feed_items']), self.expected()[feed.PAGE_SIZE:2 * feed.PAGE_SIZE],
+        )
+        self.assertRedirects(self.client.get('/feed/', {'cursor': 'garbage'}), '/', fetch_redirect_response=False)
@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.core import signing
+from django.urls import reverse
+from django.utils import timezone
+
+from cmsapp import ical
+from cmsapp.models import Club, UserProfile
+
+from .base import CmsTestCase
+
+
+class CalendarFeedTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.event = self.create_event(timezone.now() + timedelta(days=2), title='Blitz, night')
+        self.token = ical.make_token(self.member)
+        self.url = reverse('user_calendar_feed', args=[self.token])
+
+    def feed(self, url=None, **headers):
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_token_round_trip(self):
+        self.assertEqual(ical.user_for_token(self.token), self.member)
+        self.assertIsNone(ical.user_for_token(self.token + 'x'))
+        # A validly signed token without a secret is refused
+        self.assertIsNone(ical.user_for_token(signing.Signer(salt=ical.TOKEN_SALT).sign(str(self.member.pk))))
+        self.member.is_active = False
+        self.member.save()
+        self.assertIsNone(ical.user_for_token(self.token))
+
+    def test_feed_lists_club_events(self):
+        response = self.feed()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:event-{self.event.pk}@testserver\r\n', body)
+        self.assertIn('SUMMARY:Blitz\\, night\r\n', body)
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+
+    def test_unchanged_feed_returns_304(self):
+        response = self.feed()
+        etag = response['ETag']
+        response = self.feed(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.feed(if_modified_since=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_event(timezone.now() + timedelta(days=4))
+        response = self.feed(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_reset_token_revokes_feed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ical.reset_token(self.member)
+        self.assertIsNone(ical.user_for_token(self.token))
+        self.assertEqual(self.feed().status_code, 404)
+        new_token = ical.make_token(self.member)
+        self.assertNotEqual(new_token, self.token)
+        self.assertEqual(ical.user_for_token(new_token), self.member)
+
+    def test_reset_view(self):
+        self.client.force_login(self.member)
+        secret = UserProfile.objects.get(user=self.member).calendar_secret
+        self.client.get(reverse('calendar_token_reset'))
+        self.assertEqual(UserProfile.objects.get(user=self.member).calendar_secret, secret)
+        response = self.client.post(reverse('calendar_token_reset'))
+        self.assertRedirects(response, reverse('upcoming_events'), fetch_redirect_response=False)
+        self.assertNotEqual(UserProfile.objects.get(user=self.member).calendar_secret, secret)
+        self.assertEqual(self.feed().status_code, 404)
+
+    def test_club_feed_needs_membership(self):
+        other = Club.objects.create(name='Go', description='Go club', created_by=self.admin, is_approved=True)
+        url = reverse('club_calendar_feed', args=[self.token, self.club.pk])
+        self.assertEqual(self.feed(url).status_code, 200)
+        url = reverse('club_calendar_feed', args=[self.token, other.pk])
+        self.assertEqual(self.feed(url).status_code, 404)
+        # Admins can subscribe to any club
+        url = reverse('club_calendar_feed', args=[ical.make_token(self.admin), other.pk])
+        self.assertEqual(self.feed(url).status_code, 200)
@@ -0,0 +1,29 @@
+import io
+
+from django.core.management import call_command
+
+from cmsapp.models import UserProfile
+
+from .base import CmsTestCase
+
+
+class LayoutCacheTests(CmsTestCase):
+    def test_navbar_follows_role_changes(self):
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get('/clubs/'), 'Admin Dashboard')
+        self.client.force_login(self.member)
+        self.assertNotContains(self.client.get('/clubs/'), 'Admin Dashboard')
+
+        # A write that skips the signals leaves the cached navbar in place
+        UserProfile.objects.filter(user=self.member).update(role='admin')
+        self.assertNotContains(self.client.get('/clubs/'), 'Admin Dashboard')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.member)
+            profile.save()
+        self.assertContains(self.client.get('/clubs/'), 'Admin Dashboard')
+
+    def test_benchmark_layout(self):
+        out = io.StringIO()
+        call_command('benchmark_layout', user='member', iterations=2, stdout=out)
+        self.assertIn('cmsapp/base.html: uncached', out.getvalue())
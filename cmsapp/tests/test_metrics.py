@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import Client, override_settings
+
+from cmsapp import metrics
+
+from .base import CmsTestCase
+
+TOKEN = 'scrape-token'
+
+
+class MetricsTestCase(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(CMS_METRICS={'ENABLED': True, 'DIRECTORY': self.directory, 'TOKEN': TOKEN})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for metric in metrics.registry.metrics.values():
+            metric.values.clear()
+        # The middleware reads its settings when the handler is built
+        self.client = Client()
+
+    def write_snapshot(self, name, snapshot, age=0):
+        path = self.directory / f'{name}.json'
+        path.write_text(json.dumps(snapshot))
+        if age:
+            os.utime(path, (time.time() - age, time.time() - age))
+        return path
+
+
+class RegistryTests(MetricsTestCase):
+    def test_histogram_rendering(self):
+        for value in (0.003, 0.02, 0.02, 30.0):
+            metrics.REQUEST_LATENCY.observe(value, url_name='club_list', method='GET')
+        lines = metrics.render_prometheus().splitlines()
+        self.assertIn('# TYPE cms_http_request_duration_seconds histogram', lines)
+        prefix = 'cms_http_request_duration_seconds_bucket{url_name="club_list",method="GET",'
+        self.assertIn(prefix + 'le="0.005"} 1', lines)
+        self.assertIn(prefix + 'le="0.01"} 1', lines)
+        self.assertIn(prefix + 'le="0.025"} 3', lines)
+        self.assertIn(prefix + 'le="10"} 3', lines)
+        self.assertIn(prefix + 'le="+Inf"} 4', lines)
+        self.assertIn('cms_http_request_duration_seconds_count{url_name="club_list",method="GET"} 4', lines)
+        self.assertIn('cms_http_request_duration_seconds_sum{url_name="club_list",method="GET"} 30.043', lines)
+
+    def test_merges_the_snapshots_of_every_process(self):
+        metrics.REQUESTS.inc(url_name='home', method='GET', status=200)
+        metrics.CACHE_REQUESTS.inc(tier='local', result='hit')
+        metrics.CACHE_REQUESTS.inc(tier='shared', result='miss')
+        # Another worker on this host; the parent process is alive
+        self.write_snapshot(f'{metrics.HOSTNAME}-{os.getppid()}-1', {
+            'cms_http_requests_total': {'["home", "GET", "200"]': 2, '["home", "GET", "500"]': 1},
+            'cms_cache_requests_total': {'["shared", "hit"]': 2},
+        })
+        lines = metrics.render_prometheus().splitlines()
+        self.assertIn('cms_http_requests_total{url_name="home",method="GET",status="200"} 3', lines)
+        self.assertIn('cms_http_requests_total{url_name="home",method="GET",status="500"} 1', lines)
+        self.assertIn('cms_cache_hit_ratio 0.75', lines)
+
+    def test_deletes_stale_snapshots(self):
+        live = self.write_snapshot(f'{metrics.HOSTNAME}-{os.getppid()}-1', {})
+        dead = self.write_snapshot(f'{metrics.HOSTNAME}-999999999-1', {})
+        # Pids of other hosts cannot be looked up here; only age counts
+        remote = self.write_snapshot('other-host-999999999-1', {})
+        old = self.write_snapshot(f'other-host-{os.getpid()}-1', {}, age=7200)
+        metrics.registry.collect()
+        own = metrics.registry._path(self.directory)
+        self.assertEqual(set(self.directory.glob('*.json')), {live, remote, own})
+        self.assertFalse(dead.exists() or old.exists())
+        metrics.registry.remove()
+        self.assertFalse(own.exists())
+
+
+class EndpointTests(MetricsTestCase):
+    def test_requests_are_recorded(self):
+        self.client.force_login(self.member)
+        self.client.get('/clubs/')
+        response = self.client.get('/metrics/', HTTP_AUTHORIZATION=f'Bearer {TOKEN}')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'cms_http_requests_total{url_name="club_list",method="GET",status="200"} 1')
+        self.assertContains(response, 'cms_db_up 1')
+
+    def test_authentication(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    def test_disabled(self):
+        self.client.force_login(self.admin)
+        with override_settings(CMS_METRICS={'DIRECTORY': self.directory}):
+            self.assertEqual(self.client.get('/metrics/').status_code, 404)
+
+    def test_readiness(self):
+        response = self.client.get('/healthz/ready/')
+        self.assertEqual((response.status_code, response.json()['status']), (200, 'ok'))
+        with mock.patch.object(metrics, 'ping_database', side_effect=DatabaseError('no such table: secret')):
+            with self.assertLogs('cmsapp.views', 'ERROR'):
+                response = self.client.get('/healthz/ready/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'status': 'unavailable'})
@@ -0,0 +1,97 @@
+import warnings
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache as shared_cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cmsapp import cache, nplusone
+from cmsapp.models import Club, ClubJoinRequest, ClubMembership, Message
+
+from .base import CmsTestCase
+
+
+class DetectorTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(4):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw')
+            ClubMembership.objects.create(user=user, club=self.club)
+
+    def usernames(self, config, memberships=None):
+        detector = nplusone.NPlusOneDetector(dict(nplusone.get_config(), **config))
+        with connection.execute_wrapper(detector):
+            names = [m.user.username for m in (memberships or ClubMembership.objects.all())]
+        self.assertEqual(len(names), 6)
+        return detector.findings
+
+    def test_flags_repeated_queries(self):
+        with self.assertWarns(nplusone.NPlusOneWarning):
+            finding, = self.usernames({'THRESHOLD': 3, 'MODE': 'warn'})
+        self.assertIn('FROM "auth_user"', finding['sql'])
+        self.assertEqual(finding['suggestion'], 'select_related() on the foreign key to User')
+        self.assertTrue(finding['call_site']['file'].endswith('test_nplusone.py'))
+
+    def test_modes(self):
+        with self.assertLogs('cmsapp.nplusone', 'WARNING'):
+            self.usernames({'THRESHOLD': 3, 'MODE': 'log'})
+        with self.assertRaises(nplusone.NPlusOneError):
+            self.usernames({'THRESHOLD': 3, 'MODE': 'raise'})
+        with override_settings(CMS_NPLUSONE={'MODE': 'shout'}), self.assertRaises(ValueError):
+            nplusone.get_config()
+
+    def test_quiet_below_the_threshold_and_with_select_related(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', nplusone.NPlusOneWarning)
+            self.assertEqual(self.usernames({'THRESHOLD': 6}), [])
+            memberships = ClubMembership.objects.select_related('user')
+            self.assertEqual(self.usernames({'THRESHOLD': 1}, memberships), [])
+
+
+class AdminDashboardQueryTests(CmsTestCase):
+    def add_leader(self, n):
+        leader = User.objects.create_user(f'leader{n}', f'leader{n}@example.com', 'pw')
+        leader.profile.role = 'leader'
+        leader.profile.save()
+        club = Club.objects.create(name=f'Club {n}', description='d', created_by=leader, is_approved=n % 2 == 0)
+        ClubMembership.objects.create(user=leader, club=club, is_leader=True)
+        ClubJoinRequest.objects.create(user=self.member, club=club)
+        Message.objects.create(club=club, sender=leader, content='hi')
+        start = timezone.now() + timedelta(days=n)
+        self.create_event(start, club=club, title=f'Event {n}')
+
+    def clear_caches(self):
+        shared_cache.clear()
+        cache.local_cache.clear()
+        cache.local_counters.clear()
+
+    @override_settings(CMS_NPLUSONE={'ENABLED': True, 'THRESHOLD': 3, 'MODE': 'raise'})
+    def test_query_count_does_not_grow_with_leaders(self):
+        # The middleware reads its settings when the handler is built
+        client = Client()
+        client.force_login(self.admin)
+        self.add_leader(0)
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(client.get('/admin-dashboard/').status_code, 200)
+        for n in range(1, 8):
+            self.add_leader(n)
+        self.clear_caches()
+        with self.assertNumQueries(len(ctx)):
+            self.assertContains(client.get('/admin-dashboard/'), 'leader7')
+
+    def test_global_search_query_count_does_not_grow_with_events(self):
+        client = Client()
+        client.force_login(self.admin)
+        self.add_leader(0)
+        self.clear_caches()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertContains(client.get('/search/', {'q': 'Event'}), 'Club 0')
+        for n in range(1, 8):
+            self.add_leader(n)
+        self.clear_caches()
+        with self.assertNumQueries(len(ctx)):
+            self.assertContains(client.get('/search/', {'q': 'Event'}), 'Club 7')
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from cmsapp.models import Event
+from cmsapp.pagination import CursorPaginator, InvalidCursor
+
+from .base import CmsTestCase, aware
+
+
+class CursorTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        start = aware(2027, 1, 1, 10)
+        # Pairs share a start, so the primary key breaks ties
+        for i in range(11):
+            self.create_event(start + timedelta(days=i // 2), title=f'E{i}')
+
+    def collect(self, paginator):
+        page = paginator.page()
+        pages = [page]
+        while page.has_next:
+            page = paginator.page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_round_trip(self):
+        events = Event.objects.all()
+        for ordering in (('start_date', 'pk'), ('-start_date', '-pk')):
+            paginator = CursorPaginator(events, ordering, 3)
+            pages = self.collect(paginator)
+            self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+            self.assertEqual(
+                [event.pk for page in pages for event in page],
+                list(events.order_by(*ordering).values_list('pk', flat=True)),
+            )
+            back = paginator.page(pages[-1].previous_cursor)
+            self.assertEqual(back.items, pages[-2].items)
+            first = paginator.page(paginator.page(back.previous_cursor).previous_cursor)
+            self.assertEqual(first.items, pages[0].items)
+            self.assertFalse(first.has_previous)
+
+    def test_microseconds_survive_the_cursor(self):
+        start = aware(2027, 3, 1, 10)
+        for micro in (1, 2, 3):
+            self.create_event(start + timedelta(microseconds=micro))
+        paginator = CursorPaginator(Event.objects.filter(start_date__gte=start), ('start_date', 'pk'), 1)
+        self.assertEqual(sum(len(page) for page in self.collect(paginator)), 3)
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(Event.objects.all(), ('start_date', 'pk'), 3)
+        for cursor in ('garbage', paginator.encode({'start_date': 'x', 'pk': 1})):
+            with self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
@@ -0,0 +1,58 @@
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import Client, override_settings
+
+from cmsapp import profiling
+
+from .base import CmsTestCase
+
+
+class SamplingProfilerTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(CMS_PROFILER={
+            'ENABLED': True, 'SAMPLE_RATE': 0, 'DIRECTORY': self.directory, 'MAX_PROFILES': 2,
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # The middleware reads its settings when the handler is built
+        self.client = Client()
+        self.client.force_login(self.member)
+
+    def test_profiles_requests_with_a_token(self):
+        self.client.get('/clubs/')
+        self.client.get('/clubs/', HTTP_X_CMS_PROFILE='forged')
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+        self.client.get('/clubs/', HTTP_X_CMS_PROFILE=profiling.make_token())
+        summary, = self.directory.glob('*.json')
+        self.assertTrue(summary.with_suffix('.prof').exists())
+        self.assertTrue(summary.with_suffix('.collapsed').exists())
+        data = json.loads(summary.read_text())
+        self.assertEqual((data['url_name'], data['status']), ('club_list', 200))
+        self.assertGreater(data['queries'], 0)
+        self.assertAlmostEqual(data['sql'] + data['template'] + data['python'], data['total'], delta=0.01)
+
+        out = io.StringIO()
+        call_command('profile_report', stdout=out)
+        self.assertIn('club_list: 1 profiles', out.getvalue())
+        self.assertIn('queries', out.getvalue())
+
+    def test_keeps_the_newest_profiles(self):
+        token = profiling.make_token()
+        for _ in range(3):
+            self.client.get('/clubs/', HTTP_X_CMS_PROFILE=token)
+        self.assertEqual(len(list(self.directory.glob('*.json'))), 2)
+        self.assertEqual(len(list(self.directory.glob('*.prof'))), 2)
+
+    def test_report_without_profiles(self):
+        out = io.StringIO()
+        call_command('profile_report', stdout=out)
+        self.assertIn('No profiles found', out.getvalue())
@@ -0,0 +1,49 @@
+import math
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from cmsapp import recommendations
+from cmsapp.models import Club, ClubMembership, ClubSimilarity
+
+from .base import CmsTestCase
+
+
+class RecommendationTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        # Chess: admin, member, ann, bob; Go: ann, bob, cy; Bridge: ann, cy
+        self.go = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        self.bridge = Club.objects.create(name='Bridge', description='d', created_by=self.admin, is_approved=True)
+        ann, bob, cy = (User.objects.create_user(name, f'{name}@example.com', 'pw') for name in ('ann', 'bob', 'cy'))
+        memberships = {ann: [self.club, self.go, self.bridge], bob: [self.club, self.go], cy: [self.go, self.bridge]}
+        for user, clubs in memberships.items():
+            for club in clubs:
+                ClubMembership.objects.create(user=user, club=club)
+
+    def test_cosine_similarity_of_co_membership(self):
+        scores = {
+            (club_id, similar_id): score for club_id, similar_id, score in recommendations.compute_similarities()
+        }
+        self.assertAlmostEqual(scores[self.club.pk, self.go.pk], 2 / math.sqrt(4 * 3))
+        self.assertAlmostEqual(scores[self.go.pk, self.club.pk], 2 / math.sqrt(4 * 3))
+        self.assertAlmostEqual(scores[self.go.pk, self.bridge.pk], 2 / math.sqrt(3 * 2))
+        # Chess and Bridge share one member, below MIN_COMMON_MEMBERS
+        self.assertNotIn((self.club.pk, self.bridge.pk), scores)
+        self.assertEqual(len(scores), 4)
+
+    def test_top_k_keeps_the_most_similar(self):
+        config = dict(recommendations.DEFAULTS, TOP_K=1)
+        rows = [row for row in recommendations.compute_similarities(config) if row[0] == self.go.pk]
+        self.assertEqual([similar_id for _, similar_id, _ in rows], [self.bridge.pk])
+
+    def test_recommended_clubs_skip_joined_ones(self):
+        out = StringIO()
+        call_command('compute_club_similarity', stdout=out)
+        self.assertEqual(ClubSimilarity.objects.count(), 4)
+        self.assertEqual(recommendations.recommended_clubs(self.member), [self.go])
+        cy = User.objects.get(username='cy')
+        self.assertEqual(recommendations.recommended_clubs(cy), [self.club])
+        Club.objects.filter(pk=self.club.pk).update(is_approved=False)
+        self.assertEqual(recommendations.recommended_clubs(cy), [])
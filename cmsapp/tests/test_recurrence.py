@@ -0,0 +1,82 @@
+from datetime import date, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from cmsapp import recurrence
+from cmsapp.models import Event, EventOccurrenceException
+
+from .base import CmsTestCase, aware
+
+
+class RecurrenceTests(CmsTestCase):
+    def test_weekly(self):
+        event = self.create_event(aware(2027, 1, 4, 18), recurrence='weekly', recurrence_until=date(2027, 2, 1))
+        self.assertEqual(recurrence.occurrence_count(event), 5)
+        self.assertEqual(event.series_end, aware(2027, 2, 1, 19))
+        items = recurrence.occurrences_between(Event.objects.all(), aware(2027, 1, 10), aware(2027, 1, 20))
+        self.assertEqual([item.index for item in items], [1, 2])
+
+    def test_monthly_keeps_end_of_month(self):
+        event = Event(
+            start_date=aware(2025, 1, 31, 10), end_date=aware(2025, 1, 31, 11),
+            recurrence='monthly', recurrence_interval=1, recurrence_until=date(2025, 5, 30),
+        )
+        self.assertEqual(
+            [item.start_date.date() for item in recurrence.expand([event])],
+            [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)],
+        )
+
+    def test_daylight_saving_keeps_wall_clock_time(self):
+        # Clocks go forward in Berlin on 28 March 2027
+        with timezone.override('Europe/Berlin'):
+            event = self.create_event(aware(2027, 3, 20, 10), recurrence='weekly', recurrence_until=date(2027, 4, 3))
+            items = recurrence.expand([event])
+            self.assertEqual([timezone.localtime(item.start_date).hour for item in items], [10, 10, 10])
+            self.assertEqual([item.start_date.astimezone(dt_timezone.utc).hour for item in items], [9, 9, 8])
+            self.assertEqual(items[2].end_date - items[2].start_date, timedelta(hours=1))
+
+    def test_rule_errors(self):
+        event = Event(start_date=aware(2027, 1, 4, 18), end_date=aware(2027, 1, 4, 19), recurrence='daily')
+        self.assertEqual(recurrence.rule_error(event), 'Choose the last date of a repeating event.')
+        event.recurrence_until = date(2027, 1, 3)
+        self.assertEqual(recurrence.rule_error(event), 'The last date cannot be before the first occurrence.')
+        event.recurrence_until = date(2040, 1, 1)
+        self.assertIn('at most', recurrence.rule_error(event))
+        event.recurrence_until = date(2027, 1, 10)
+        self.assertIsNone(recurrence.rule_error(event))
+
+    def test_cancelled_and_moved_occurrences(self):
+        event = self.create_event(aware(2027, 1, 4, 18), recurrence='weekly', recurrence_until=date(2027, 1, 25))
+        EventOccurrenceException.objects.create(event=event, occurrence=1, is_cancelled=True)
+        EventOccurrenceException.objects.create(
+            event=event, occurrence=3, start_date=aware(2027, 2, 3, 18), end_date=aware(2027, 2, 3, 20),
+        )
+        event = Event.objects.get(pk=event.pk)
+        # Moving the last occurrence later extends the series
+        self.assertEqual(event.series_end, aware(2027, 2, 3, 20))
+        items = recurrence.expand([event])
+        self.assertEqual([(item.index, item.start_date.day) for item in items], [(0, 4), (2, 18), (3, 3)])
+        self.assertTrue(items[2].is_moved)
+        self.assertTrue(recurrence.occurrence(event, 1).is_cancelled)
+        self.assertIsNone(recurrence.occurrence(event, 4))
+        found = recurrence.occurrences_between(Event.objects.all(), aware(2027, 2, 1), aware(2027, 2, 5))
+        self.assertEqual([item.index for item in found], [3])
+
+    def test_upcoming_merges_series_with_one_off_events(self):
+        self.create_event(
+            aware(2027, 1, 4, 18), title='Weekly', recurrence='weekly', recurrence_until=date(2027, 3, 1),
+        )
+        self.create_event(aware(2027, 1, 12, 10), title='Once')
+        items = recurrence.upcoming(Event.objects.all(), aware(2027, 1, 5), 3)
+        self.assertEqual([(item.title, item.start_date.day) for item in items], [
+            ('Weekly', 11), ('Once', 12), ('Weekly', 18), ('Weekly', 25),
+        ])
+        position = recurrence.decode_position(recurrence.encode_position(items[2]))
+        later = recurrence.upcoming(Event.objects.all(), aware(2027, 1, 5), 2, position)
+        self.assertEqual([item.start_date.day for item in later], [25, 1, 8])
+
+    def test_occurrence_position(self):
+        event = self.create_event(aware(2027, 1, 4, 18))
+        item = recurrence.Occurrence(event, 0, event.start_date, event.end_date)
+        self.assertEqual(recurrence.decode_position(recurrence.encode_position(item)), item.sort_key())
+        self.assertIsNone(recurrence.decode_position('garbage'))
@@ -0,0 +1,102 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import override_settings
+from django.utils import timezone
+
+from cmsapp import reminders
+from cmsapp.models import EventRegistration, EventReminder, Task
+
+from .base import CmsTestCase
+
+
+class ReminderTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.event = self.create_event(self.now + timedelta(hours=3), title='Blitz')
+
+    def scheduler(self, now):
+        scheduler = reminders.ReminderScheduler()
+        scheduler.refresh(now)
+        return scheduler
+
+    def test_heap_holds_due_triggers(self):
+        scheduler = self.scheduler(self.now)
+        # The day-before reminder was missed; only the one an hour before is left
+        start = self.event.start_date
+        self.assertEqual(scheduler.heap, [(start - timedelta(hours=1), self.event.pk, 60, start)])
+        self.assertEqual(scheduler.next_fire_at(), self.event.start_date - timedelta(hours=1))
+        self.assertEqual(list(scheduler.pop_due(self.now)), [])
+
+    def test_missed_reminders_collapse_into_one(self):
+        self.event.start_date = self.now + timedelta(minutes=30)
+        self.event.end_date = self.now + timedelta(hours=1)
+        self.event.save()
+        scheduler = self.scheduler(self.now)
+        due = list(scheduler.pop_due(self.now))
+        # Sent as the hour-before reminder, the one closest to the start
+        self.assertEqual([trigger[2] for trigger in due], [60])
+
+    def test_fire_claims_each_reminder_once(self):
+        trigger = self.scheduler(self.now).heap[0]
+        reminder = reminders.ReminderScheduler().fire(trigger)
+        self.assertEqual(reminder.event_id, self.event.pk)
+        self.assertEqual(Task.objects.get().args, [reminder.pk])
+        self.assertIsNone(reminders.ReminderScheduler().fire(trigger))
+        # Once claimed, the trigger is not loaded again
+        self.assertEqual(self.scheduler(self.now).heap, [])
+
+    def test_rescheduled_event_is_skipped(self):
+        trigger = self.scheduler(self.now).heap[0]
+        self.event.start_date += timedelta(days=1)
+        self.event.end_date += timedelta(days=1)
+        self.event.save()
+        self.assertIsNone(reminders.ReminderScheduler().fire(trigger))
+
+    def test_scheduler_reloads_after_changes(self):
+        scheduler = self.scheduler(self.now)
+        later = self.now + timedelta(minutes=1)
+        with mock.patch.object(scheduler, 'load', wraps=scheduler.load) as load:
+            scheduler.refresh(later)
+            load.assert_not_called()
+            other = self.create_event(self.now + timedelta(hours=2))
+            scheduler.refresh(later)
+            load.assert_called_once()
+        self.assertIn(other.pk, [trigger[1] for trigger in scheduler.heap])
+
+    @override_settings(CMS_TASKS={'EAGER': True}, CMS_REMINDERS={'BATCH_SIZE': 2, 'SITE_URL': 'https://clubs.example.edu/'})
+    def test_send_reminder_mails_registrants_in_batches(self):
+        for n in range(3):
+            user = User.objects.create_user(f'user{n}', f'user{n}@example.com', 'pw')
+            EventRegistration.objects.create(event=self.event, user=user)
+        EventRegistration.objects.create(event=self.event, user=User.objects.create_user('nomail'))
+        reminder = reminders.ReminderScheduler().fire(self.scheduler(self.now).heap[0])
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.sent_count, 3)
+        self.assertIsNotNone(reminder.sent_at)
+        self.assertEqual(
+            [message.to for message in mail.outbox],
+            [['user0@example.com'], ['user1@example.com'], ['user2@example.com']],
+        )
+        self.assertTrue(mail.outbox[0].subject.startswith('Reminder: Blitz starts '))
+        self.assertIn(f'https://clubs.example.edu/events/{self.event.pk}/', mail.outbox[0].body)
+        # A reminder goes out once
+        self.assertEqual(reminders.send_reminder(reminder.pk), 0)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_recurring_events_get_a_reminder_per_occurrence(self):
+        self.event.delete()
+        series = self.create_event(
+            self.now + timedelta(hours=2), recurrence='daily', recurrence_until=(self.now + timedelta(days=5)).date(),
+        )
+        with override_settings(CMS_REMINDERS={'LOOKAHEAD': 3 * 86400, 'OFFSETS': [60]}):
+            scheduler = self.scheduler(self.now)
+        self.assertEqual(
+            [trigger[3] for trigger in sorted(scheduler.heap)],
+            [series.start_date + timedelta(days=n) for n in range(3)],
+        )
+        self.assertTrue(all(trigger[1] == series.pk for trigger in scheduler.heap))
+        self.assertFalse(EventReminder.objects.exists())
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache as shared_cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from cmsapp import cache
+from cmsapp.models import ClubMembership, Event, EventRegistration, Team
+
+from .base import CmsTestCase
+
+
+class RosterTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.event = self.create_event(timezone.now() + timedelta(days=3))
+        self.url = f'/events/{self.event.pk}/'
+
+    def add_registrants(self, count, team_size=5):
+        start = User.objects.count()
+        users = [
+            User.objects.create_user(f'user{n}', f'user{n}@example.com', 'pw')
+            for n in range(start, start + count)
+        ]
+        for first in range(0, count, team_size):
+            group = users[first:first + team_size]
+            team = Team.objects.create(name=f'Team {group[0].username}', event=self.event, leader=group[0])
+            team.members.add(*group)
+            for user in group:
+                EventRegistration.objects.create(event=self.event, user=user, team=team)
+
+    def roster_queries(self, params=None):
+        shared_cache.clear()
+        cache.local_cache.clear()
+        cache.local_counters.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_registrant_count_is_maintained(self):
+        self.add_registrants(6, team_size=3)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).registrant_count, 6)
+        EventRegistration.objects.filter(event=self.event).first().delete()
+        self.assertEqual(Event.objects.get(pk=self.event.pk).registrant_count, 5)
+        # A stale instance saved later keeps the maintained count
+        self.event.title = 'Renamed'
+        self.event.save()
+        self.assertEqual(self.event.registrant_count, 5)
+
+    def test_roster_pages_run_a_constant_number_of_queries(self):
+        self.client.force_login(self.admin)
+        self.add_registrants(5)
+        _, small = self.roster_queries()
+        self.add_registrants(115)
+        response, first = self.roster_queries()
+        self.assertEqual(first, small)
+        self.assertContains(response, 'Registered Members (120)')
+        self.assertContains(response, 'Teams on this page')
+
+        page = response.context['registrations']
+        self.assertEqual(len(page), 50)
+        seen = [registration.pk for registration in page]
+        while page.has_next:
+            response, queries = self.roster_queries({'cursor': page.next_cursor})
+            self.assertEqual(queries, small)
+            page = response.context['registrations']
+            seen += [registration.pk for registration in page]
+        self.assertEqual(
+            seen,
+            list(EventRegistration.objects.filter(event=self.event).order_by('registration_date', 'pk').values_list('pk', flat=True)),
+        )
+        # Only the teams of the registrations on the page are listed
+        self.assertEqual(
+            {team.pk for team in response.context['teams']},
+            {registration.team_id for registration in page},
+        )
+
+    def test_invalid_cursor_shows_the_first_page(self):
+        self.client.force_login(self.admin)
+        self.add_registrants(3)
+        response = self.client.get(self.url, {'cursor': 'garbage'})
+        self.assertEqual(len(response.context['registrations']), 3)
+
+    def test_team_registration_warns_about_skipped_members(self):
+        friend = User.objects.create_user('friend', 'friend@example.com', 'pw')
+        ClubMembership.objects.create(user=friend, club=self.club)
+        self.client.force_login(self.member)
+        response = self.client.post(f'/events/{self.event.pk}/register/', {
+            'registration_type': 'team',
+            'team_name': 'Blue',
+            # The leader's own address is not a skipped member
+            'team_members': 'Member@example.com, friend@example.com, nobody@example.com',
+        })
+        notes = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertIn('Team "Blue" is registered for "Practice" with 2 members.', notes)
+        self.assertIn('1 team member(s) were not added because they have no account or are already registered.', notes)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).registrant_count, 2)
+
+    def test_team_registration_without_skipped_members(self):
+        self.client.force_login(self.member)
+        response = self.client.post(f'/events/{self.event.pk}/register/', {
+            'registration_type': 'team', 'team_name': 'Solo', 'team_members': 'member@example.com',
+        })
+        notes = [str(message) for message in get_messages(response.wsgi_request)]
+        self.assertEqual(notes, ['Team "Solo" is registered for "Practice" with 1 members.'])
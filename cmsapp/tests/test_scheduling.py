@@ -0,0 +1,94 @@
+import random
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+
+from cmsapp import recurrence, scheduling
+from cmsapp.models import Event, EventRegistration
+
+from .base import CmsTestCase, aware
+
+
+class IntervalTests(CmsTestCase):
+    def test_tree_matches_brute_force(self):
+        rng = random.Random(7)
+        intervals = []
+        for n in range(300):
+            start = rng.randrange(1000)
+            intervals.append((start, start + rng.randrange(1, 50), n))
+        tree = scheduling.IntervalTree(intervals)
+        for _ in range(200):
+            start = rng.randrange(1000)
+            end = start + rng.randrange(1, 80)
+            expected = sorted(i for i in intervals if i[0] < end and i[1] > start)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+    def test_touching_intervals_do_not_overlap(self):
+        tree = scheduling.IntervalTree([(0, 10, 'a'), (10, 20, 'b')])
+        self.assertEqual(tree.overlapping(10, 15), [(10, 20, 'b')])
+        self.assertEqual(tree.overlapping(5, 10), [(0, 10, 'a')])
+        self.assertEqual(list(scheduling.overlapping_pairs([(0, 10, 'a'), (10, 20, 'b')])), [])
+        self.assertEqual(
+            list(scheduling.overlapping_pairs([(0, 10, 'a'), (5, 20, 'b'), (9, 11, 'c')])),
+            [((0, 10, 'a'), (5, 20, 'b')), ((0, 10, 'a'), (9, 11, 'c')), ((5, 20, 'b'), (9, 11, 'c'))],
+        )
+
+
+class ConflictTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.morning = self.create_event(aware(2027, 4, 5, 9), hours=2, title='Morning')
+        # Mondays 18:00-20:00 for four weeks
+        self.weekly = self.create_event(
+            aware(2027, 4, 5, 18), hours=2, title='Weekly', recurrence='weekly', recurrence_until=date(2027, 4, 26),
+        )
+
+    def test_venue_conflicts(self):
+        late_morning = [(aware(2027, 4, 5, 10), aware(2027, 4, 5, 12))]
+        found = scheduling.venue_conflicts('Hall', late_morning)
+        self.assertEqual([item.title for item in found], ['Morning'])
+        self.assertEqual(scheduling.venue_conflicts('Annex', late_morning), [])
+        self.assertEqual(scheduling.venue_conflicts('Hall', late_morning, exclude=self.morning.pk), [])
+        # Back to back with the morning session
+        self.assertEqual(scheduling.venue_conflicts('Hall', [(aware(2027, 4, 5, 11), aware(2027, 4, 5, 12))]), [])
+
+    def test_recurring_occurrences_are_checked(self):
+        intervals = [(aware(2027, 4, day, 19), aware(2027, 4, day, 21)) for day in (12, 13, 26)]
+        found = scheduling.venue_conflicts('Hall', intervals)
+        self.assertEqual([(item.title, item.index) for item in found], [('Weekly', 1), ('Weekly', 3)])
+        # Past the end of the series
+        self.assertEqual(scheduling.venue_conflicts('Hall', [(aware(2027, 5, 3, 19), aware(2027, 5, 3, 21))]), [])
+
+    def test_batch_conflicts_include_the_candidates(self):
+        conflicts = scheduling.batch_venue_conflicts([
+            ('Hall', aware(2027, 4, 19, 17), aware(2027, 4, 19, 19)),
+            ('Annex', aware(2027, 4, 19, 17), aware(2027, 4, 19, 19)),
+            ('Annex', aware(2027, 4, 19, 18), aware(2027, 4, 19, 20)),
+            ('Annex', aware(2027, 4, 19, 20), aware(2027, 4, 19, 21)),
+        ])
+        self.assertEqual(list(conflicts), [0, 1, 2])
+        self.assertEqual([(item.title, item.index) for item in conflicts[0]], [('Weekly', 2)])
+        self.assertEqual(conflicts[1], [2])
+        self.assertEqual(conflicts[2], [1])
+
+    def test_attendee_conflicts(self):
+        clash = self.create_event(aware(2027, 4, 12, 19), location='Annex', title='Clash')
+        EventRegistration.objects.create(event=self.weekly, user=self.member, occurrence=1)
+        EventRegistration.objects.create(event=self.morning, user=self.member)
+        occurrence = recurrence.occurrence(Event.objects.get(pk=clash.pk), 0)
+        found = scheduling.attendee_conflicts(self.member, occurrence)
+        self.assertEqual([(item.title, item.index) for item in found], [('Weekly', 1)])
+        self.assertEqual(scheduling.attendee_conflicts(self.admin, occurrence), [])
+
+    def test_report_command(self):
+        self.create_event(aware(2027, 4, 19, 19), location='Hall', title='Clash')
+        EventRegistration.objects.create(event=self.weekly, user=self.member, occurrence=2)
+        EventRegistration.objects.create(event=Event.objects.get(title='Clash'), user=self.member)
+        out = StringIO()
+        call_command('report_event_conflicts', '--attendees', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1:], ['1 venue conflicts.', lines[2], '1 attendee conflicts.'])
+        self.assertTrue(lines[0].startswith('Hall: "Weekly"'))
+        self.assertIn('overlaps "Clash"', lines[0])
+        self.assertTrue(lines[2].startswith('member: "Weekly"'))
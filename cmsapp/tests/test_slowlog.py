@@ -0,0 +1,71 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.db import connection
+from django.test import Client, override_settings
+
+from cmsapp import slowlog
+from cmsapp.models import Club
+
+from .base import CmsTestCase
+
+
+class SlowQueryLogTests(CmsTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.log_file = directory / 'slow.jsonl'
+        self.config = dict(slowlog.get_config(), THRESHOLD_MS=0, LOG_FILE=self.log_file)
+        slowlog.recent.clear()
+
+    def run_queries(self, config):
+        with connection.execute_wrapper(slowlog.SlowQueryRecorder(config)):
+            Club.objects.filter(name='Secret name').count()
+            Club.objects.filter(name='Other name').count()
+
+    def test_records_statements_without_their_values(self):
+        self.run_queries(self.config)
+        lines = self.log_file.read_text().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertNotIn('Secret name', self.log_file.read_text())
+        first, second = (json.loads(line) for line in lines)
+        self.assertEqual(first['fingerprint'], second['fingerprint'])
+        self.assertNotEqual(first['params_fingerprint'], second['params_fingerprint'])
+        self.assertIn('WHERE', first['sql'])
+        self.assertEqual(first['call_site']['function'], 'run_queries')
+        self.assertTrue(first['call_site']['file'].endswith('test_slowlog.py'))
+        self.assertEqual(list(slowlog.recent)[-2:], [first, second])
+
+        statement, = slowlog.aggregate(slowlog.load_records(self.config))
+        self.assertEqual(statement['count'], 2)
+        self.assertEqual(len(statement['call_sites']), 2)
+        self.assertTrue(all('in run_queries' in site for site, _ in statement['call_sites']))
+
+    def test_threshold(self):
+        self.run_queries(dict(self.config, THRESHOLD_MS=60 * 1000))
+        self.assertFalse(self.log_file.exists())
+        self.assertEqual(len(slowlog.recent), 0)
+
+    def test_rotates_the_log_file(self):
+        config = dict(self.config, MAX_FILE_BYTES=1)
+        self.run_queries(config)
+        self.run_queries(config)
+        rotated = self.log_file.with_suffix('.jsonl.1')
+        self.assertEqual(len(self.log_file.read_text().splitlines()), 1)
+        self.assertEqual(len(rotated.read_text().splitlines()), 1)
+        self.assertEqual(len(slowlog.load_records(config)), 2)
+
+    def test_slow_query_page(self):
+        with override_settings(CMS_SLOW_QUERIES={'THRESHOLD_MS': 0, 'LOG_FILE': self.log_file}):
+            # The middleware reads its settings when the handler is built
+            client = Client()
+            client.force_login(self.member)
+            client.get('/clubs/')
+            self.assertRedirects(client.get('/admin-dashboard/slow-queries/'), '/')
+            client.force_login(self.admin)
+            response = client.get('/admin-dashboard/slow-queries/')
+        self.assertContains(response, 'club_list')
+        self.assertTrue(any(entry['view'] == 'club_list' for entry in slowlog.load_records(self.config)))
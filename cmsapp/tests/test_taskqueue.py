@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from cmsapp import taskqueue
+from cmsapp.models import Task
+
+calls = []
+
+
+@taskqueue.task(name='tests.record')
+def record(value):
+    calls.append(value)
+
+
+@taskqueue.task(name='tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def age(self, task, seconds):
+        Task.objects.filter(pk=task.pk).update(locked_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_claim_runs_highest_priority_first(self):
+        low = taskqueue.enqueue('tests.record', ['low'])
+        high = taskqueue.enqueue('tests.record', ['high'], priority=5)
+        later = taskqueue.enqueue('tests.record', ['later'], run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(taskqueue.claim('w1', 5), [high.pk, low.pk])
+        # Claimed tasks are not handed to another worker
+        self.assertEqual(taskqueue.claim('w2', 5), [])
+        self.assertTrue(taskqueue.run(high.pk, 'w1'))
+        self.assertIsNone(taskqueue.run(low.pk, 'w2'))
+        self.assertEqual(calls, ['high'])
+        high.refresh_from_db()
+        self.assertEqual((high.status, high.attempts), (Task.DONE, 1))
+        self.assertEqual(Task.objects.get(pk=later.pk).status, Task.QUEUED)
+
+    def test_failure_is_rescheduled_with_backoff(self):
+        task = explode.delay()
+        self.assertEqual(taskqueue.claim('w1'), [task.pk])
+        before = timezone.now()
+        self.assertFalse(taskqueue.run(task.pk, 'w1'))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.locked_by), (Task.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: boom', task.last_error)
+        # BACKOFF_BASE seconds, give or take the jitter
+        delay = (task.run_at - before).total_seconds()
+        self.assertTrue(4 <= delay <= 6.5, delay)
+        self.assertEqual(taskqueue.claim('w1'), [])
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        taskqueue.claim('w1')
+        self.assertFalse(taskqueue.run(task.pk, 'w1'))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    def test_backoff_grows_and_is_capped(self):
+        config = dict(taskqueue.DEFAULTS, BACKOFF_BASE=10, BACKOFF_MAX=60)
+        self.assertTrue(timedelta(seconds=16) <= taskqueue.backoff(2, config) <= timedelta(seconds=24))
+        self.assertLessEqual(taskqueue.backoff(10, config), timedelta(seconds=72))
+
+    def test_heartbeat_keeps_a_running_task(self):
+        task = taskqueue.enqueue('tests.record', [1])
+        taskqueue.claim('w1')
+        self.age(task, 3600)
+        self.assertEqual(taskqueue.heartbeat('w2', [task.pk]), 0)
+        self.assertEqual(taskqueue.heartbeat('w1', [task.pk]), 1)
+        self.assertEqual(taskqueue.requeue_stale(), (0, 0))
+        self.assertEqual(Task.objects.get(pk=task.pk).status, Task.RUNNING)
+
+    def test_stale_claim_is_requeued(self):
+        task = taskqueue.enqueue('tests.record', ['again'])
+        taskqueue.claim('w1')
+        self.age(task, 3600)
+        self.assertEqual(taskqueue.requeue_stale(), (1, 0))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.locked_by), (Task.QUEUED, ''))
+
+        # The dead worker's late acknowledgement does not touch the new claim
+        stale_claim = Task(pk=task.pk, locked_by='w1', attempts=1)
+        taskqueue.claim('w2')
+        self.assertEqual(taskqueue.ack(stale_claim), 0)
+        self.assertEqual(taskqueue.fail(stale_claim, 'late'), 0)
+        self.assertTrue(taskqueue.run(task.pk, 'w2'))
+        self.assertEqual(calls, ['again'])
+
+    def test_stale_claim_out_of_attempts_fails(self):
+        task = explode.delay()
+        Task.objects.filter(pk=task.pk).update(attempts=1)
+        taskqueue.claim('w1')
+        self.age(task, 3600)
+        self.assertEqual(taskqueue.requeue_stale(), (0, 1))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(task.last_error, 'The worker running the task stopped responding.')
+
+    def test_unknown_task(self):
+        with self.assertRaises(taskqueue.UnknownTask):
+            taskqueue.enqueue('tests.missing')
+        task = Task.objects.create(name='tests.missing', run_at=timezone.now())
+        taskqueue.claim('w1')
+        self.assertFalse(taskqueue.run(task.pk, 'w1'))
+        self.assertEqual(Task.objects.get(pk=task.pk).status, Task.FAILED)
+
+    def test_purge_finished(self):
+        old = taskqueue.enqueue('tests.record', [1])
+        recent = taskqueue.enqueue('tests.record', [2])
+        Task.objects.filter(pk=old.pk).update(status=Task.DONE, finished_at=timezone.now() - timedelta(days=8))
+        Task.objects.filter(pk=recent.pk).update(status=Task.DONE, finished_at=timezone.now())
+        self.assertEqual(taskqueue.purge_finished(), 1)
+        self.assertEqual(list(Task.objects.values_list('pk', flat=True)), [recent.pk])
+
+    @override_settings(CMS_TASKS={'EAGER': True})
+    def test_eager_runs_inline(self):
+        self.assertIsNone(record.delay('now'))
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Task.objects.exists())
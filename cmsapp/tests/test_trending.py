@@ -0,0 +1,60 @@
+import importlib
+from datetime import timedelta
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from cmsapp import trending
+from cmsapp.models import Club, ClubMembership, EventRegistration, Message
+
+from .base import CmsTestCase
+
+backfill_trending = importlib.import_module('cmsapp.migrations.0021_club_trending_score').backfill_trending
+
+
+class TrendingTests(CmsTestCase):
+    def score(self, club):
+        return Club.objects.get(pk=club.pk).trending_score
+
+    def test_score_sums_weights_and_decays(self):
+        now = timezone.now()
+        go = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        self.assertIsNone(self.score(go))
+        Message.objects.create(club=go, sender=self.admin, content='hi')
+        Message.objects.create(club=go, sender=self.admin, content='hi')
+        # Two messages weigh 1 each
+        self.assertAlmostEqual(trending.current_score(self.score(go), now), 2.0, places=4)
+        later = now + timedelta(hours=trending.DEFAULTS['HALF_LIFE_HOURS'])
+        self.assertAlmostEqual(trending.current_score(self.score(go), later), 1.0, places=4)
+        self.assertEqual(trending.current_score(None), 0.0)
+
+    def test_registrations_count_towards_the_club(self):
+        event = self.create_event(timezone.now() + timedelta(days=1))
+        before = trending.current_score(self.score(self.club))
+        EventRegistration.objects.create(event=event, user=self.member)
+        after = trending.current_score(self.score(self.club))
+        self.assertAlmostEqual(after - before, trending.DEFAULTS['WEIGHTS']['registration'], places=4)
+
+    def test_backfill_matches_live_updates(self):
+        event = self.create_event(timezone.now() + timedelta(days=1))
+        EventRegistration.objects.create(event=event, user=self.member)
+        Message.objects.create(club=self.club, sender=self.member, content='hi')
+        live = self.score(self.club)
+        Club.objects.update(trending_score=None)
+        backfill_trending(apps, None)
+        self.assertAlmostEqual(self.score(self.club), live, places=6)
+
+    def test_trending_clubs_follow_new_activity(self):
+        go = Club.objects.create(name='Go', description='d', created_by=self.admin, is_approved=True)
+        hidden = Club.objects.create(name='Hidden', description='d', created_by=self.admin, is_approved=False)
+        for _ in range(5):
+            Message.objects.create(club=hidden, sender=self.admin, content='hi')
+        self.assertEqual([club.name for club, _ in trending.trending_clubs(5)], ['Chess'])
+
+        user = User.objects.create_user('ann', 'ann@example.com', 'pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            ClubMembership.objects.create(user=user, club=go)
+            for _ in range(5):
+                Message.objects.create(club=go, sender=user, content='hi')
+        self.assertEqual([club.name for club, _ in trending.trending_clubs(5)], ['Go', 'Chess'])
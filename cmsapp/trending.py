@@ -0,0 +1,109 @@
+"""
+Trending clubs: a time-decayed activity score per club.
+
+Every join, message, event and event registration adds WEIGHTS[kind] to its
+club's score, and the score halves every HALF_LIFE_HOURS. Decaying every
+club's score as time passes would mean rewriting every row, so
+Club.trending_score holds the score in log space relative to a fixed EPOCH:
+
+    trending_score = ln(sum of weight * exp(rate * (t - EPOCH)))
+
+over the club's activity at times t, where rate = ln 2 / half-life. Time
+passing scales every club's score by the same factor, which leaves the order
+of the stored values unchanged, so the index on trending_score serves the
+ranking directly and current_score() recovers the decayed value at read
+time. Adding an activity is
+logaddexp(trending_score, ln(weight) + rate * (now - EPOCH)), written as a
+database expression alongside the club's version bump (see cmsapp.signals),
+so no history is ever rescanned and concurrent updates are never lost.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from .cache import bump_stamp, cached, get_stamp
+from .models import Club
+
+DEFAULTS = {
+    'HALF_LIFE_HOURS': 72,
+    'WEIGHTS': {
+        'join': 3.0,
+        'message': 1.0,
+        'event': 4.0,
+        'registration': 2.0,
+    },
+}
+
+# Stamp bumped whenever a score changes (cmsapp.cache.bump_stamp)
+STAMP = 'trending'
+
+# Changing it (or HALF_LIFE_HOURS) invalidates the stored scores
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def get_config():
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'CMS_TRENDING', {}))
+    config['WEIGHTS'] = {**DEFAULTS['WEIGHTS'], **config['WEIGHTS']}
+    return config
+
+
+def decay_rate(config=None):
+    # Per second
+    return math.log(2) / ((config or get_config())['HALF_LIFE_HOURS'] * 3600)
+
+
+def log_increment(kind, now=None, config=None, count=1):
+    # `count` activities of `kind` at once add count times the weight
+    config = config or get_config()
+    weight = config['WEIGHTS'].get(kind, 0) * count
+    if weight <= 0:
+        return None
+    elapsed = ((now or timezone.now()) - EPOCH).total_seconds()
+    return math.log(weight) + decay_rate(config) * elapsed
+
+
+def bump(kind, now=None, count=1):
+    # Update expression for Club.trending_score, or None if `kind` carries no weight
+    increment = log_increment(kind, now, count=count)
+    if increment is None:
+        return None
+    x = Value(increment, output_field=FloatField())
+    score = F('trending_score')
+    return Case(
+        When(trending_score__isnull=True, then=x),
+        default=Greatest(score, x) + Ln(Value(1.0) + Exp(-Abs(score - x))),
+        output_field=FloatField(),
+    )
+
+
+def bump_changes(kind, now=None, count=1):
+    # Keyword arguments for a Club update; empty when `kind` carries no weight
+    expression = bump(kind, now, count)
+    return {} if expression is None else {'trending_score': expression}
+
+
+def scores_changed():
+    # Call once a Club update with bump_changes() has committed
+    bump_stamp(STAMP)
+
+
+def current_score(log_score, now=None):
+    if log_score is None:
+        return 0.0
+    elapsed = ((now or timezone.now()) - EPOCH).total_seconds()
+    return math.exp(log_score - decay_rate() * elapsed)
+
+
+def trending_clubs(limit):
+    # The stored order only changes with new activity, which bumps the trending stamp
+    clubs = cached(f'trending_clubs:{limit}:{get_stamp(STAMP)}', [Club], lambda: list(
+        Club.objects.filter(is_approved=True, trending_score__isnull=False)
+        .order_by('-trending_score', 'id')[:limit]
+    ))
+    now = timezone.now()
+    return [(club, current_score(club.trending_score, now)) for club in clubs]
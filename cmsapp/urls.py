@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api
 
 urlpatterns = [
     # Authentication URLs
@@ -10,7 +10,9 @@ urlpatterns = [
     # Home and Profile URLs
     path('', views.home_view, name='home'),
     path('profile/', views.profile_view, name='profile'),
+    path('feed/', views.feed_view, name='feed'),
     path('admin-dashboard/', views.admin_dashboard_view, name='admin_dashboard'),
+    path('admin-dashboard/slow-queries/', views.slow_queries_view, name='slow_queries'),
     
     # Club URLs
     path('clubs/', views.club_list_view, name='club_list'),
@@ -21,6 +23,8 @@ urlpatterns = [
     path('clubs/join-request/<int:request_id>/<str:action>/', views.club_join_request_handle_view, name='club_join_request_handle'),
     path('clubs/<int:club_id>/leave/', views.club_leave_view, name='club_leave'),
     path('clubs/<int:club_id>/make-leader/<int:user_id>/', views.club_make_leader_view, name='club_make_leader'),
+    path('clubs/<int:club_id>/members/export/', views.club_members_export_view, name='club_members_export'),
+    path('clubs/<int:club_id>/join-requests/export/', views.club_join_requests_export_view, name='club_join_requests_export'),
     path('leader/<int:user_id>/details/', views.leader_details_view, name='leader_details'),
     path('user/<int:user_id>/profile/', views.user_profile_view, name='user_profile'),
     path('promote-to-admin/<int:user_id>/', views.promote_to_admin_view, name='promote_to_admin'),
@@ -33,14 +37,36 @@ urlpatterns = [
     
     # Event URLs
     path('clubs/<int:club_id>/events/create/', views.event_create_view, name='event_create'),
+    path('clubs/<int:club_id>/events/import/', views.event_import_view, name='event_import'),
     path('events/<int:event_id>/', views.event_detail_view, name='event_detail'),
     path('events/<int:event_id>/update/', views.event_update_view, name='event_update'),
     path('events/<int:event_id>/delete/', views.event_delete_view, name='event_delete'),
     path('events/<int:event_id>/register/', views.register_for_event, name='register_for_event'),
+    path('events/<int:event_id>/sessions/<int:occurrence>/cancel/', views.event_occurrence_cancel_view, name='event_occurrence_cancel'),
+    path('events/<int:event_id>/participants/export/', views.event_participants_export_view, name='event_participants_export'),
     path('events/upcoming/', views.upcoming_events_view, name='upcoming_events'),
+    path('events/calendar/', views.event_calendar_view, name='event_calendar'),
     path('events/search/', views.event_search_view, name='event_search'),
+    path('calendar/<str:token>/events.ics', views.user_calendar_feed_view, name='user_calendar_feed'),
+    path('calendar/<str:token>/clubs/<int:club_id>.ics', views.club_calendar_feed_view, name='club_calendar_feed'),
+    path('calendar/reset/', views.calendar_token_reset_view, name='calendar_token_reset'),
     
     # Message URLs
     path('clubs/<int:club_id>/messages/', views.message_list_view, name='message_list'),
+    path('clubs/<int:club_id>/messages/archive/', views.message_archive_view, name='message_archive'),
+    path('clubs/<int:club_id>/activity/', views.club_activity_view, name='club_activity'),
     path('messages/<int:message_id>/delete/', views.message_delete_view, name='message_delete'),
+
+    # Monitoring URLs
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('healthz/ready/', views.readiness_view, name='readiness'),
+
+    # JSON API
+    path('api/v1/clubs/', api.club_list, name='api_club_list'),
+    path('api/v1/clubs/<int:club_id>/', api.club_detail, name='api_club_detail'),
+    path('api/v1/clubs/<int:club_id>/members/', api.club_members, name='api_club_members'),
+    path('api/v1/clubs/<int:club_id>/messages/', api.club_messages, name='api_club_messages'),
+    path('api/v1/events/upcoming/', api.upcoming_events, name='api_upcoming_events'),
+    path('api/v1/changes/', api.change_feed, name='api_change_feed'),
+    path('api/v1/changes/snapshot/', api.change_snapshot, name='api_change_snapshot'),
 ]
\ No newline at end of file
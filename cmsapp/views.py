@@ -1,19 +1,51 @@
+import logging
+from datetime import datetime, timezone as dt_timezone
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Count, Q
-from django.http import HttpResponseForbidden, JsonResponse
+from django.db.models.functions import TruncMonth
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db import IntegrityError
-from .forms import UserRegisterForm, UserLoginForm, UserProfileForm, ClubForm, ClubJoinRequestForm, EventForm, MessageForm
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.db import IntegrityError, DatabaseError, transaction
+from django.utils.crypto import constant_time_compare
+from .forms import UserRegisterForm, UserLoginForm, UserProfileForm, ClubForm, ClubJoinRequestForm, EventForm, EventImportForm, MessageForm, EventRegistrationForm
 from django.contrib.auth.models import User
-from .models import UserProfile, Club, Event, Message, ClubJoinRequest, ClubMembership, EventRegistration
+from .models import UserProfile, Club, Event, Message, ClubJoinRequest, ClubMembership, EventRegistration, Team, MessageArchiveSegment, ActivityLog, EventOccurrenceException
+from . import metrics, slowlog, exports, ical, archive, activity, feed, recommendations, trending, scheduling, recurrence, calendar_grid, event_import
+from .pagination import CursorPage, CursorPaginator, InvalidCursor
+from .conditional import club_detail_etag, event_detail_etag
+from .visibility import visible_clubs, visible_events, can_read_club_messages
+from .cache import get_club, get_club_or_404, get_event_or_404, get_profile, top_clubs_by_members, top_clubs_by_events
+
+logger = logging.getLogger(__name__)
+
+# Page sizes of keyset-paginated listings
+ROSTER_PAGE_SIZE = 50
+CLUB_PAGE_SIZE = 24
+EVENT_PAGE_SIZE = 25
+ACTIVITY_PAGE_SIZE = 50
+# Entries in the admin dashboard's activity feed
+ACTIVITY_FEED_SIZE = 20
+# Upcoming sessions listed on a recurring event's page
+SESSION_LIST_SIZE = 10
+
+def _listing_page(request, queryset, ordering, per_page):
+    paginator = CursorPaginator(queryset, ordering, per_page)
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
 
 # Club Management Views
 @login_required
 def club_leave_view(request, club_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     user = request.user
     
     # Check if user is a member of the club
@@ -33,12 +65,12 @@ def club_leave_view(request, club_id):
 
 @login_required
 def club_make_leader_view(request, club_id, user_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     target_user = get_object_or_404(User, id=user_id)
     current_user = request.user
     
     # Check if current user is a leader or admin
-    user_profile = UserProfile.objects.get(user=current_user)
+    user_profile = get_profile(current_user)
     role = user_profile.role
     is_leader = ClubMembership.objects.filter(user=current_user, club=club, is_leader=True).exists()
     
@@ -60,12 +92,12 @@ def club_make_leader_view(request, club_id, user_id):
 # Messaging Views
 @login_required
 def message_list_view(request, club_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     user = request.user
     
     # Check if user is a member of the club
     is_member = ClubMembership.objects.filter(user=user, club=club).exists()
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     if not (is_member or role == 'admin'):
@@ -73,7 +105,7 @@ def message_list_view(request, club_id):
         return redirect('club_list')
     
     # Get all messages for this club
-    club_messages = Message.objects.filter(club=club).order_by('-timestamp')
+    club_messages = Message.objects.filter(club=club).select_related('sender__profile').order_by('-timestamp')
     
     # Get club members count
     members = ClubMembership.objects.filter(club=club)
@@ -103,16 +135,46 @@ def message_list_view(request, club_id):
         'is_leader': is_leader,
         'members': members,
         'today': timezone.now().date(),
+        'has_archive': MessageArchiveSegment.objects.filter(club_id=club.id).exists(),
     }
     
     return render(request, 'cmsapp/message_list.html', context)
 
+@login_required
+def message_archive_view(request, club_id):
+    club = get_club_or_404(club_id)
+    role = get_profile(request.user).role
+    
+    if not can_read_club_messages(request.user, role, club):
+        messages.error(request, 'You must be a member of this club to view messages.')
+        return redirect('club_list')
+    
+    # One archive segment per page, newest first
+    segments = MessageArchiveSegment.objects.filter(club_id=club.id)
+    page = _listing_page(request, segments, ('-last_timestamp', '-id'), 1)
+    segment = page.items[0] if page.items else None
+    
+    archived_messages = []
+    if segment is not None:
+        try:
+            archived_messages = list(archive.read_segment(segment))
+        except FileNotFoundError:
+            messages.error(request, 'This part of the message archive is missing from storage.')
+        archived_messages.reverse()
+    
+    return render(request, 'cmsapp/message_archive.html', {
+        'club': club,
+        'page': page,
+        'segment': segment,
+        'archived_messages': archived_messages,
+    })
+
 @login_required
 def message_delete_view(request, message_id):
     message = get_object_or_404(Message, id=message_id)
     club = message.club
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the sender, a leader, or an admin
@@ -157,6 +219,7 @@ def register_view(request):
                 user_profile.education_image = form.cleaned_data.get('education_image')
                 user_profile.save()
             
+            activity.log(user, ActivityLog.USER_REGISTERED, 'joined the site')
             messages.success(request, f'Welcome {username}! Your account has been registered successfully.')
             
             # Try to log the user in automatically
@@ -202,7 +265,7 @@ def logout_view(request):
 @login_required
 def home_view(request):
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     context = {
@@ -210,15 +273,20 @@ def home_view(request):
         'role': role,
     }
     
+    # Merged timeline of the user's clubs; the first page is served from cache
+    context['feed_items'], context['feed_next'] = feed.first_page(user)
+    
     # Get top 5 clubs for all roles - based on members and events
-    context['top_clubs_by_members'] = Club.objects.annotate(member_count=Count('clubmembership')).order_by('-member_count')[:5]
-    context['top_clubs_by_events'] = Club.objects.annotate(event_count=Count('events')).order_by('-event_count')[:5]
+    context['top_clubs_by_members'] = top_clubs_by_members(5)
+    context['top_clubs_by_events'] = top_clubs_by_events(5)
+    # Most active clubs lately, by time-decayed activity
+    context['trending_clubs'] = trending.trending_clubs(5)
     
     if role == 'admin':
         # Admin sees clubs they created and all events
         context['clubs'] = Club.objects.filter(created_by=user)
         # Get upcoming events
-        context['events'] = Event.objects.filter(start_date__gte=timezone.now()).order_by('start_date')[:5]
+        context['events'] = recurrence.upcoming(Event.objects.select_related('club'), timezone.now(), 5)[:5]
         # Stats for dashboard
         context['total_clubs'] = Club.objects.count()
         context['total_members'] = UserProfile.objects.filter(role='member').count()
@@ -227,17 +295,17 @@ def home_view(request):
         context['total_messages'] = Message.objects.count()
         
         # Get clubs with most members
-        context['popular_clubs'] = Club.objects.annotate(member_count=Count('clubmembership')).order_by('-member_count')[:5]
+        context['popular_clubs'] = context['top_clubs_by_members']
         
         # Get clubs with most events
-        context['active_clubs'] = Club.objects.annotate(event_count=Count('events')).order_by('-event_count')[:5]
+        context['active_clubs'] = context['top_clubs_by_events']
         
         # Get upcoming events in the next 7 days
         next_week = timezone.now() + timezone.timedelta(days=7)
-        context['upcoming_week_events'] = Event.objects.filter(
-            start_date__gte=timezone.now(),
-            start_date__lte=next_week
-        ).order_by('start_date')
+        context['upcoming_week_events'] = [
+            occurrence for occurrence in recurrence.occurrences_between(Event.objects.select_related('club'), timezone.now(), next_week)
+            if occurrence.start_date >= timezone.now()
+        ]
         
         # Get recent messages
         context['recent_messages'] = Message.objects.order_by('-timestamp')[:10]
@@ -247,109 +315,122 @@ def home_view(request):
         leader_clubs = Club.objects.filter(created_by=user)
         context['clubs'] = leader_clubs
         # Get upcoming events for leader's clubs
-        context['events'] = Event.objects.filter(club__in=leader_clubs, start_date__gte=timezone.now()).order_by('start_date')[:5]
+        context['events'] = recurrence.upcoming(Event.objects.filter(club__in=leader_clubs).select_related('club'), timezone.now(), 5)[:5]
     else:  # member
         # Member sees clubs they joined and events in those clubs
         joined_clubs = ClubMembership.objects.filter(user=user).values_list('club', flat=True)
         context['clubs'] = Club.objects.filter(id__in=joined_clubs)
         # Get upcoming events for member's clubs
-        context['events'] = Event.objects.filter(club__id__in=joined_clubs, start_date__gte=timezone.now()).order_by('start_date')[:5]
+        context['events'] = recurrence.upcoming(Event.objects.filter(club__id__in=joined_clubs).select_related('club'), timezone.now(), 5)[:5]
     
     return render(request, 'cmsapp/home.html', context)
 
+@login_required
+def feed_view(request):
+    try:
+        items, next_cursor = feed.older_page(request.user, request.GET.get('cursor', ''))
+    except feed.InvalidFeedCursor:
+        return redirect('home')
+    return render(request, 'cmsapp/feed.html', {'feed_items': items, 'feed_next': next_cursor})
+
 @login_required
 def admin_dashboard_view(request):
     # Only admins can access this view
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     if user_profile.role != 'admin':
         messages.error(request, 'You do not have permission to access the admin dashboard.')
         return redirect('home')
     
     # Basic statistics
     total_clubs = Club.objects.count()
-    total_members = UserProfile.objects.filter(role='member').count()
-    total_leaders = UserProfile.objects.filter(role='leader').count()
+    role_counts = dict(UserProfile.objects.values_list('role').annotate(n=Count('id')).order_by())
+    total_members = role_counts.get('member', 0)
+    total_leaders = role_counts.get('leader', 0)
     total_events = Event.objects.count()
     total_messages = Message.objects.count()
     
     # Clubs with most members
-    popular_clubs = Club.objects.annotate(member_count=Count('clubmembership')).order_by('-member_count')[:10]
+    popular_clubs = top_clubs_by_members(10)
     
     # Clubs with most events
-    active_clubs = Club.objects.annotate(event_count=Count('events')).order_by('-event_count')[:10]
+    active_clubs = top_clubs_by_events(10)
     
     # Recent join requests
-    recent_join_requests = ClubJoinRequest.objects.filter(is_approved=False, is_rejected=False).order_by('-timestamp')[:15]
+    recent_join_requests = ClubJoinRequest.objects.filter(is_approved=False, is_rejected=False).select_related('user', 'club').order_by('-timestamp')[:15]
     
     # Pending club approvals - updated to retrieve pending clubs that need admin approval
-    pending_clubs = Club.objects.filter(is_approved=False).order_by('-created_at')
+    pending_clubs = Club.objects.filter(is_approved=False).select_related('created_by').order_by('-created_at')
     
-    # Events by month (for chart)
+    # Events and user registrations by month (for charts), one query each
     current_year = timezone.now().year
-    events_by_month = []
-    for month in range(1, 13):
-        count = Event.objects.filter(
-            start_date__year=current_year,
-            start_date__month=month
-        ).count()
-        events_by_month.append(count)
-    
-    # User registrations by month (for chart)
-    users_by_month = []
-    for month in range(1, 13):
-        count = User.objects.filter(
-            date_joined__year=current_year,
-            date_joined__month=month
-        ).count()
-        users_by_month.append(count)
+    events_by_month = _counts_by_month(Event.objects.all(), 'start_date', current_year)
+    users_by_month = _counts_by_month(User.objects.all(), 'date_joined', current_year)
     
     # Club status distribution for pie chart
     approved_clubs = Club.objects.filter(is_approved=True).count()
     pending_clubs_count = Club.objects.filter(is_approved=False).count()
     
     # User role distribution for pie chart
-    admin_count = UserProfile.objects.filter(role='admin').count()
-    leader_count = UserProfile.objects.filter(role='leader').count()
-    member_count = UserProfile.objects.filter(role='member').count()
+    admin_count = role_counts.get('admin', 0)
+    leader_count = total_leaders
+    member_count = total_members
     
-    # Recent activity for live monitoring (last 7 days)
+    # Recent activity for live monitoring (last 7 days), counted from the activity log
     seven_days_ago = timezone.now() - timezone.timedelta(days=7)
-    recent_events = Event.objects.filter(start_date__gte=seven_days_ago).count()
-    recent_clubs = Club.objects.filter(created_at__gte=seven_days_ago).count()
-    recent_users = User.objects.filter(date_joined__gte=seven_days_ago).count()
+    recent_activity = activity.recent(ACTIVITY_FEED_SIZE)
+    activity_counts = dict(
+        ActivityLog.objects.filter(timestamp__gte=seven_days_ago)
+        .values_list('action').annotate(n=Count('id')).order_by()
+    )
+    recent_events = activity_counts.get(ActivityLog.EVENT_CREATED, 0)
+    recent_clubs = activity_counts.get(ActivityLog.CLUB_CREATED, 0)
+    recent_users = activity_counts.get(ActivityLog.USER_REGISTERED, 0)
     
     # Top 10 Leaders for promotion based on score calculation
     # Score calculation: Communication (messages sent) + Experience (account age in months) + Events organized
     current_date = timezone.now()
     leaders_with_scores = []
+    leader_profiles = list(UserProfile.objects.filter(role='leader').select_related('user'))
     
-    for leader_profile in UserProfile.objects.filter(role='leader'):
+    # Per-leader counts, grouped in one query each
+    thirty_days_ago = current_date - timezone.timedelta(days=30)
+    messages_sent = dict(
+        Message.objects.filter(sender__profile__role='leader', timestamp__gte=thirty_days_ago)
+        .values_list('sender_id').annotate(n=Count('id')).order_by()
+    )
+    clubs_created = dict(
+        Club.objects.filter(created_by__profile__role='leader')
+        .values_list('created_by_id').annotate(n=Count('id')).order_by()
+    )
+    events_organized = dict(
+        Event.objects.filter(club__created_by__profile__role='leader')
+        .values_list('club__created_by_id').annotate(n=Count('id')).order_by()
+    )
+    members_in_clubs = dict(
+        ClubMembership.objects.filter(club__created_by__profile__role='leader')
+        .values_list('club__created_by_id').annotate(n=Count('id')).order_by()
+    )
+    
+    for leader_profile in leader_profiles:
         leader = leader_profile.user
         
         # Communication score: number of messages sent in last 30 days
-        thirty_days_ago = current_date - timezone.timedelta(days=30)
-        communication_score = Message.objects.filter(
-            sender=leader,
-            timestamp__gte=thirty_days_ago
-        ).count()
+        communication_score = messages_sent.get(leader.pk, 0)
         
         # Experience score: account age in months (max 24 months)
         account_age_days = (current_date - leader.date_joined).days
         experience_score = min(account_age_days // 30, 24)  # Cap at 24 months
         
         # Events score: number of events organized by leader's clubs
-        leader_clubs = Club.objects.filter(created_by=leader)
-        events_score = Event.objects.filter(club__in=leader_clubs).count()
+        events_score = events_organized.get(leader.pk, 0)
         
         # Total score with weights: Communication 40%, Experience 30%, Events 30%
         total_score = (communication_score * 0.4) + (experience_score * 0.3) + (events_score * 0.3)
         
         # Get additional info for display
-        leader_clubs_count = leader_clubs.count()
-        total_members_in_clubs = ClubMembership.objects.filter(
-            club__in=leader_clubs
-        ).count()
+        leader_clubs_count = clubs_created.get(leader.pk, 0)
+        total_members_in_clubs = members_in_clubs.get(leader.pk, 0)
         
         leaders_with_scores.append({
             'leader': leader,
@@ -389,12 +470,42 @@ def admin_dashboard_view(request):
         'recent_events': recent_events,
         'recent_clubs': recent_clubs,
         'recent_users': recent_users,
+        'recent_activity': recent_activity,
         # Top leaders for promotion
         'top_leaders': top_leaders,
     }
     
     return render(request, 'cmsapp/admin_dashboard.html', context)
 
+def _counts_by_month(queryset, field, year):
+    # Rows of `year` per month, January first, counted in one grouped query
+    counts = (
+        queryset.filter(**{f'{field}__year': year})
+        .annotate(month=TruncMonth(field)).values_list('month').annotate(n=Count('id')).order_by()
+    )
+    by_month = {month.month: n for month, n in counts}
+    return [by_month.get(month, 0) for month in range(1, 13)]
+
+@login_required
+def slow_queries_view(request):
+    # Only admins can see the slow query log
+    user_profile = get_profile(request.user)
+    if user_profile.role != 'admin':
+        messages.error(request, 'You do not have permission to view the slow query log.')
+        return redirect('home')
+
+    config = slowlog.get_config()
+    statements = slowlog.aggregate(slowlog.load_records(config))[:50]
+    for statement in statements:
+        statement['last_seen'] = datetime.fromtimestamp(statement['last_seen'], tz=dt_timezone.utc)
+
+    context = {
+        'statements': statements,
+        'threshold_ms': config['THRESHOLD_MS'],
+        'role': user_profile.role,
+    }
+    return render(request, 'cmsapp/slow_queries.html', context)
+
 # Profile View
 @login_required
 def profile_view(request):
@@ -413,7 +524,7 @@ def profile_view(request):
 @login_required
 def user_profile_view(request, user_id):
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Only admins can view other users' detailed profiles
@@ -461,30 +572,28 @@ def user_profile_view(request, user_id):
 # Club Views
 @login_required
 def club_list_view(request):
-    user_profile = UserProfile.objects.get(user=request.user)
+    user_profile = get_profile(request.user)
     role = user_profile.role
     
-    if role == 'admin':
-        # Admin sees all clubs
-        clubs = Club.objects.all()
-    elif role == 'leader':
-        # Leader sees clubs they created and clubs they joined
-        created_clubs = Club.objects.filter(created_by=request.user)
-        joined_clubs = request.user.joined_clubs.all()
-        clubs = (created_clubs | joined_clubs).distinct()
-    else:  # member
-        # Member sees clubs they joined and approved clubs they can join
-        joined_clubs = request.user.joined_clubs.all()
-        available_clubs = Club.objects.filter(is_approved=True).exclude(id__in=joined_clubs.values_list('id', flat=True))
-        clubs = (joined_clubs | available_clubs).distinct()
+    # Admins see every club, leaders the clubs they created or joined, members
+    # the clubs they joined plus every approved club (see cmsapp.visibility)
+    clubs = visible_clubs(request.user, role).select_related('created_by')
+    page = _listing_page(request, clubs, ('name', 'id'), CLUB_PAGE_SIZE)
+    
+    # Clubs similar to the ones the user joined, on the first page only
+    recommended = []
+    if role != 'admin' and not page.has_previous:
+        recommended = recommendations.recommended_clubs(request.user)
     
-    return render(request, 'cmsapp/club_list.html', {'clubs': clubs, 'role': role})
+    return render(request, 'cmsapp/club_list.html', {'clubs': page, 'page': page, 'role': role, 'recommended': recommended})
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=club_detail_etag)
 def club_detail_view(request, club_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is a member of the club
@@ -498,20 +607,15 @@ def club_detail_view(request, club_id):
     events = Event.objects.filter(club=club).order_by('start_date')
     
     # Get club members
-    members = ClubMembership.objects.filter(club=club)
+    members = ClubMembership.objects.filter(club=club).select_related('user')
     
     # Get join requests if user is leader or admin
     join_requests = None
     if is_leader or role == 'admin':
-        join_requests = ClubJoinRequest.objects.filter(club=club, is_approved=False, is_rejected=False)
-    
-    # Get upcoming events for this club
-    events = Event.objects.filter(club=club, start_date__gte=timezone.now()).order_by('start_date')
+        join_requests = ClubJoinRequest.objects.filter(club=club, is_approved=False, is_rejected=False).select_related('user')
     
-    # Get club messages if user is a member
-    club_messages = None
-    if is_member or role == 'admin':
-        club_messages = Message.objects.filter(club=club).order_by('-timestamp')
+    # Get upcoming events for this club; a recurring series is listed once while it runs
+    events = recurrence.in_range(Event.objects.filter(club=club), timezone.now(), None).order_by('start_date')
     
     context = {
         'club': club,
@@ -521,15 +625,15 @@ def club_detail_view(request, club_id):
         'is_leader': is_leader,
         'has_pending_request': has_pending_request,
         'join_requests': join_requests,
-        'club_messages': club_messages,
         'role': role,
+        'calendar_token': ical.make_token(user) if is_member or role == 'admin' else None,
     }
     
     return render(request, 'cmsapp/club_detail.html', context)
 
 @login_required
 def club_create_view(request):
-    user_profile = UserProfile.objects.get(user=request.user)
+    user_profile = get_profile(request.user)
     role = user_profile.role
     
     # Allow both admins and leaders to create clubs
@@ -555,6 +659,7 @@ def club_create_view(request):
             # Add creator as a member and leader
             membership = ClubMembership(user=request.user, club=club, is_leader=True)
             membership.save()
+            activity.log(request.user, ActivityLog.CLUB_CREATED, f'created the club "{club.name}"', club)
             
             messages.success(request, approval_message)
             return redirect('club_detail', club_id=club.id)
@@ -567,7 +672,7 @@ def club_create_view(request):
 def club_update_view(request, club_id):
     club = get_object_or_404(Club, id=club_id)
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the leader of the club or an admin
@@ -590,7 +695,7 @@ def club_update_view(request, club_id):
 
 @login_required
 def club_join_request_view(request, club_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     user = request.user
     
     # Check if user is already a member
@@ -633,7 +738,7 @@ def club_join_request_handle_view(request, request_id, action):
     join_request = get_object_or_404(ClubJoinRequest, id=request_id)
     club = join_request.club
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the leader of the club or an admin
@@ -646,16 +751,19 @@ def club_join_request_handle_view(request, request_id, action):
     if action == 'approve':
         # Approve the request
         join_request.is_approved = True
+        join_request.decided_at = timezone.now()
         join_request.save()
         
         # Add the user as a member
         membership = ClubMembership(user=join_request.user, club=club)
         membership.save()
+        activity.log(join_request.user, ActivityLog.MEMBER_JOINED, f'joined the club, approved by {user.username}', club)
         
         messages.success(request, f'{join_request.user.username} has been added to the club!')
     elif action == 'reject':
         # Reject the request
         join_request.is_rejected = True
+        join_request.decided_at = timezone.now()
         join_request.save()
         
         messages.success(request, f'Join request from {join_request.user.username} has been rejected.')
@@ -666,7 +774,7 @@ def club_join_request_handle_view(request, request_id, action):
 def club_approval_view(request, club_id, action):
     # Only admins can approve clubs
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     if user_profile.role != 'admin':
         messages.error(request, 'You do not have permission to approve clubs.')
         return redirect('home')
@@ -677,11 +785,13 @@ def club_approval_view(request, club_id, action):
         # Approve the club
         club.is_approved = True
         club.save()
+        activity.log(user, ActivityLog.CLUB_APPROVED, f'approved the club "{club.name}"', club)
         messages.success(request, f'Club "{club.name}" has been approved!')
     elif action == 'reject':
         # Delete the club if rejected
         club_name = club.name
         club.delete()
+        activity.log(user, ActivityLog.CLUB_REJECTED, f'rejected and removed the club "{club_name}"')
         messages.success(request, f'Club "{club_name}" has been rejected and removed.')
     
     return redirect('admin_dashboard')
@@ -690,7 +800,7 @@ def club_approval_view(request, club_id, action):
 def promote_to_admin_view(request, user_id):
     # Only admins can promote users to admin
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     if user_profile.role != 'admin':
         messages.error(request, 'You do not have permission to promote users to admin.')
         return redirect('home')
@@ -713,7 +823,7 @@ def promote_to_admin_view(request, user_id):
 
 @login_required
 def club_leave_view(request, club_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     user = request.user
     
     # Check if user is a member
@@ -726,16 +836,17 @@ def club_leave_view(request, club_id):
     
     # Remove membership
     membership.delete()
+    activity.log(user, ActivityLog.MEMBER_LEFT, 'left the club', club)
     
     messages.success(request, f'You have left the club "{club.name}".')
     return redirect('club_list')
 
 @login_required
 def club_make_leader_view(request, club_id, user_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     target_user = get_object_or_404(User, id=user_id)
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the leader of the club or an admin
@@ -751,16 +862,35 @@ def club_make_leader_view(request, club_id, user_id):
     # Make the target user a leader
     target_membership.is_leader = True
     target_membership.save()
+    activity.log(user, ActivityLog.LEADER_PROMOTED, f'made {target_user.username} a leader', club)
     
     messages.success(request, f'{target_user.username} is now a leader of the club.')
     return redirect('club_detail', club_id=club.id)
 
+@login_required
+def club_activity_view(request, club_id):
+    club = get_club_or_404(club_id)
+    
+    # Only the club's leaders and admins can see its audit trail
+    if not _can_manage_club(request.user, club):
+        messages.error(request, "You do not have permission to view this club's activity.")
+        return redirect('club_detail', club_id=club.id)
+    
+    activity.flush()
+    entries = _listing_page(
+        request,
+        ActivityLog.objects.filter(club_id=club.id).select_related('actor'),
+        ('-timestamp', '-id'),
+        ACTIVITY_PAGE_SIZE,
+    )
+    return render(request, 'cmsapp/club_activity.html', {'club': club, 'entries': entries})
+
 # Event create view
 @login_required
 def event_create_view(request, club_id):
-    club = get_object_or_404(Club, id=club_id)
+    club = get_club_or_404(club_id)
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the leader of the club or an admin
@@ -777,6 +907,7 @@ def event_create_view(request, club_id):
             event.club = club
             event.created_by = user
             event.save()
+            activity.log(user, ActivityLog.EVENT_CREATED, f'created the event "{event.title}"', club)
             messages.success(request, 'Event created successfully!')
             return redirect('club_detail', club_id=club.id)
     else:
@@ -784,13 +915,42 @@ def event_create_view(request, club_id):
     
     return render(request, 'cmsapp/event_form.html', {'form': form, 'club': club})
 
+# Event import view
+@login_required
+def event_import_view(request, club_id):
+    club = get_club_or_404(club_id)
+    if not _can_manage_club(request.user, club):
+        messages.error(request, 'You do not have permission to import events.')
+        return redirect('club_detail', club_id=club.id)
+    
+    report = None
+    if request.method == 'POST':
+        form = EventImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                report = event_import.import_events(
+                    upload, event_import.format_for(upload.name), club, request.user,
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+            except event_import.InvalidImportFile as exc:
+                form.add_error('file', str(exc))
+            else:
+                if report.created and not report.dry_run:
+                    activity.log(request.user, ActivityLog.EVENT_CREATED, f'imported {report.created} events', club)
+                    messages.success(request, f'Imported {report.created} event{"s" if report.created != 1 else ""}.')
+    else:
+        form = EventImportForm()
+    
+    return render(request, 'cmsapp/event_import.html', {'form': form, 'club': club, 'report': report})
+
 # Event update view
 @login_required
 def event_update_view(request, event_id):
     event = get_object_or_404(Event, id=event_id)
     club = event.club
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the leader of the club or admin
@@ -806,6 +966,7 @@ def event_update_view(request, event_id):
         form = EventForm(request.POST, request.FILES, instance=event)
         if form.is_valid():
             form.save()
+            activity.log(user, ActivityLog.EVENT_UPDATED, f'updated the event "{event.title}"', club)
             messages.success(request, 'Event updated successfully!')
             return redirect('club_detail', club_id=club.id)
     else:
@@ -819,7 +980,7 @@ def event_delete_view(request, event_id):
     event = get_object_or_404(Event, id=event_id)
     club = event.club
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Check if user is the leader of the club or admin
@@ -832,21 +993,52 @@ def event_delete_view(request, event_id):
     
     if request.method == 'POST':
         event.delete()
+        activity.log(user, ActivityLog.EVENT_DELETED, f'deleted the event "{event.title}"', club)
         messages.success(request, 'Event deleted successfully!')
         return redirect('club_detail', club_id=club.id)
     
     return render(request, 'cmsapp/event_confirm_delete.html', {'event': event})
 
+# Cancel or restore one session of a recurring event
+@login_required
+def event_occurrence_cancel_view(request, event_id, occurrence):
+    event = get_object_or_404(Event, id=event_id)
+    if not _can_manage_club(request.user, event.club):
+        messages.error(request, 'Only club leaders and admins can change sessions.')
+        return redirect('event_detail', event_id=event.id)
+    session = recurrence.occurrence(event, occurrence)
+    if request.method != 'POST' or session is None or not event.recurrence:
+        return redirect('event_detail', event_id=event.id)
+    
+    cancel = request.POST.get('action') != 'restore'
+    exception = EventOccurrenceException.objects.filter(event=event, occurrence=occurrence).first()
+    if cancel and exception is None:
+        EventOccurrenceException.objects.create(event=event, occurrence=occurrence, is_cancelled=True)
+    elif exception is not None and exception.is_cancelled != cancel:
+        if not cancel and exception.start_date is None:
+            exception.delete()
+        else:
+            exception.is_cancelled = cancel
+            exception.save()
+    
+    day = f'{timezone.localtime(session.start_date):%b %d}'
+    verb = 'cancelled' if cancel else 'restored'
+    activity.log(request.user, ActivityLog.EVENT_UPDATED, f'{verb} the {day} session of "{event.title}"', event.club)
+    messages.success(request, f'The {day} session is {verb}.')
+    return redirect('event_detail', event_id=event.id)
+
 # Event detail view
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=event_detail_etag)
 def event_detail_view(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+    event = get_event_or_404(event_id)
     club = event.club
     user = request.user
     
     # Check if user is a member of the club
     is_member = ClubMembership.objects.filter(user=user, club=club).exists()
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     if not (is_member or role == 'admin'):
@@ -855,99 +1047,257 @@ def event_detail_view(request, event_id):
     
     # Check if user is a leader or admin or event creator
     is_leader = ClubMembership.objects.filter(user=user, club=club, is_leader=True).exists()
-    is_creator = event.created_by == user_profile
-    
-    # Get registered participants
-    registered_participants = event.participants.all()
+    is_creator = event.created_by_id == user.id
+    registered = set(EventRegistration.objects.filter(event=event, user=user).values_list('occurrence', flat=True))
     
     context = {
         'event': event,
         'club': club,
         'is_leader': is_leader,
         'is_creator': is_creator,
+        'is_registered': bool(registered),
         'role': role,
-        'registered_participants': registered_participants,
     }
     
+    # Recurring events list their next sessions; members register for one at a time
+    exceptions = recurrence.load_exceptions([event])
+    if event.recurrence:
+        sessions = recurrence.next_occurrences(event, timezone.now(), SESSION_LIST_SIZE, exceptions)
+        open_sessions = [session for session in sessions if not session.is_cancelled and session.index not in registered]
+        context.update({
+            'sessions': sessions,
+            'open_sessions': open_sessions,
+            'registered_sessions': registered,
+            'is_registered': not open_sessions,
+        })
+    
+    # One page of the roster; registrant_count is maintained on the event
+    if is_leader or is_creator or role == 'admin':
+        registrations = _listing_page(
+            request,
+            EventRegistration.objects.filter(event=event).select_related('user', 'team'),
+            ('registration_date', 'pk'),
+            ROSTER_PAGE_SIZE,
+        )
+        if event.recurrence:
+            for registration in registrations:
+                registration.session = recurrence.occurrence(event, registration.occurrence, exceptions)
+        team_ids = {registration.team_id for registration in registrations if registration.team_id}
+        teams = Team.objects.filter(pk__in=team_ids).select_related('leader').prefetch_related('members').order_by('name')
+        context.update({'registrations': registrations, 'teams': teams})
+    
     return render(request, 'cmsapp/event_detail.html', context)
 
+def _warn_schedule_conflicts(request, session):
+    # Registration still goes ahead; the member decides which event to attend
+    for other in scheduling.attendee_conflicts(request.user, session):
+        messages.warning(request, f'"{session.title}" overlaps with "{other.title}" ({other.club.name}), which you are also registered for.')
+
 @login_required
 def register_for_event(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+    event = get_event_or_404(event_id)
     if request.method == 'POST':
+        form = EventRegistrationForm(request.POST)
+        # Recurring events take registrations per occurrence; one-off events only have occurrence 0
+        try:
+            session = recurrence.occurrence(event, int(request.POST.get('occurrence', 0)))
+        except ValueError:
+            session = None
+        if session is None or session.is_cancelled:
+            messages.error(request, 'That session is not available for registration.')
+            return redirect('event_detail', event_id=event.id)
         # Check if the user is already registered
-        if not event.participants.filter(id=request.user.id).exists():
-            event.participants.add(request.user)
-            messages.success(request, f'You have successfully registered for "{event.title}"!')
-        else:
+        if EventRegistration.objects.filter(event=event, user=request.user, occurrence=session.index).exists():
             messages.info(request, 'You are already registered for this event.')
+        elif form.is_valid() and form.cleaned_data['registration_type'] == 'team':
+            team_name = form.cleaned_data['team_name'].strip()
+            emails = {email.strip().lower() for email in form.cleaned_data['team_members'].split(',') if email.strip()}
+            # The leader is on the team anyway
+            emails.discard(request.user.email.lower())
+            if not team_name:
+                messages.error(request, 'Please enter a team name.')
+                return redirect('event_detail', event_id=event.id)
+
+            members = list(User.objects.filter(email__in=emails).exclude(pk=request.user.pk))
+            already_registered = set(
+                EventRegistration.objects.filter(event=event, user__in=members, occurrence=session.index).values_list('user_id', flat=True)
+            )
+            members = [member for member in members if member.pk not in already_registered]
+            try:
+                with transaction.atomic():
+                    team = Team.objects.create(name=team_name, event=event, leader=request.user)
+                    team.members.add(request.user, *members)
+                    for member in [request.user] + members:
+                        EventRegistration.objects.create(event=event, user=member, team=team, occurrence=session.index)
+                    event.participants.add(request.user, *members)
+            except IntegrityError:
+                messages.error(request, 'Some team members registered at the same time. Please try again.')
+                return redirect('event_detail', event_id=event.id)
+
+            activity.log(request.user, ActivityLog.EVENT_REGISTERED,
+                         f'registered team "{team.name}" for "{event.title}"', event.club)
+            skipped = len(emails - {member.email.lower() for member in members})
+            messages.success(request, f'Team "{team.name}" is registered for "{event.title}" with {len(members) + 1} members.')
+            if skipped:
+                messages.warning(request, f'{skipped} team member(s) were not added because they have no account or are already registered.')
+            _warn_schedule_conflicts(request, session)
+        else:
+            try:
+                with transaction.atomic():
+                    EventRegistration.objects.create(event=event, user=request.user, occurrence=session.index)
+                    event.participants.add(request.user)
+                activity.log(request.user, ActivityLog.EVENT_REGISTERED, f'registered for "{event.title}"', event.club)
+                messages.success(request, f'You have successfully registered for "{event.title}"!')
+                _warn_schedule_conflicts(request, session)
+            except IntegrityError:
+                messages.info(request, 'You are already registered for this event.')
     return redirect('event_detail', event_id=event.id)
 
+# Export views
+def _export_format(request):
+    export_format = request.GET.get('format', 'csv')
+    return export_format if export_format in exports.FORMATS else None
+
+def _can_manage_club(user, club):
+    return get_profile(user).role == 'admin' or ClubMembership.objects.filter(user=user, club=club, is_leader=True).exists()
+
+@login_required
+def event_participants_export_view(request, event_id):
+    event = get_event_or_404(event_id)
+    if not (_can_manage_club(request.user, event.club) or event.created_by_id == request.user.id):
+        return HttpResponseForbidden('You do not have permission to export this event.')
+    export_format = _export_format(request)
+    if export_format is None:
+        return HttpResponse('Unsupported export format.', status=400)
+
+    header, rows = exports.event_participant_rows(event)
+    return exports.export_response(f'event-{event.id}-participants', export_format, header, rows)
+
+@login_required
+def club_members_export_view(request, club_id):
+    club = get_club_or_404(club_id)
+    if not _can_manage_club(request.user, club):
+        return HttpResponseForbidden('You do not have permission to export this club.')
+    export_format = _export_format(request)
+    if export_format is None:
+        return HttpResponse('Unsupported export format.', status=400)
+
+    header, rows = exports.club_member_rows(club)
+    return exports.export_response(f'club-{club.id}-members', export_format, header, rows)
+
+@login_required
+def club_join_requests_export_view(request, club_id):
+    club = get_club_or_404(club_id)
+    if not _can_manage_club(request.user, club):
+        return HttpResponseForbidden('You do not have permission to export this club.')
+    export_format = _export_format(request)
+    if export_format is None:
+        return HttpResponse('Unsupported export format.', status=400)
+
+    header, rows = exports.club_join_request_rows(club)
+    return exports.export_response(f'club-{club.id}-join-requests', export_format, header, rows)
+
 # Upcoming events view
 @login_required
 def upcoming_events_view(request):
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
-    # Get clubs the user is a member of
-    user_clubs = ClubMembership.objects.filter(user=user).values_list('club', flat=True)
-    
-    # Get upcoming events from these clubs
-    upcoming_events = Event.objects.filter(
-        club__in=user_clubs,
-        start_date__gte=timezone.now()
-    ).order_by('start_date')
-    
-    # If user is admin, show all events
-    if role == 'admin':
-        upcoming_events = Event.objects.filter(start_date__gte=timezone.now()).order_by('start_date')
+    # Upcoming occurrences from the user's clubs; admins see every event.
+    # Recurring series are expanded only as far as this page reaches.
+    position = recurrence.decode_position(request.GET.get('cursor', ''))
+    items = recurrence.upcoming(visible_events(user, role).select_related('club'), timezone.now(), EVENT_PAGE_SIZE, position)
+    next_cursor = recurrence.encode_position(items[EVENT_PAGE_SIZE - 1]) if len(items) > EVENT_PAGE_SIZE else None
+    page = CursorPage(items[:EVENT_PAGE_SIZE], next_cursor)
     
     context = {
-        'upcoming_events': upcoming_events,
+        'upcoming_events': page,
+        'page': page,
         'role': role,
+        'calendar_token': ical.make_token(user),
     }
     
     return render(request, 'cmsapp/upcoming_events.html', context)
 
+# Event calendar view
+@login_required
+def event_calendar_view(request):
+    user = request.user
+    role = get_profile(user).role
+    is_admin = role == 'admin'
+    
+    # The grid is rendered once per visibility scope and month/week; see cmsapp.calendar_grid
+    kind = calendar_grid.WEEK if request.GET.get('view') == calendar_grid.WEEK else calendar_grid.MONTH
+    period = calendar_grid.Period.parse(kind, request.GET.get('date'), timezone.localdate())
+    stamps = calendar_grid.scope_stamps(user, is_admin)
+    club_ids = None if is_admin else [club_id for club_id, _ in stamps]
+    grid = calendar_grid.get_grid(period, stamps, club_ids)
+    
+    # Render the neighbouring months/weeks in the background, ready for the next click
+    for neighbour in (period.previous(), period.next()):
+        calendar_grid.prefetch(neighbour, stamps, club_ids)
+    
+    context = {
+        'grid': grid,
+        'period': period,
+        'previous': period.previous(),
+        'next': period.next(),
+        'role': role,
+        'calendar_token': ical.make_token(user),
+    }
+    return render(request, 'cmsapp/event_calendar.html', context)
+
+# Calendar feed views
+def _calendar_response(request, state):
+    last_modified = int(state.last_modified.timestamp()) if state.last_modified else None
+    response = get_conditional_response(request, etag=state.etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(ical.stream_ics(request, state), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = state.etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, max_age=300)
+    return response
+
+def user_calendar_feed_view(request, token):
+    user = ical.user_for_token(token)
+    if user is None:
+        raise Http404('Unknown calendar feed')
+    is_admin = get_profile(user).role == 'admin'
+    return _calendar_response(request, ical.user_feed_state(user, is_admin))
+
+@login_required
+def calendar_token_reset_view(request):
+    # Replaces the user's feed URLs; subscriptions to the old ones stop updating
+    if request.method == 'POST':
+        ical.reset_token(request.user)
+        messages.success(request, 'Your calendar feed address has been changed. Subscribe again with the new one.')
+    return redirect('upcoming_events')
+
+def club_calendar_feed_view(request, token, club_id):
+    user = ical.user_for_token(token)
+    club = get_club(club_id)
+    if user is None or club is None:
+        raise Http404('Unknown calendar feed')
+    if not (get_profile(user).role == 'admin' or ClubMembership.objects.filter(user=user, club=club).exists()):
+        raise Http404('Unknown calendar feed')
+    return _calendar_response(request, ical.club_feed_state(club))
+
 # Club search view
 @login_required
 def club_search_view(request):
     query = request.GET.get('q', '')
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     if query:
-        # Search in club name and description
-        if role == 'admin':
-            # Admin sees all clubs matching the search
-            clubs = Club.objects.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query)
-            )
-        elif role == 'leader':
-            # Leader sees clubs they created and clubs they joined matching the search
-            created_clubs = Club.objects.filter(
-                Q(created_by=request.user) & 
-                (Q(name__icontains=query) | Q(description__icontains=query))
-            )
-            joined_clubs = request.user.joined_clubs.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query)
-            )
-            clubs = (created_clubs | joined_clubs).distinct()
-        else:  # member
-            # Member sees clubs they joined and approved clubs they can join matching the search
-            joined_clubs = request.user.joined_clubs.filter(
-                Q(name__icontains=query) | 
-                Q(description__icontains=query)
-            )
-            available_clubs = Club.objects.filter(
-                Q(is_approved=True) & 
-                (Q(name__icontains=query) | Q(description__icontains=query))
-            ).exclude(id__in=joined_clubs.values_list('id', flat=True))
-            clubs = (joined_clubs | available_clubs).distinct()
+        # Search in club name and description, among the clubs the user can see
+        clubs = visible_clubs(user, role).filter(
+            Q(name__icontains=query) | 
+            Q(description__icontains=query)
+        ).select_related('created_by').order_by('name', 'id')
     else:
         # If no query, return to club list
         return redirect('club_list')
@@ -965,29 +1315,17 @@ def club_search_view(request):
 def event_search_view(request):
     query = request.GET.get('q', '')
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     if query:
-        # Get clubs the user is a member of
-        user_clubs = ClubMembership.objects.filter(user=user).values_list('club', flat=True)
-        
-        # Search in event title, description, and location
-        if role == 'admin':
-            # Admin sees all events matching the search
-            events = Event.objects.filter(
-                Q(title__icontains=query) | 
-                Q(description__icontains=query) | 
-                Q(location__icontains=query)
-            ).order_by('start_date')
-        else:  # leader or member
-            # User sees events from their clubs matching the search
-            events = Event.objects.filter(
-                Q(club__in=user_clubs) & 
-                (Q(title__icontains=query) | 
-                Q(description__icontains=query) | 
-                Q(location__icontains=query))
-            ).order_by('start_date')
+        # Search in event title, description, and location; admins see every
+        # event, others the events of their clubs
+        events = visible_events(user, role).filter(
+            Q(title__icontains=query) | 
+            Q(description__icontains=query) | 
+            Q(location__icontains=query)
+        ).select_related('club').order_by('start_date')
     else:
         # If no query, return to upcoming events
         return redirect('upcoming_events')
@@ -1005,7 +1343,7 @@ def event_search_view(request):
 def global_search_view(request):
     query = request.GET.get('q', '')
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     if not query:
@@ -1051,7 +1389,7 @@ def global_search_view(request):
             Q(title__icontains=query) | 
             Q(description__icontains=query) | 
             Q(location__icontains=query)
-        ).order_by('start_date')
+        ).select_related('club').order_by('start_date')
     else:  # leader or member
         # User sees events from their clubs matching the search
         events = Event.objects.filter(
@@ -1059,7 +1397,7 @@ def global_search_view(request):
             (Q(title__icontains=query) | 
             Q(description__icontains=query) | 
             Q(location__icontains=query))
-        ).order_by('start_date')
+        ).select_related('club').order_by('start_date')
     
     # Render the global search results template with both clubs and events
     return render(request, 'cmsapp/global_search_results.html', {
@@ -1072,7 +1410,7 @@ def global_search_view(request):
 @login_required
 def pending_clubs_view(request):
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Only admin can view pending clubs
@@ -1093,7 +1431,7 @@ def pending_clubs_view(request):
 @login_required
 def leader_details_view(request, user_id):
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     role = user_profile.role
     
     # Get the leader's profile
@@ -1127,7 +1465,7 @@ def leader_details_view(request, user_id):
 @login_required
 def promote_to_admin_view(request, user_id):
     user = request.user
-    user_profile = UserProfile.objects.get(user=user)
+    user_profile = get_profile(user)
     
     # Only admins can promote others to admin
     if user_profile.role != 'admin':
@@ -1159,3 +1497,39 @@ def promote_to_admin_view(request, user_id):
     
     return redirect('admin_dashboard')
 
+# Monitoring Views
+def metrics_view(request):
+    # Prometheus scrape endpoint: bearer token from CMS_METRICS['TOKEN'], or a logged-in admin
+    config = metrics.get_config()
+    if not config['ENABLED']:
+        raise Http404('Metrics are disabled.')
+    token = config['TOKEN']
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and auth.startswith('Bearer ') and constant_time_compare(auth[7:], token):
+        allowed = True
+    else:
+        allowed = request.user.is_authenticated and get_profile(request.user).role == 'admin'
+    if not allowed:
+        return HttpResponseForbidden('Forbidden')
+
+    gauges = []
+    try:
+        gauges.append(('cms_db_ping_seconds', 'Database round-trip latency of SELECT 1.', metrics.ping_database()))
+        gauges.append(('cms_db_up', 'Whether the database answered the ping.', 1))
+    except DatabaseError:
+        gauges.append(('cms_db_up', 'Whether the database answered the ping.', 0))
+
+    return HttpResponse(metrics.render_prometheus(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def readiness_view(request):
+    # Readiness probe: 200 while the database answers quickly enough, 503 otherwise
+    max_latency = metrics.get_config()['READY_MAX_DB_LATENCY']
+    try:
+        latency = metrics.ping_database()
+    except DatabaseError:
+        # Served without login, so the error stays in the log
+        logger.exception('Readiness check could not reach the database')
+        return JsonResponse({'status': 'unavailable'}, status=503)
+
+    status = 'ok' if latency <= max_latency else 'degraded'
+    return JsonResponse({'status': status, 'db_latency_ms': round(latency * 1000, 3)}, status=200 if status == 'ok' else 503)
@@ -0,0 +1,35 @@
+"""
+Role-based visibility of clubs, events and messages.
+
+The rules match the HTML views: admins see everything; leaders see the clubs
+they created or joined; members see the clubs they joined plus every
+approved club; only a club's members (and admins) see its events and
+messages. Membership is tested with a correlated EXISTS on the
+(user, club) unique index rather than by OR-ing querysets together, so the
+results need no DISTINCT and stay in index order for keyset pagination.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Club, ClubMembership, Event
+
+
+def _is_member(user, club_ref):
+    return Exists(ClubMembership.objects.filter(user=user, club=OuterRef(club_ref)))
+
+
+def visible_clubs(user, role):
+    if role == 'admin':
+        return Club.objects.all()
+    if role == 'leader':
+        return Club.objects.filter(Q(created_by=user) | _is_member(user, 'pk'))
+    return Club.objects.filter(Q(is_approved=True) | _is_member(user, 'pk'))
+
+
+def visible_events(user, role):
+    if role == 'admin':
+        return Event.objects.all()
+    return Event.objects.filter(_is_member(user, 'club_id'))
+
+
+def can_read_club_messages(user, role, club):
+    return role == 'admin' or ClubMembership.objects.filter(user=user, club=club).exists()
@@ -42,6 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cmsapp.middleware.MetricsMiddleware',
+    'cmsapp.middleware.SlowQueryMiddleware',
+    'cmsapp.middleware.NPlusOneMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,13 +52,14 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'cmsapp.middleware.SamplingProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'cmspro.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'cmsapp.template_backend.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,6 +68,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'cmsapp.context_processors.layout',
             ],
         },
     },
@@ -83,6 +88,26 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Shared tier of the two-tier cache in cmsapp/cache.py. Each worker process
+# keeps its own LRU of CMS_LOCAL_CACHE_SIZE entries in front of it, and
+# rereads the generation counters at most every CMS_CACHE_COUNTER_TTL seconds.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+CMS_LOCAL_CACHE_SIZE = 1024
+CMS_CACHE_COUNTER_TTL = 1
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -131,6 +156,162 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Request profiling (cmsapp.middleware.SamplingProfilerMiddleware)
+# Profiles SAMPLE_RATE of requests, plus any request whose X-CMS-Profile header
+# carries a token from `manage.py profile_report --issue-token`.
+# Review results with `manage.py profile_report`.
+
+CMS_PROFILER = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.01,
+    'DIRECTORY': BASE_DIR / 'var' / 'profiles',
+    'MAX_PROFILES': 200,
+}
+
+# Metrics (cmsapp.middleware.MetricsMiddleware, served at /metrics/)
+# Off unless ENABLED. Each worker writes a snapshot to DIRECTORY every
+# FLUSH_INTERVAL seconds and the endpoint merges them. Scrapers authenticate
+# with "Authorization: Bearer <TOKEN>"; logged-in admins can always read it.
+# Snapshots of processes on this host that have exited, and snapshots not
+# rewritten for STALE_AFTER seconds, are deleted when the endpoint merges them.
+
+CMS_METRICS = {
+    'ENABLED': False,
+    'DIRECTORY': BASE_DIR / 'var' / 'metrics',
+    'FLUSH_INTERVAL': 5.0,
+    'STALE_AFTER': 3600.0,
+    'TOKEN': None,
+    'READY_MAX_DB_LATENCY': 1.0,
+}
+
+# Slow query log (cmsapp.middleware.SlowQueryMiddleware)
+# Statements slower than THRESHOLD_MS are kept in a per-process ring buffer of
+# BUFFER_SIZE entries and appended to LOG_FILE, which is rotated once it grows
+# past MAX_FILE_BYTES. Aggregated at /admin-dashboard/slow-queries/.
+
+CMS_SLOW_QUERIES = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'BUFFER_SIZE': 500,
+    'LOG_FILE': BASE_DIR / 'var' / 'slow_queries.jsonl',
+    'MAX_FILE_BYTES': 10 * 1024 * 1024,
+}
+
+# N+1 query detection (cmsapp.middleware.NPlusOneMiddleware)
+# Reports query shapes repeated more than THRESHOLD times in one request.
+# MODE is 'warn', 'log' or 'raise'. Keep it off in production.
+
+CMS_NPLUSONE = {
+    'ENABLED': DEBUG,
+    'THRESHOLD': 5,
+    'MODE': 'warn',
+}
+
+# Background task queue (cmsapp.taskqueue, run with `manage.py run_worker`)
+# Failed tasks retry after BACKOFF_BASE * 2**(attempt - 1) seconds, capped at
+# BACKOFF_MAX. A worker refreshes the lock of each running task every
+# HEARTBEAT_INTERVAL seconds; tasks whose lock is older than STALE_AFTER are
+# requeued, or failed once out of attempts. EAGER runs tasks inline at enqueue
+# time instead of queueing.
+
+CMS_TASKS = {
+    'WORKERS': 2,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 5,
+    'BACKOFF_MAX': 3600,
+    'HEARTBEAT_INTERVAL': 60,
+    'STALE_AFTER': 600,
+    'KEEP_FINISHED_DAYS': 7,
+    'EAGER': False,
+}
+
+# Event reminders (cmsapp.reminders, run with `manage.py run_reminders`)
+# OFFSETS are minutes before an event's start. Reminders are mailed to the
+# registrants through the task queue, so `run_worker` must be running too.
+
+CMS_REMINDERS = {
+    'OFFSETS': [24 * 60, 60],
+    'LOOKAHEAD': 6 * 3600,
+    'RECHECK_INTERVAL': 30,
+    'BATCH_SIZE': 200,
+    'FROM_EMAIL': None,
+    'SITE_URL': '',
+}
+
+# Daily digest (cmsapp.digest, run once a day with `manage.py send_digest`)
+# Members can turn the digest off on their profile page.
+
+CMS_DIGEST = {
+    'CHUNK_SIZE': 200,
+    'MESSAGES_PER_CLUB': 5,
+    'FROM_EMAIL': None,
+    'SITE_URL': '',
+}
+
+# Message archive (cmsapp.archive, run periodically with `manage.py archive_messages`)
+# Messages older than a club's message_retention_days (default RETENTION_DAYS)
+# move into gzip segment files under DIRECTORY; keep it on backed-up storage.
+
+CMS_MESSAGE_ARCHIVE = {
+    'DIRECTORY': BASE_DIR / 'var' / 'archive' / 'messages',
+    'RETENTION_DAYS': 365,
+    'SEGMENT_SIZE': 5000,
+}
+
+# Activity log (cmsapp.activity)
+# Entries are buffered per process and written with one bulk insert once
+# MAX_ITEMS are pending or the oldest has waited MAX_DELAY_MS.
+
+CMS_ACTIVITY = {
+    'MAX_ITEMS': 100,
+    'MAX_DELAY_MS': 1000,
+}
+
+# Club recommendations (cmsapp.recommendations)
+# compute_club_similarity keeps the TOP_K most similar clubs of each club by
+# shared members; the club list suggests up to LIMIT of them.
+
+CMS_RECOMMENDATIONS = {
+    'TOP_K': 20,
+    'MIN_COMMON_MEMBERS': 2,
+    'LIMIT': 6,
+}
+
+# Trending clubs (cmsapp.trending)
+# Each join, message, event and registration adds its weight to the club's
+# score, which halves every HALF_LIFE_HOURS. Changing the half-life skews
+# scores already stored against new activity.
+
+CMS_TRENDING = {
+    'HALF_LIFE_HOURS': 72,
+    'WEIGHTS': {
+        'join': 3.0,
+        'message': 1.0,
+        'event': 4.0,
+        'registration': 2.0,
+    },
+}
+
+# Change feed for downstream sync (cmsapp.changes, /api/v1/changes/ and
+# `manage.py export_changes`). Entries younger than SETTLE_SECONDS are held
+# back in case transactions commit out of order (see cmsapp.changes);
+# `export_changes --purge` deletes entries older than KEEP_DAYS.
+
+CMS_CHANGES = {
+    'PAGE_SIZE': 1000,
+    'MAX_PAGE_SIZE': 10000,
+    'SETTLE_SECONDS': 1,
+    'KEEP_DAYS': 30,
+}
+
+# Email
+# https://docs.djangoproject.com/en/5.0/topics/email/
+
+if DEBUG:
+    EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Club Management System <noreply@localhost>'
+
 # Authentication settings
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'